@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end load test of Archiver.get against a local archiver server.
+
+Starts an ArchiverServer from tests/archiver_server.py, unless --url is
+given, then makes repeated get requests for random groups of channels from
+several client threads. Throughput and latency percentiles are written as
+JSON. A server started by the load test shares the process, and so the
+interpreter, with the clients; for figures that only reflect the client
+start tests/archiver_server.py separately and pass its URL.
+
+Example usage:
+
+    $ python benchmarks/load_test.py --clients 8 --requests 200 \\
+          --latency 0.02 --jitter 0.05 --bandwidth 2e6 --pooled
+
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+benchmarks_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(benchmarks_dir, os.pardir))
+sys.path.insert(0, os.path.join(benchmarks_dir, os.pardir, "tests"))
+
+from channelarchiver import (  # noqa: E402
+    Archiver,
+    HedgePolicy,
+    PooledTransport,
+    RetryPolicy,
+    utils,
+)
+from channelarchiver.instrumentation import StatsHooks  # noqa: E402
+import archiver_server  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def call_totals(stats):
+    """Sum the call statistics of each method over the archive keys."""
+    totals = {}
+    for (method, _), call_stats in sorted(stats.calls.items(), key=lambda item: item[0][0]):
+        total = totals.setdefault(
+            method,
+            {"count": 0, "seconds": 0.0, "errors": 0, "response_bytes": 0},
+        )
+        total["count"] += call_stats.count
+        total["seconds"] += call_stats.seconds
+        total["errors"] += call_stats.errors
+        total["response_bytes"] = stats.response_bytes[method]
+    return totals
+
+
+def run(args, url, server=None):
+    transport = PooledTransport(max_idle=args.clients * args.max_workers) if args.pooled else None
+    stats = StatsHooks()
+    archiver = Archiver(
+        url,
+        hooks=stats,
+        max_workers=args.max_workers,
+        transport=transport,
+        timeout=args.timeout,
+        retry=RetryPolicy(attempts=args.retries + 1) if args.retries else None,
+        hedge=HedgePolicy(percentile=args.hedge) if args.hedge else None,
+    )
+    if server is None:
+        archiver.scan_archives()
+    else:
+        # Only inject faults into the requests being measured
+        rates = server.error_rate, server.stall_rate
+        server.error_rate = server.stall_rate = 0.0
+        archiver.scan_archives()
+        server.error_rate, server.stall_rate = rates
+    # Only the requests being measured are counted
+    stats.reset()
+    channels = sorted(archiver.archives_for_channel)
+    start = min(archives[0].start_time for archives in archiver.archives_for_channel.values())
+    end = start + timedelta(seconds=args.interval)
+
+    latencies = []
+    errors = []
+    samples = [0]
+    lock = threading.Lock()
+    remaining = [args.requests]
+    rng = random.Random(args.seed)
+
+    def client():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+                request_channels = rng.sample(
+                    channels, min(args.channels_per_request, len(channels))
+                )
+            request_start = time.perf_counter()
+            try:
+                data = archiver.get(
+                    request_channels,
+                    start,
+                    end,
+                    limit=args.limit,
+                    interpolation=args.interpolation,
+                    scan_archives=False,
+                    paginate=args.paginate,
+                    deadline=args.deadline,
+                )
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            elapsed = time.perf_counter() - request_start
+            with lock:
+                latencies.append(elapsed)
+                samples[0] += sum(len(channel_data.values) for channel_data in data)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    run_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - run_start
+    if transport is not None:
+        transport.close()
+
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "succeeded": len(latencies),
+        "failed": len(errors),
+        "errors": sorted(set(errors)),
+        "duration": duration,
+        "requests_per_second": len(latencies) / duration,
+        "samples_per_second": samples[0] / duration,
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "calls": call_totals(stats),
+        "samples_parsed": stats.samples_parsed,
+        "parse_seconds": stats.parse_seconds,
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    arg_parser.add_argument("--url", help="archiver to test (default: start a local server)")
+    arg_parser.add_argument("--clients", type=int, default=4, help="concurrent client threads")
+    arg_parser.add_argument("--requests", type=int, default=100, help="total get requests")
+    arg_parser.add_argument("--channels-per-request", type=int, default=10)
+    arg_parser.add_argument(
+        "--interval", type=float, default=600, help="seconds of data per request"
+    )
+    arg_parser.add_argument("--limit", type=int, default=1000)
+    arg_parser.add_argument("--interpolation", default="raw")
+    arg_parser.add_argument("--paginate", action="store_true")
+    arg_parser.add_argument(
+        "--max-workers", type=int, default=1, help="max_workers of the Archiver"
+    )
+    arg_parser.add_argument("--pooled", action="store_true", help="use a PooledTransport")
+    arg_parser.add_argument("--timeout", type=float, help="seconds to wait for each call")
+    arg_parser.add_argument("--deadline", type=float, help="seconds allowed for each get")
+    arg_parser.add_argument("--retries", type=int, default=0, help="retries of failed calls")
+    arg_parser.add_argument(
+        "--hedge", type=float, help="latency percentile after which calls are hedged"
+    )
+    arg_parser.add_argument("--output", help="file to write JSON results to")
+    archiver_server.add_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        server = archiver_server.server_from_arguments(args)
+        url = server.start()
+    try:
+        results = run(args, url, server)
+    finally:
+        if server is not None:
+            server.stop()
+
+    output = {
+        "created": datetime.now(utils.utc).isoformat(),
+        "options": {key: value for key, value in vars(args).items() if key not in ["output"]},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
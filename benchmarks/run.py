@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for channelarchiver using a synthetic archiver.
+
+Times scanning for channels, retrieving and parsing data, converting times
+to datetimes and formatting ChannelData at several sizes, and writes the
+results as JSON. Passing a previous results file with --compare reports how
+each timing has changed and exits with status 1 if any has slowed by more
+than the tolerance.
+
+Example usage:
+
+    $ python benchmarks/run.py --samples 1000 10000 --output results.json
+    $ python benchmarks/run.py --compare results.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+try:
+    from xmlrpc.client import dumps, loads
+except ImportError:  # Python 2
+    from xmlrpclib import dumps, loads
+
+benchmarks_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(benchmarks_dir, os.pardir))
+sys.path.insert(0, os.path.join(benchmarks_dir, os.pardir, "tests"))
+
+import channelarchiver  # noqa: E402
+from channelarchiver import Archiver, codes, parser, utils  # noqa: E402
+from synthetic_archiver import SyntheticArchiver  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+class ReplayProxy(object):
+    """
+    Proxy for a SyntheticArchiver that passes its responses through XML-RPC
+    encoding and decoding, so parsing is included in the timings. Encoded
+    responses are kept so that only the first call for a set of arguments
+    pays for generating and encoding the data.
+
+    """
+
+    def __init__(self, archiver):
+        self._archiver = archiver
+        self._responses = {}
+
+    def __getattr__(self, name):
+        def call(*args):
+            key = (name, repr(args))
+            if key not in self._responses:
+                result = getattr(self._archiver, name)(*args)
+                self._responses[key] = dumps((result,), methodresponse=True).encode(
+                    "utf-8"
+                )
+            return decode(name, self._responses[key])
+
+        return call
+
+
+def decode(method, response):
+    if method != "values":
+        return loads(response)[0][0]
+    values_parser, unmarshaller = parser.getparser()
+    for i in range(0, len(response), 65536):
+        values_parser.feed(response[i : i + 65536])
+    values_parser.close()
+    return unmarshaller.close()[0]
+
+
+def timeit(func, repeat, setup=None):
+    """
+    Call func repeat times, after one untimed warm up call, and return the
+    time taken by each call. If setup is given its result is passed to func
+    and the time it takes is not included.
+
+    """
+    times = []
+    for i in range(repeat + 1):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        if i:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def run_case(data_type, elements, num_samples, args):
+    synthetic = SyntheticArchiver(
+        num_archives=args.archives,
+        num_channels=args.channels,
+        num_samples=num_samples,
+        elements=elements,
+        data_types=[data_type],
+    )
+    proxy = synthetic if args.no_xml else ReplayProxy(synthetic)
+    archiver = Archiver("http://localhost/cgi-bin/ArchiveDataServer.cgi")
+    archiver.archiver = proxy
+    channels = sorted(synthetic.channels)
+    start = datetime.fromtimestamp(synthetic.start_ns // utils.NANOSECONDS_PER_SECOND, utils.utc)
+    end = datetime.fromtimestamp(
+        (synthetic.start_ns + num_samples * synthetic.period_ns) // utils.NANOSECONDS_PER_SECOND,
+        utils.utc,
+    )
+    archiver.scan_archives(channels)
+
+    def get(columnar=False):
+        return archiver.get(
+            channels,
+            start,
+            end,
+            limit=num_samples,
+            interpolation="raw",
+            scan_archives=False,
+            stitch=True,
+            columnar=columnar,
+        )
+
+    def for_each(func):
+        return lambda data: [func(channel_data) for channel_data in data]
+
+    benchmarks = [
+        ("scan_archives", lambda _: archiver.scan_archives(channels), None),
+        ("get", lambda _: get(), None),
+        ("times", for_each(lambda channel_data: channel_data.times), get),
+        ("str", for_each(str), get),
+        ("repr", for_each(repr), get),
+    ]
+    if numpy is not None:
+        benchmarks += [
+            ("get_columnar", lambda _: get(columnar=True), None),
+            ("array", for_each(lambda channel_data: channel_data.array), get),
+        ]
+    if pandas is not None:
+        benchmarks += [
+            (
+                "to_pandas",
+                for_each(lambda channel_data: channel_data.to_pandas()),
+                lambda: get(columnar=True),
+            ),
+        ]
+
+    results = []
+    for name, func, setup in benchmarks:
+        if args.only and name not in args.only:
+            continue
+        result = {
+            "benchmark": name,
+            "data_type": codes.data_type.str_value(data_type),
+            "elements": elements,
+            "samples": num_samples,
+            "channels": args.channels,
+            "archives": args.archives,
+            "xml": not args.no_xml,
+        }
+        try:
+            times = timeit(func, args.repeat, setup)
+        except Exception as e:
+            # Record operations that fail for this kind of data, such as
+            # formatting STRING channels, rather than abandoning the run
+            result["error"] = f"{type(e).__name__}: {e}"
+            summary = result["error"]
+        else:
+            result["best"] = min(times)
+            result["mean"] = sum(times) / len(times)
+            result["times"] = times
+            summary = "{0:.4f} s".format(result["best"])
+        results.append(result)
+        print(
+            "{benchmark:>14} {data_type:>6} x{elements:<4} {samples:>8} samples: ".format(
+                **result
+            )
+            + summary,
+            file=sys.stderr,
+        )
+    return results
+
+
+def case_key(result):
+    return tuple(
+        result[key]
+        for key in ["benchmark", "data_type", "elements", "samples", "channels", "archives", "xml"]
+    )
+
+
+def compare(results, baseline_path, tolerance):
+    """Print the change in each timing and return whether any regressed."""
+    with open(baseline_path) as f:
+        baseline = {case_key(result): result for result in json.load(f)["results"]}
+    regressed = False
+    for result in results:
+        previous = baseline.get(case_key(result))
+        if previous is None or "best" not in previous or "best" not in result:
+            continue
+        ratio = result["best"] / previous["best"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        print(
+            "{0:>14} {1:>6} x{2:<4} {3:>8} samples: {4:.2f}x{5}".format(
+                result["benchmark"],
+                result["data_type"],
+                result["elements"],
+                result["samples"],
+                ratio,
+                flag,
+            ),
+            file=sys.stderr,
+        )
+    return regressed
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    arg_parser.add_argument(
+        "--samples",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 50000],
+        help="samples per channel for each size benchmarked",
+    )
+    arg_parser.add_argument("--channels", type=int, default=4)
+    arg_parser.add_argument("--archives", type=int, default=4)
+    arg_parser.add_argument(
+        "--elements",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="elements per sample; values above 1 benchmark waveforms",
+    )
+    arg_parser.add_argument(
+        "--types",
+        nargs="+",
+        default=["DOUBLE"],
+        choices=["STRING", "ENUM", "INT", "DOUBLE"],
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument(
+        "--only", nargs="+", help="names of the benchmarks to run (default: all)"
+    )
+    arg_parser.add_argument(
+        "--no-xml",
+        action="store_true",
+        help="call the synthetic archiver directly rather than via XML-RPC encoding; "
+        "timings then include generating the data",
+    )
+    arg_parser.add_argument("--output", help="file to write JSON results to")
+    arg_parser.add_argument("--compare", help="previous JSON results to compare with")
+    arg_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional slow down allowed by --compare (default: 0.2)",
+    )
+    args = arg_parser.parse_args(argv)
+
+    results = []
+    for type_name in args.types:
+        for elements in args.elements:
+            for num_samples in args.samples:
+                results += run_case(codes.data_type[type_name], elements, num_samples, args)
+
+    output = {
+        "created": datetime.now(utils.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "channelarchiver": channelarchiver.__version__,
+            "numpy": None if numpy is None else numpy.__version__,
+            "pandas": None if pandas is None else pandas.__version__,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,10 +19,22 @@ Example usage:
 """
 
 from .channelarchiver import Archiver
+from .catalog import ArchiveCatalog
+from .store import SampleStore
+from .transport import PooledTransport
+from .retry import RetryPolicy, HedgePolicy
 from . import codes
 
 
 __title__ = "channelarchiver"
 __version__ = "1.0.0"
 __license__ = "MIT"
-__all__ = [Archiver, codes]
+__all__ = [
+    Archiver,
+    ArchiveCatalog,
+    SampleStore,
+    PooledTransport,
+    RetryPolicy,
+    HedgePolicy,
+    codes,
+]
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""
+Alignment of several channels onto a shared time grid on the client, as an
+alternative to the archiver's spreadsheet interpolation. Raw data can then
+be fetched once and re-gridded as often as needed.
+
+Example usage:
+
+    >>> from channelarchiver.align import align, align_frame
+    >>> data = archiver.get(channels, start, end, interpolation='raw', columnar=True)
+    >>> aligned = align(data, period=10, tolerance=60)
+    >>> frame = align_frame(data, method='linear', period=10)
+
+"""
+
+import datetime
+
+from . import codes
+from . import exceptions
+from . import utils
+from .models import HAS_NUMPY, HAS_PANDAS, channel_arrays, with_arrays
+
+if HAS_NUMPY:
+    import numpy as np
+if HAS_PANDAS:
+    import pandas as pd
+
+
+METHODS = ["previous", "linear", "nearest"]
+
+
+def align(data, times=None, period=None, method="previous", tolerance=None):
+    """
+    Resample channels onto a shared time grid. Each grid time is matched to
+    the samples of each channel with a binary search of the sorted sample
+    times, so no Python loop runs over the samples.
+
+    Grid times a channel has no value for, because they come before its
+    first sample or the nearest sample is further away than tolerance, are
+    given a value of NaN (None for strings) with a UDF_ALARM status and
+    INVALID severity. Integer values are converted to floats when that
+    happens and when they are interpolated.
+
+    Args:
+        data (List[ChannelData]): The channels to align, such as the result
+            of Archiver.get with raw interpolation. Sample times must be in
+            ascending order.
+        times (Optional[List]): The grid, as datetimes or integer
+            nanoseconds since the Epoch in ascending order. If omitted, the
+            grid is built from period or is the union of the sample times.
+        period (Optional[float or timedelta]): Spacing of a regular grid
+            from the first to the last sample time of all channels, in
+            seconds if a number.
+        method (Optional[str]): How values are chosen for each grid time:
+            'previous' takes the latest sample at or before it, 'nearest'
+            the closest sample and 'linear' interpolates between the
+            samples either side. Statuses and severities come from the
+            sample taken, or the earlier sample when interpolating. STRING
+            and ENUM channels use 'previous' in place of 'linear'.
+            Default: 'previous'
+        tolerance (Optional[float or timedelta]): Maximum time between a
+            grid time and a sample used for it, in seconds if a number. For
+            'linear' both samples must be within tolerance. If omitted,
+            samples are used however old they are.
+
+    Returns:
+        A list of ChannelData objects in columnar form, one for each
+        channel of data, all with times_ns equal to the grid.
+
+    """
+    if not HAS_NUMPY:
+        raise exceptions.NumpyNotInstalled("Numpy not found")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+
+    data = list(data)
+    arrays = [channel_arrays(channel_data) for channel_data in data]
+    grid = _grid([times_ns for times_ns, _, _, _ in arrays], times, period)
+    tolerance_ns = None if tolerance is None else _ns_from_duration(tolerance)
+
+    aligned = []
+    for channel_data, (times_ns, values, statuses, severities) in zip(data, arrays):
+        channel_method = method
+        if method == "linear" and channel_data.data_type in (
+            codes.data_type.STRING,
+            codes.data_type.ENUM,
+        ):
+            channel_method = "previous"
+        if channel_method == "linear":
+            indexes, valid, new_values = _linear(grid, times_ns, values, tolerance_ns)
+        else:
+            indexes, valid, new_values = _take(
+                grid, times_ns, values, channel_method, tolerance_ns
+            )
+        aligned.append(
+            with_arrays(
+                channel_data,
+                grid,
+                _fill_invalid(new_values, valid),
+                _take_codes(statuses, indexes, valid, codes.status.UDF_ALARM),
+                _take_codes(severities, indexes, valid, codes.severity.INVALID),
+            )
+        )
+    return aligned
+
+
+def align_frame(
+    data, times=None, period=None, method="previous", tolerance=None, statuses=False
+):
+    """
+    Align channels as align does and return them as one pandas DataFrame
+    indexed by time. There is a column for each channel named after it, or
+    for waveforms a column for each element named <channel>[<element>].
+
+    Args:
+        statuses (Optional[bool]): If True, <channel>.status and
+            <channel>.severity columns holding categoricals of the status
+            and severity names are included.
+            Default: False
+
+    See align for the other arguments.
+
+    """
+    if not HAS_PANDAS:
+        raise exceptions.PandasNotInstalled("Pandas not found")
+    aligned = align(data, times, period, method, tolerance)
+    index = None
+    columns = {}
+    for channel_data in aligned:
+        frame = channel_data.to_pandas()
+        index = frame.index
+        channel = channel_data.channel
+        if channel_data.values.ndim == 1:
+            columns[channel] = frame["value"]
+        else:
+            for element in range(channel_data.values.shape[1]):
+                columns[f"{channel}[{element}]"] = frame["value", element]
+        if statuses:
+            columns[f"{channel}.status"] = frame["status"]
+            columns[f"{channel}.severity"] = frame["severity"]
+    return pd.DataFrame(columns, index=index)
+
+
+def _grid(times_ns_list, times, period):
+    """Return the grid as an int64 array of nanoseconds since the Epoch."""
+    if times is not None:
+        times = list(times)
+        if times and isinstance(times[0], datetime.datetime):
+            times = [utils.ns_from_datetime(dt) for dt in times]
+        return np.asarray(times, dtype=np.int64)
+    non_empty = [times_ns for times_ns in times_ns_list if len(times_ns)]
+    if not non_empty:
+        return np.empty(0, dtype=np.int64)
+    if period is None:
+        return np.unique(np.concatenate(non_empty))
+    first = min(times_ns[0] for times_ns in non_empty)
+    last = max(times_ns[-1] for times_ns in non_empty)
+    return np.arange(first, last + 1, _ns_from_duration(period), dtype=np.int64)
+
+
+def _take(grid, times_ns, values, method, tolerance_ns):
+    """
+    Pick the previous or nearest sample for each grid time. Returns the
+    sample indexes, whether each grid time has a value and the values.
+
+    """
+    if not len(times_ns):
+        return _no_samples(grid, values)
+    previous = np.searchsorted(times_ns, grid, side="right") - 1
+    if method == "nearest":
+        following = np.minimum(previous + 1, len(times_ns) - 1)
+        # Ties go to the previous sample
+        use_following = (previous < 0) | (
+            times_ns[following] - grid < grid - times_ns[np.maximum(previous, 0)]
+        )
+        indexes = np.where(use_following, following, previous)
+    else:
+        indexes = previous
+    valid = indexes >= 0
+    indexes = np.maximum(indexes, 0)
+    if tolerance_ns is not None:
+        valid &= np.abs(grid - times_ns[indexes]) <= tolerance_ns
+    return indexes, valid, values[indexes]
+
+
+def _linear(grid, times_ns, values, tolerance_ns):
+    """
+    Interpolate linearly between the samples either side of each grid time.
+    Returns the indexes of the earlier samples, whether each grid time has
+    a value and the values.
+
+    """
+    if not len(times_ns):
+        indexes, valid, new_values = _no_samples(grid, values)
+        return indexes, valid, new_values.astype(float)
+    before = np.searchsorted(times_ns, grid, side="right") - 1
+    valid = before >= 0
+    before = np.maximum(before, 0)
+    after = np.minimum(before + 1, len(times_ns) - 1)
+    # After the last sample only its own time has a value
+    valid &= (after > before) | (times_ns[before] == grid)
+    fraction = (grid - times_ns[before]) / np.maximum(times_ns[after] - times_ns[before], 1)
+    start = values[before].astype(float)
+    end = values[after].astype(float)
+    exact = times_ns[before] == grid
+    if start.ndim == 2:
+        fraction = fraction[:, np.newaxis]
+        exact = exact[:, np.newaxis]
+    # Samples at grid times are used as they are, as 0 * NaN would be NaN
+    # if the next sample is NaN
+    with np.errstate(invalid="ignore"):
+        new_values = np.where(exact, start, start + fraction * (end - start))
+    if tolerance_ns is not None:
+        valid &= grid - times_ns[before] <= tolerance_ns
+        valid &= (times_ns[after] - grid <= tolerance_ns) | (times_ns[before] == grid)
+    return before, valid, new_values
+
+
+def _no_samples(grid, values):
+    """The result of _take for a channel without samples."""
+    indexes = np.zeros(len(grid), dtype=np.intp)
+    valid = np.zeros(len(grid), dtype=bool)
+    return indexes, valid, np.zeros((len(grid),) + values.shape[1:], values.dtype)
+
+
+def _take_codes(codes_array, indexes, valid, fill):
+    """Take statuses or severities for the grid, using fill where invalid."""
+    if len(codes_array):
+        taken = codes_array[indexes]
+    else:
+        taken = np.zeros(len(indexes), dtype=np.uint16)
+    return np.where(valid, taken, fill).astype(np.uint16)
+
+
+def _fill_invalid(values, valid):
+    """Replace values at invalid grid times with NaN, or None for objects."""
+    if valid.all():
+        return values
+    mask = ~valid
+    if values.dtype == object:
+        values = values.copy()
+        values[mask] = None
+        return values
+    values = values.astype(float)
+    values[mask] = np.nan
+    return values
+
+
+def _ns_from_duration(duration):
+    """Convert seconds or a timedelta to integer nanoseconds."""
+    if isinstance(duration, datetime.timedelta):
+        return (
+            duration.days * utils.SECONDS_PER_DAY + duration.seconds
+        ) * utils.NANOSECONDS_PER_SECOND + duration.microseconds * 1000
+    return int(round(duration * utils.NANOSECONDS_PER_SECOND))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import time
+
+from . import utils
+from .models import ArchiveProperties
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (host, channel)
+);
+CREATE TABLE IF NOT EXISTS archives (
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    key INTEGER NOT NULL,
+    start_sec INTEGER NOT NULL,
+    start_nano INTEGER NOT NULL,
+    end_sec INTEGER NOT NULL,
+    end_nano INTEGER NOT NULL,
+    PRIMARY KEY (host, channel, position)
+);
+CREATE TABLE IF NOT EXISTS scans (
+    host TEXT PRIMARY KEY,
+    updated REAL NOT NULL
+);
+"""
+
+
+def connect(path, timeout=30.0):
+    """
+    Open an SQLite database that may be shared between processes. Writers
+    wait up to timeout seconds for each other rather than failing.
+
+    """
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class ArchiveCatalog(object):
+    """
+    Persistent store of which archives contain each channel, shared between
+    processes through an SQLite file. Entries are kept per archiver host.
+
+    Example usage:
+
+        >>> catalog = ArchiveCatalog('~/.channelarchiver.db', ttl=3600)
+        >>> archiver = Archiver(url, catalog=catalog)
+
+    """
+
+    def __init__(self, path, ttl=24 * utils.SECONDS_PER_HOUR):
+        """
+        Args:
+            path (str): Path to the SQLite database file. It will be created
+                if it does not exist.
+            ttl (Optional[float]): Number of seconds after which entries are
+                considered stale and should be refreshed.
+                Default: 1 day
+
+        """
+        super(ArchiveCatalog, self).__init__()
+        self.path = path
+        self.ttl = ttl
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self):
+        return _Connection(connect(self.path))
+
+    def is_stale(self, updated):
+        """Whether an entry updated at the given time has expired."""
+        return time.time() - updated > self.ttl
+
+    def last_full_scan(self, host):
+        """Time of the last scan of all channels on host, or None."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT updated FROM scans WHERE host = ?", (host,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def load(self, host, channels=None):
+        """
+        Load the archives for channels on host.
+
+        Args:
+            host (str): The archiver URL.
+            channels (Optional[List[str]]): The channels to load. If omitted,
+                all channels for host are loaded.
+
+        Returns:
+            A dict mapping each channel found in the catalog to a tuple of
+            its list of ArchiveProperties and the time it was last updated.
+
+        """
+        with self._connect() as connection:
+            if channels is None:
+                rows = connection.execute(
+                    "SELECT channel, updated FROM channels WHERE host = ?", (host,)
+                ).fetchall()
+                archive_rows = connection.execute(
+                    "SELECT channel, key, start_sec, start_nano, end_sec, end_nano "
+                    "FROM archives WHERE host = ? ORDER BY channel, position",
+                    (host,),
+                ).fetchall()
+            else:
+                rows = []
+                archive_rows = []
+                for channel in channels:
+                    rows += connection.execute(
+                        "SELECT channel, updated FROM channels "
+                        "WHERE host = ? AND channel = ?",
+                        (host, channel),
+                    ).fetchall()
+                    archive_rows += connection.execute(
+                        "SELECT channel, key, start_sec, start_nano, end_sec, end_nano "
+                        "FROM archives WHERE host = ? AND channel = ? ORDER BY position",
+                        (host, channel),
+                    ).fetchall()
+
+        entries = {channel: ([], updated) for channel, updated in rows}
+        for channel, key, start_sec, start_nano, end_sec, end_nano in archive_rows:
+            if channel not in entries:
+                continue
+            start_time = utils.datetime_from_sec_and_nano(start_sec, start_nano, utils.utc)
+            end_time = utils.datetime_from_sec_and_nano(end_sec, end_nano, utils.utc)
+            entries[channel][0].append(ArchiveProperties(key, start_time, end_time))
+        return entries
+
+    def store(self, host, archives_for_channel, full_scan=False):
+        """
+        Replace the entries for the channels in archives_for_channel.
+
+        Args:
+            host (str): The archiver URL.
+            archives_for_channel (dict): Mapping of channel names to lists of
+                ArchiveProperties. Channels with an empty list are recorded
+                as not being in any archive.
+            full_scan (Optional[bool]): Whether archives_for_channel is the
+                result of scanning for all channels.
+
+        """
+        updated = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for channel, archives in archives_for_channel.items():
+                connection.execute(
+                    "DELETE FROM archives WHERE host = ? AND channel = ?",
+                    (host, channel),
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO channels (host, channel, updated) "
+                    "VALUES (?, ?, ?)",
+                    (host, channel, updated),
+                )
+                for position, (key, start_time, end_time) in enumerate(archives):
+                    connection.execute(
+                        "INSERT INTO archives VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (host, channel, position, key)
+                        + utils.sec_and_nano_from_datetime(start_time)
+                        + utils.sec_and_nano_from_datetime(end_time),
+                    )
+            if full_scan:
+                connection.execute(
+                    "INSERT OR REPLACE INTO scans (host, updated) VALUES (?, ?)",
+                    (host, updated),
+                )
+            connection.execute("COMMIT")
+
+
+class _Connection(object):
+    """Context manager that closes an SQLite connection, rolling back on error."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None and self.connection.in_transaction:
+            self.connection.execute("ROLLBACK")
+        self.connection.close()
@@ -5,39 +5,386 @@ try:
 except ImportError:  # Python 2
     from xmlrpclib import Server
 
-from collections import defaultdict
+import contextlib
+import datetime
+import re
+import threading
+import time
+import warnings
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from itertools import groupby
 
 from . import codes
+from . import models
 from . import utils
-from .models import ChannelData, ArchiveProperties, Limits
-from .exceptions import ChannelNotFound, ChannelKeyMismatch
+from .models import ChannelData, ArchiveProperties, Limits, QueryPlan
+from .structures import IntervalIndex, LRUCache, NameIndex, SampleColumns
+from .transport import default_transport, last_response_size
+from .exceptions import (
+    ArchiverTimeout,
+    ChannelNotFound,
+    SamplesSkippedWarning,
+    ChannelKeyMismatch,
+    NumpyNotInstalled,
+)
+
+
+# Number of raw samples requested to estimate how many an interval holds
+PROBE_LIMIT = 100
+
+# Seconds before the present for which archives may still be receiving
+# samples, so results reaching into that period expire from the cache
+SETTLE_TIME = 60
+
+# Number of idle proxies kept for calls made with a deadline or hedging
+MAX_IDLE_PROXIES = 16
 
 
 class Archiver(object):
     """Class for interacting with an EPICS Channel Access Archiver."""
 
-    def __init__(self, host):
+    def __init__(
+        self,
+        host,
+        max_workers=1,
+        catalog=None,
+        sample_store=None,
+        cache_size=None,
+        cache_ttl=30.0,
+        transport=None,
+        max_channels_per_request=None,
+        max_pattern_length=4096,
+        timeout=None,
+        retry=None,
+        hedge=None,
+        hooks=None,
+        max_count=None,
+    ):
         """
         Args:
             host (str): URL to your archiver's ArchiveDataServer.cgi. Will
                 look something like: http://cr01arc01/cgi-bin/ArchiveDataServer.cgi
+            max_workers (Optional[int]): Maximum number of requests to have in
+                flight at once. When greater than 1, requests to different
+                archives are sent concurrently from a thread pool, with each
+                worker thread using its own connection to the archiver.
+                Default: 1
+            catalog (Optional[ArchiveCatalog]): A persistent catalog used to
+                remember which archives contain each channel between
+                processes. Scans only contact the archiver for channels that
+                are missing from the catalog; expired entries are still used
+                while they are refreshed in the background.
+            sample_store (Optional[SampleStore]): A persistent store of raw
+                samples. Raw data is then assembled from the store, with only
+                the parts of the requested interval that it does not hold
+                being requested from the archiver. A request returning fewer
+                samples than limit is assumed to be complete.
+            cache_size (Optional[int]): If given, results of .get() are kept in
+                an in-memory least recently used cache holding at most this
+                many bytes of data. Repeated calls with the same arguments are
+                then answered from the cache. The cache, including its hit and
+                miss counts, is available as the cache attribute.
+            cache_ttl (Optional[float]): Seconds to keep cached results that
+                may still change, as they reach past the end of the
+                channels' archives found by the last scan or into the last
+                SETTLE_TIME seconds. If None, such results are not cached.
+                Other results are kept until evicted.
+                Default: 30
+            transport (Optional[xmlrpc.client.Transport]): The transport used
+                for XML-RPC requests, such as a PooledTransport. It is shared
+                by every thread making requests, both the worker threads and
+                any threads calling the Archiver's methods, so must be
+                thread-safe if max_workers is greater than 1 or the Archiver
+                is used from several threads. If omitted, each of those
+                threads uses its own standard HTTP transport and
+                connection. Responses to values requests are decoded with
+                a streaming parser that stores samples in compact columns
+                unless a transport without ValuesParserMixin is given.
+            max_channels_per_request (Optional[int]): Maximum number of
+                channels to request from the archiver in a single call.
+                Larger groups of channels are split into several calls,
+                which are sent concurrently if max_workers allows. If
+                omitted, all the channels for an archive are requested
+                together.
+            max_pattern_length (Optional[int]): Maximum length of the
+                regular expressions sent to the archiver when scanning for
+                channels. Scans for more channels than fit in one pattern are
+                split into several requests to each archive.
+                Default: 4096
+            timeout (Optional[float]): Seconds to wait for a connection to
+                the archiver and for each read from it before the call fails
+                with a socket timeout. Only applies to the standard
+                transport; a PooledTransport has its own timeouts. If
+                omitted, calls wait indefinitely. Calls made under a
+                deadline also time out when it passes. Calls beaten by a
+                hedged duplicate keep running in the background until they
+                complete or time out, so a timeout is required with hedge
+                unless a transport is given.
+            retry (Optional[RetryPolicy]): If given, calls that fail with a
+                connection error, timeout or temporary HTTP error are
+                repeated after a jittered exponential backoff.
+            hedge (Optional[HedgePolicy]): If given, a call that is slower
+                than the policy's threshold is sent again on another
+                connection and the first response is used.
+            hooks (Optional[Hooks]): Instrumentation hooks, from
+                channelarchiver.instrumentation, that are told the latency
+                and response size of each call, the samples parsed and the
+                time spent parsing and converting times, and the result of
+                each cache lookup.
+            max_count (Optional[int]): The most samples the archiver returns
+                for a channel in one values call, as set in the
+                ArchiveDataServer's configuration. When paginating, pages
+                with fewer than min(limit, max_count) samples are known to
+                be complete. If omitted, it is learned when the archiver is
+                seen to cut a page short.
 
         """
         super(Archiver, self).__init__()
-        self.server = Server(host)
+        https = host.lower().startswith("https:")
+        if getattr(transport, "https", https) != https:
+            raise ValueError(
+                f"The transport's https setting does not match the scheme of {host}"
+            )
+        if hedge is not None and timeout is None and transport is None:
+            raise ValueError("A timeout is required to bound hedged calls")
+        self.host = host
+        self.max_workers = max_workers
+        self.transport = transport
+        self.timeout = timeout
+        self.server = self._new_server()
         self.archiver = self.server.archiver
         self.archives_for_channel = defaultdict(list)
+        self._archive_indexes = {}
+        self._local = threading.local()
+        self._owner_thread = threading.current_thread()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.catalog = catalog
+        self.sample_store = sample_store
+        self.cache = None if cache_size is None else LRUCache(cache_size)
+        self.cache_ttl = cache_ttl
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._archives_lock = threading.Lock()
+        self.max_channels_per_request = max_channels_per_request
+        self.max_pattern_length = max_pattern_length
+        self._name_index = None
+        self.retry = retry
+        self.hedge = hedge
+        self.hooks = hooks
+        self.max_count = max_count
+        self._observed_max_count = None
+        self._idle_proxies = []
+
+    def _new_server(self, transport=None):
+        if transport is None:
+            transport = self._new_transport()
+        return Server(self.host, transport=transport)
+
+    def _new_transport(self):
+        if self.transport is not None:
+            return self.transport
+        return default_transport(self.host, self.timeout)
+
+    def _new_proxy(self):
+        """Create a proxy for the archiver with its own connection."""
+        return self._new_server().archiver
+
+    def _proxy(self):
+        """
+        Return the archiver proxy to be used by the current thread. The
+        thread that created the Archiver uses the archiver attribute and
+        other threads are given proxies of their own, as proxies are not
+        thread-safe.
+
+        """
+        proxy = getattr(self._local, "archiver", None)
+        if proxy is None:
+            if threading.current_thread() is self._owner_thread:
+                return self.archiver
+            proxy = self._local.archiver = self._new_proxy()
+        return proxy
+
+    def _map(self, func, items):
+        """
+        Apply func to each of items, concurrently if max_workers allows,
+        and return the results in the same order as items.
+
+        """
+        items = list(items)
+        if self.max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        deadline = getattr(self._local, "deadline", None)
+
+        def call_in_worker(item):
+            if not hasattr(self._local, "archiver"):
+                self._local.archiver = self._new_proxy()
+            self._local.deadline = deadline
+            try:
+                return func(item)
+            finally:
+                self._local.deadline = None
 
-    def scan_archives(self, channels=None):
+        # The pool is kept between calls so each worker's proxy, and its
+        # connection, can be reused.
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return list(self._executor.map(call_in_worker, items))
+
+    @contextlib.contextmanager
+    def _deadline(self, seconds):
+        """Limit calls made by the current thread to the next seconds."""
+        previous = getattr(self._local, "deadline", None)
+        deadline = time.monotonic() + seconds
+        if previous is not None:
+            deadline = min(deadline, previous)
+        self._local.deadline = deadline
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+
+    def _call(self, method, *args):
+        """
+        Call an archiver method, applying the retry and hedge policies and
+        the deadline of the current thread.
+
+        """
+        retry = 0
+        while True:
+            deadline = getattr(self._local, "deadline", None)
+            if deadline is not None and time.monotonic() >= deadline:
+                raise ArchiverTimeout(f"Deadline passed before calling {method}")
+            try:
+                if deadline is None and self.hedge is None:
+                    return self._invoke(self._proxy(), method, args)
+                return self._call_in_thread(method, args, deadline)
+            except Exception as e:
+                if (
+                    self.retry is None
+                    or retry + 1 >= self.retry.attempts
+                    or not self.retry.is_retryable(e)
+                ):
+                    raise
+                delay = self.retry.delay(retry)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise ArchiverTimeout(f"Deadline passed while retrying {method}") from e
+                time.sleep(delay)
+                retry += 1
+
+    def _invoke(self, proxy, method, args):
+        """Make a single call with proxy, reporting it to the hooks."""
+        if self.hooks is None and self.hedge is None:
+            return getattr(proxy, method)(*args)
+        archive_key = args[0] if method in ("names", "values") else None
+        started = time.perf_counter()
+        try:
+            result = getattr(proxy, method)(*args)
+        except Exception as e:
+            if self.hooks is not None:
+                self.hooks.on_call(method, archive_key, time.perf_counter() - started, e)
+            raise
+        seconds = time.perf_counter() - started
+        if self.hedge is not None:
+            self.hedge.record(method, seconds)
+        if self.hooks is not None:
+            self.hooks.on_call(method, archive_key, seconds)
+            size = last_response_size()
+            if size is not None:
+                self.hooks.on_response(method, archive_key, size)
+        return result
+
+    def _call_in_thread(self, method, args, deadline):
+        """
+        Make a call on its own thread so that it can be abandoned when the
+        deadline passes, sending a duplicate if it is slower than the hedge
+        threshold. Each call thread borrows an idle proxy, and so a
+        connection, which it returns if the call succeeds. Abandoned calls
+        only hold their own thread, which ends when the call completes or
+        its socket times out. The standard transport's socket timeout is
+        limited to the time left before the deadline.
+
+        """
+
+        def call(future):
+            with self._executor_lock:
+                idle = self._idle_proxies.pop() if self._idle_proxies else None
+            if idle is None:
+                transport = self._new_transport()
+                proxy = self._new_server(transport).archiver
+            else:
+                proxy, transport = idle
+            if transport is not self.transport:
+                transport.timeout = self.timeout
+                if deadline is not None:
+                    remaining = max(0.001, deadline - time.monotonic())
+                    transport.timeout = min(remaining, self.timeout or remaining)
+            try:
+                result = self._invoke(proxy, method, args)
+            except Exception as e:
+                # The proxy's connection may be broken so it is not reused
+                future.set_exception(e)
+                return
+            with self._executor_lock:
+                if len(self._idle_proxies) < MAX_IDLE_PROXIES:
+                    self._idle_proxies.append((proxy, transport))
+            future.set_result(result)
+
+        def start_call():
+            future = Future()
+            threading.Thread(target=call, args=(future,), daemon=True).start()
+            return future
+
+        hedge_at = None
+        if self.hedge is not None:
+            hedge_delay = self.hedge.delay(method)
+            if hedge_delay is not None:
+                hedge_at = time.monotonic() + hedge_delay
+        pending = {start_call()}
+        error = None
+        while pending:
+            wake_times = [t for t in (hedge_at, deadline) if t is not None]
+            timeout = None
+            if wake_times:
+                timeout = max(0, min(wake_times) - time.monotonic())
+            done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            now = time.monotonic()
+            if pending and deadline is not None and now >= deadline:
+                raise ArchiverTimeout(f"Deadline passed waiting for {method}")
+            if pending and hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                self.hedge.count_hedge()
+                pending.add(start_call())
+        raise error
+
+    def _batches(self, channels):
+        """Split channels into lists of at most max_channels_per_request."""
+        size = self.max_channels_per_request
+        if not size or len(channels) <= size:
+            return [channels]
+        return [channels[i : i + size] for i in range(0, len(channels), size)]
+
+    def scan_archives(self, channels=None, incremental=False):
         """
         Determine which archives contain the specified channels. This
         can be called prior to calling .get() with scan_archives=False
-        to speed up data retrieval.
+        to speed up data retrieval. The archives are scanned concurrently
+        if the archiver was created with max_workers greater than 1.
 
         Args:
             channels (Optional[List[str]]): The channel names to scan for.
                 If omitted, all channels will be scanned for.
+            incremental (Optional[bool]): If True, only scan for the channels
+                that have not been found by a previous scan. Has no effect if
+                channels is omitted.
+                Default: False
 
         """
 
@@ -46,13 +393,97 @@ class Archiver(object):
         elif isinstance(channels, utils.StrType):
             channels = [channels]
 
-        channel_pattern = "|".join(channels)
-        list_emptied_for_channel = defaultdict(bool)
-        for archive in self.archiver.archives():
-            archive_key = archive["key"]
-            archives = self.archiver.names(archive_key, channel_pattern)
+        if incremental and channels:
+            channels = [c for c in channels if not self.archives_for_channel.get(c)]
+            if not channels:
+                return
+
+        if self.catalog is None:
+            self._scan(channels)
+        else:
+            self._scan_with_catalog(channels)
+
+    def search(self, pattern, refresh=False):
+        """
+        Find the names of archived channels matching a pattern. The first
+        search scans for all channels, through the catalog if there is one,
+        and later searches are answered from a local index of the names
+        found without contacting the archiver.
+
+        Example usage:
+
+            >>> archiver.search('SR11BCM01:*')
+            ['SR11BCM01:CURRENT_MONITOR', 'SR11BCM01:LIFETIME_MONITOR']
+
+        Args:
+            pattern (str): A case-sensitive shell-style pattern, where *
+                matches any characters, ? matches a single character and
+                [seq] matches any character in seq. Searches for a literal
+                prefix such as 'SR11BCM01:*' are fastest.
+            refresh (Optional[bool]): If True, scan for all channels again
+                before searching.
+                Default: False
+
+        Returns:
+            A sorted list of channel names.
+
+        """
+        name_index = self._name_index
+        if refresh or name_index is None:
+            self.scan_archives()
+            archives_for_channel = self.archives_for_channel
+            name_index = NameIndex(
+                channel for channel, archives in archives_for_channel.items() if archives
+            )
+            with self._archives_lock:
+                # Not kept if a background refresh has replaced the channels
+                if self.archives_for_channel is archives_for_channel:
+                    self._name_index = name_index
+        return name_index.search(pattern)
+
+    def _update_archives(self, found, full_scan):
+        """
+        Add the archives found for channels to archives_for_channel. The
+        dictionary is replaced rather than changed in place, as background
+        refreshes may update it while other threads are reading it. After a
+        full scan the name index is rebuilt by the next search.
+
+        """
+        with self._archives_lock:
+            archives_for_channel = self.archives_for_channel.copy()
+            archives_for_channel.update(found)
+            self.archives_for_channel = archives_for_channel
+            if full_scan:
+                self._name_index = None
+
+    def _scan(self, channels):
+        """
+        Scan the archives for channels, update archives_for_channel and
+        return the archives found for each channel. Each archive is sent
+        anchored patterns matching exactly the channel names, split so no
+        pattern is longer than max_pattern_length, and the names returned
+        are checked against the channels requested.
+
+        """
+        if channels:
+            wanted = set(channels)
+            patterns = _channel_patterns(_unique(channels), self.max_pattern_length)
+        else:
+            wanted = None
+            patterns = [""]
+
+        def names(request):
+            archive_key, pattern = request
+            return archive_key, self._call("names", archive_key, pattern)
+
+        archive_keys = [archive["key"] for archive in self._call("archives")]
+        requests = [(key, pattern) for key in archive_keys for pattern in patterns]
+        found = defaultdict(list)
+        for archive_key, archives in self._map(names, requests):
             for archive_details in archives:
                 channel = archive_details["name"]
+                if wanted is not None and channel not in wanted:
+                    continue
                 start_time = utils.datetime_from_sec_and_nano(
                     archive_details["start_sec"],
                     archive_details["start_nano"],
@@ -62,17 +493,89 @@ class Archiver(object):
                     archive_details["end_sec"], archive_details["end_nano"], utils.utc
                 )
                 properties = ArchiveProperties(archive_key, start_time, end_time)
-                if list_emptied_for_channel[channel]:
-                    self.archives_for_channel[channel].append(properties)
-                else:
-                    self.archives_for_channel[channel][:] = [properties]
-                    list_emptied_for_channel[channel] = True
+                found[channel].append(properties)
+        self._update_archives(found, full_scan=not channels)
+        return found
+
+    def _scan_with_catalog(self, channels):
+        """
+        Scan for channels using the catalog. Channels missing from the
+        catalog are scanned for straight away while stale entries are used
+        as is and refreshed in the background.
+
+        """
+        if not channels:
+            last_full_scan = self.catalog.last_full_scan(self.host)
+            if last_full_scan is None:
+                self._refresh(channels)
+                return
+            cached = self.catalog.load(self.host)
+            stale = self.catalog.is_stale(last_full_scan)
+        else:
+            cached = self.catalog.load(self.host, channels)
+            stale = any(self.catalog.is_stale(t) for _, t in cached.values())
+        self._update_archives(
+            {channel: archives for channel, (archives, _) in cached.items() if archives},
+            full_scan=not channels,
+        )
+
+        missing = [channel for channel in channels if channel not in cached]
+        if missing:
+            self._refresh(missing)
+        if stale and not channels:
+            self._refresh_in_background([])
+        elif stale:
+            self._refresh_in_background(
+                [
+                    channel
+                    for channel, (_, updated) in cached.items()
+                    if self.catalog.is_stale(updated)
+                ]
+            )
+
+    def _refresh(self, channels):
+        """Scan for channels and store the results in the catalog."""
+        found = self._scan(channels)
+        for channel in channels:
+            found.setdefault(channel, [])
+        self.catalog.store(self.host, found, full_scan=not channels)
 
-    def _parse_values(self, archive_data, tz):
+    def _refresh_in_background(self, channels):
+        key = tuple(sorted(channels))
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            self._local.archiver = self._new_proxy()
+            try:
+                self._refresh(channels)
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _parse_values(self, archive_data, tz, columnar=False):
+        if self.hooks is None:
+            return self._channel_data(archive_data, tz, columnar)
+        started = time.perf_counter()
+        channel_data = self._channel_data(archive_data, tz, columnar)
+        seconds = time.perf_counter() - started
+        channel_data.hooks = self.hooks
+        self.hooks.on_parse(channel_data.channel, len(channel_data.times_ns), seconds)
+        return channel_data
+
+    def _channel_data(self, archive_data, tz, columnar=False):
+        """Convert the data for a channel returned by values to ChannelData."""
         channel_data = ChannelData(
             channel=archive_data["name"],
             data_type=archive_data["type"],
             elements=archive_data["count"],
+            tz=tz,
         )
 
         meta_data = archive_data["meta"]
@@ -91,27 +594,555 @@ class Archiver(object):
             channel_data.display_precision = meta_data["prec"]
             channel_data.units = meta_data["units"]
 
+        if columnar:
+            times_ns, values, statuses, severities = models.columns_from_samples(
+                archive_data["values"], channel_data.data_type, channel_data.elements
+            )
+            channel_data.times_ns = times_ns
+            channel_data.values = values
+            channel_data.statuses = statuses
+            channel_data.severities = severities
+            return channel_data
+
+        # Datetimes are only created if times is accessed
+        samples = archive_data["values"]
+        if isinstance(samples, SampleColumns):
+            channel_data.values = samples.value_lists(channel_data.elements)
+            channel_data.times_ns = samples.times_ns()
+            channel_data.statuses = list(samples.stat)
+            channel_data.severities = list(samples.sevr)
+            return channel_data
+
+        ns_per_sec = utils.NANOSECONDS_PER_SECOND
         statuses = []
         severities = []
-        times = []
+        times_ns = []
         values = []
-        for sample in archive_data["values"]:
+        for sample in samples:
             if channel_data.elements == 1:
                 values.append(sample["value"][0])
             else:
                 values.append(sample["value"])
             statuses.append(sample["stat"])
             severities.append(sample["sevr"])
-            times.append(
-                utils.datetime_from_sec_and_nano(sample["secs"], sample["nano"], tz)
-            )
+            times_ns.append(sample["secs"] * ns_per_sec + sample["nano"])
         channel_data.values = values
-        channel_data.times = times
+        channel_data.times_ns = times_ns
         channel_data.statuses = statuses
         channel_data.severities = severities
 
         return channel_data
 
+    def _iter_pages(
+        self,
+        archive_key,
+        channels,
+        start_sec,
+        start_nano,
+        end_sec,
+        end_nano,
+        limit,
+        interpolation,
+    ):
+        """
+        Request values page by page, yielding the archive data for each
+        channel as it arrives. The first page is requested for all channels
+        at once. Channels whose page was full, holding min(limit, max_count)
+        samples, and did not reach the end of the interval are then followed
+        up from their last timestamp until a request returns no new samples,
+        with channels sharing a timestamp requested together. Samples
+        repeated at a page boundary are only yielded once.
+
+        If the archiver's max_count is unknown, the longest pages of each
+        response are also followed up in case the archiver cut them short,
+        and max_count is learned when a follow-up shows that it did.
+
+        A follow-up that is full of samples already seen, as is always the
+        case with pages of one sample, can make no progress, so the next
+        request starts 1 ns after that timestamp. Any further samples at the
+        timestamp cannot be requested and a SamplesSkippedWarning is given.
+
+        """
+        skipped = {}
+        pending = [(list(channels), start_sec, start_nano, None, None)]
+        while pending:
+            page_channels, page_sec, page_nano, boundary, previous_size = pending.pop(0)
+            data = self._call(
+                "values",
+                archive_key,
+                page_channels,
+                page_sec,
+                page_nano,
+                end_sec,
+                end_nano,
+                limit,
+                interpolation,
+            )
+            max_count = self.max_count
+            if max_count is None:
+                max_count = self._observed_max_count
+            page_limit = limit if max_count is None else min(limit, max_count)
+            full = page_limit
+            if max_count is None:
+                longest = max([len(archive_data["values"]) for archive_data in data] or [0])
+                full = min(limit, longest)
+            follow_ups = defaultdict(list)
+            for archive_data in data:
+                samples = archive_data["values"]
+                page_size = len(samples)
+                if boundary is not None:
+                    samples = _drop_boundary_samples(samples, *boundary)
+                    archive_data["values"] = samples
+                    if samples and previous_size < limit and self.max_count is None:
+                        # The previous page was cut short by the archiver
+                        self._observed_max_count = previous_size
+                    if not samples:
+                        if page_size >= page_limit or (
+                            max_count is None and page_size >= previous_size
+                        ):
+                            # The page was filled by samples we already have,
+                            # possibly cut short at an unknown max_count, so
+                            # step past the boundary timestamp.
+                            skipped.setdefault(archive_data["name"], boundary[0])
+                            next_time = _next_time(*boundary[0])
+                            follow_ups[next_time, (next_time, 0), page_size].append(
+                                archive_data["name"]
+                            )
+                        continue
+                yield archive_data
+                if not samples or page_size < full:
+                    continue
+                last_time = (samples[-1]["secs"], samples[-1]["nano"])
+                if last_time >= (end_sec, end_nano):
+                    continue
+                repeats = 0
+                if boundary is not None and boundary[0] == last_time:
+                    repeats = boundary[1]
+                for sample in reversed(samples):
+                    if (sample["secs"], sample["nano"]) != last_time:
+                        break
+                    repeats += 1
+                follow_ups[last_time, (last_time, repeats), page_size].append(
+                    archive_data["name"]
+                )
+            for (page_time, page_boundary, page_size), names in sorted(follow_ups.items()):
+                pending.append((names, page_time[0], page_time[1], page_boundary, page_size))
+        if skipped:
+            channel, (sec, nano) = min(skipped.items())
+            warnings.warn(
+                f"Samples of {len(skipped)} channels, such as {channel} at "
+                f"{sec}.{nano:09d}, may have been skipped as more samples share a "
+                "timestamp than fit in one page",
+                SamplesSkippedWarning,
+                stacklevel=2,
+            )
+
+    def _values(
+        self,
+        archive_key,
+        channels,
+        start_sec,
+        start_nano,
+        end_sec,
+        end_nano,
+        limit,
+        interpolation,
+        paginate=False,
+    ):
+        if self.sample_store is not None and interpolation == codes.interpolation.RAW:
+            return self._values_from_store(
+                archive_key,
+                channels,
+                start_sec,
+                start_nano,
+                end_sec,
+                end_nano,
+                limit,
+                paginate,
+            )
+        return self._fetch_values(
+            archive_key,
+            channels,
+            start_sec,
+            start_nano,
+            end_sec,
+            end_nano,
+            limit,
+            interpolation,
+            paginate,
+        )
+
+    def _values_from_store(
+        self,
+        archive_key,
+        channels,
+        start_sec,
+        start_nano,
+        end_sec,
+        end_nano,
+        limit,
+        paginate,
+    ):
+        """
+        Get raw values using the sample store, only requesting the parts of
+        the interval the store does not already hold.
+
+        """
+        store = self.sample_store
+        raw = codes.interpolation.RAW
+        ns_per_sec = utils.NANOSECONDS_PER_SECOND
+        start_ns = start_sec * ns_per_sec + start_nano
+        end_ns = end_sec * ns_per_sec + end_nano
+
+        # All the channels share one connection to the store
+        with store.session():
+            channels_for_gap = defaultdict(list)
+            for channel in channels:
+                for gap in store.gaps(self.host, channel, archive_key, raw, start_ns, end_ns):
+                    channels_for_gap[gap].append(channel)
+
+            # Samples may still be written after the end of the archive, or in
+            # the last settle_time seconds, so those periods are not recorded as
+            # held by the store.
+            settled_ns = int((time.time() - store.settle_time) * ns_per_sec)
+
+            for (gap_start, gap_end), channels_in_gap in sorted(channels_for_gap.items()):
+                data = self._fetch_values(
+                    archive_key,
+                    channels_in_gap,
+                    *divmod(gap_start, ns_per_sec),
+                    *divmod(gap_end, ns_per_sec),
+                    limit,
+                    raw,
+                    paginate,
+                )
+                for archive_data in data:
+                    samples = archive_data["values"]
+                    # A full page may have been cut short so only the part of
+                    # the gap up to its last sample is known to be complete.
+                    covered_end = gap_end
+                    if not paginate and samples and len(samples) >= limit:
+                        last = samples[-1]
+                        covered_end = last["secs"] * ns_per_sec + last["nano"]
+                    covered_end = min(
+                        covered_end,
+                        settled_ns,
+                        self._archive_end_ns(archive_data["name"], archive_key, settled_ns),
+                    )
+                    store.add(
+                        self.host, archive_key, raw, archive_data, gap_start, gap_end, covered_end
+                    )
+
+            data = []
+            for channel in channels:
+                archive_data = store.load(
+                    self.host,
+                    channel,
+                    archive_key,
+                    raw,
+                    start_ns,
+                    end_ns,
+                    None if paginate else limit,
+                )
+                if archive_data is not None:
+                    data.append(archive_data)
+            return data
+
+    def _is_final(self, channels, end):
+        """
+        Whether the data for channels up to end can no longer change: end is
+        more than SETTLE_TIME seconds ago and not after the end of the
+        archives found for each channel by the last scan.
+
+        """
+        now = datetime.datetime.now(utils.utc)
+        if end > now - datetime.timedelta(seconds=SETTLE_TIME):
+            return False
+        for channel in channels:
+            archives = self.archives_for_channel.get(channel)
+            if archives and end > max(archive.end_time for archive in archives):
+                return False
+        return True
+
+    def _archive_end_ns(self, channel, archive_key, default):
+        """The end time found by the last scan of an archive of a channel."""
+        for archive in self.archives_for_channel.get(channel, []):
+            if archive.key == archive_key:
+                return utils.ns_from_datetime(archive.end_time)
+        return default
+
+    def _fetch_values(
+        self,
+        archive_key,
+        channels,
+        start_sec,
+        start_nano,
+        end_sec,
+        end_nano,
+        limit,
+        interpolation,
+        paginate=False,
+    ):
+        if not paginate:
+            return self._call(
+                "values",
+                archive_key,
+                channels,
+                start_sec,
+                start_nano,
+                end_sec,
+                end_nano,
+                limit,
+                interpolation,
+            )
+        data_for_channel = {}
+        pages = self._iter_pages(
+            archive_key,
+            channels,
+            start_sec,
+            start_nano,
+            end_sec,
+            end_nano,
+            limit,
+            interpolation,
+        )
+        for archive_data in pages:
+            channel = archive_data["name"]
+            if channel in data_for_channel:
+                data_for_channel[channel]["values"].extend(archive_data["values"])
+            else:
+                data_for_channel[channel] = archive_data
+        return list(data_for_channel.values())
+
+    def _archive_index(self, channel):
+        """
+        Return the IntervalIndex for the archives holding channel. Indexes
+        are kept between calls and rebuilt when the channel's list of
+        archives is replaced or grows.
+
+        """
+        archives = self.archives_for_channel.get(channel, [])
+        index = self._archive_indexes.get(channel)
+        if index is None or not index.is_current(archives):
+            index = IntervalIndex(archives)
+            self._archive_indexes[channel] = index
+        return index
+
+    def _select_archive(self, channel, start_ns, end_ns):
+        """Return the key of the archive with the greatest coverage of the interval."""
+        index = self._archive_index(channel)
+        position = index.best(start_ns, end_ns)
+        if position is None:
+            raise ChannelNotFound(
+                f"Channel {channel} not found in any archive (a scan may be needed)"
+            )
+        return index.archives[position].key
+
+    def _plan_segments(self, channels, start, end):
+        """
+        Split the interval for each channel into consecutive segments, one
+        for each archive covering part of it, so the data can be stitched
+        together. Archives are taken in order of their start times and each
+        segment begins where the previous one ended, so overlapping archives
+        are not requested twice.
+
+        Returns:
+            A dict mapping (archive_key, segment_start, segment_end) to the
+            channels to request for that segment, and a dict giving the key
+            of the archive covering most of the interval for each channel.
+
+        """
+        channels_for_segment = defaultdict(list)
+        key_for_channel = {}
+        start_ns = utils.ns_from_datetime(start)
+        end_ns = utils.ns_from_datetime(end)
+        for channel in channels:
+            index = self._archive_index(channel)
+            archives = [
+                index.archives[position]
+                for position, _ in index.overlaps(start_ns, end_ns)
+            ]
+            if not archives:
+                archive_key = self._select_archive(channel, start_ns, end_ns)
+                channels_for_segment[(archive_key, start, end)].append(channel)
+                key_for_channel[channel] = archive_key
+                continue
+            segment_start = start
+            coverage = defaultdict(datetime.timedelta)
+            for index, archive in enumerate(archives):
+                if index == len(archives) - 1:
+                    segment_end = end
+                else:
+                    segment_end = min(archive.end_time, end)
+                if segment_end <= segment_start:
+                    continue
+                channels_for_segment[(archive.key, segment_start, segment_end)].append(
+                    channel
+                )
+                coverage[archive.key] += segment_end - segment_start
+                segment_start = segment_end
+            key_for_channel[channel] = max(coverage, key=coverage.get)
+        return channels_for_segment, key_for_channel
+
+    def _channels_for_key(self, channels, start, end, scan_archives, archive_keys):
+        """Group channels by the key of the archive to request them from."""
+        if archive_keys is None:
+            if scan_archives:
+                self.scan_archives(channels)
+            start_ns = utils.ns_from_datetime(start)
+            end_ns = utils.ns_from_datetime(end)
+            channels_for_key = defaultdict(list)
+            for channel in _unique(channels):
+                archive_key = self._select_archive(channel, start_ns, end_ns)
+                channels_for_key[archive_key].append(channel)
+        else:
+            # Group by archive key so we can request multiple channels
+            # with a single query
+            if len(channels) != len(archive_keys):
+                raise ChannelKeyMismatch(
+                    "Number of archive keys must equal number of channels."
+                )
+            key_for_channel = dict(zip(channels, archive_keys))
+            grouping_func = key_for_channel.get
+            groups = groupby(sorted(key_for_channel, key=grouping_func), key=grouping_func)
+            channels_for_key = {key: list(channels) for key, channels in groups}
+        return channels_for_key
+
+    def plan_query(
+        self,
+        channels,
+        start,
+        end,
+        points,
+        probe=True,
+        scan_archives=True,
+        archive_keys=None,
+        stitch=False,
+    ):
+        """
+        Choose the cheapest way to retrieve about points samples for each
+        channel, as .get(points=...) does. Raw data is used when there are
+        no more than points samples in the interval, in which case it is
+        requested in full with pagination, and the archiver's plot-binning
+        otherwise.
+
+        The number of raw samples is estimated by probing: the first
+        PROBE_LIMIT raw samples of the interval are requested and their rate
+        is extrapolated over the part of the interval the channel's archives
+        cover. A probe that returns fewer samples than requested holds the
+        complete raw data. Without a probe only the archive coverage is
+        known and plot-binning is chosen unless no archive covers the
+        interval.
+
+        Args:
+            channels (str or List[str]): The channels to get data for.
+            start (str or datetime): Start time.
+            end (str or datetime): End time.
+            points (int): The number of samples wanted for each channel,
+                such as the width of a plot in pixels.
+            probe (Optional[bool]): Whether to make a probe request.
+                Default: True
+            scan_archives (Optional[bool]): Whether to scan for the channels
+                first. See .get().
+                Default: True
+            archive_keys (Optional[List[int]]): See .get().
+            stitch (Optional[bool]): See .get().
+                Default: False
+
+        Returns:
+            A QueryPlan giving the interpolation, limit and paginate
+            arguments chosen, the estimated number of raw samples for the
+            busiest channel (None if unknown) and the reason for the choice.
+
+        """
+        plan, _ = self._plan_query(
+            channels, start, end, points, probe, scan_archives, archive_keys, None, stitch, False
+        )
+        return plan
+
+    def _plan_query(
+        self,
+        channels,
+        start,
+        end,
+        points,
+        probe,
+        scan_archives,
+        archive_keys,
+        tz,
+        stitch,
+        columnar,
+    ):
+        """
+        Make the plan for plan_query. Returns the plan and, when the probe
+        returned the complete raw data, the probe's result from .get().
+
+        """
+        if isinstance(channels, utils.StrType):
+            channels = [channels]
+        start, end, tz = _normalize_times(start, end, tz)
+        if scan_archives and archive_keys is None:
+            self.scan_archives(channels)
+        start_ns = utils.ns_from_datetime(start)
+        end_ns = utils.ns_from_datetime(end)
+
+        covered_for_channel = {}
+        for channel in _unique(channels):
+            if archive_keys is not None:
+                covered_for_channel[channel] = end_ns - start_ns
+                continue
+            overlaps = self._archive_index(channel).overlaps(start_ns, end_ns)
+            covered = sum(overlap for _, overlap in overlaps)
+            covered_for_channel[channel] = min(covered, end_ns - start_ns)
+        if not any(covered_for_channel.values()):
+            return QueryPlan("raw", points, False, 0, "no archive covers the interval"), None
+        if not probe:
+            plan = QueryPlan(
+                "plot-binning", points, False, None, "the number of raw samples is unknown"
+            )
+            return plan, None
+
+        probe_limit = min(points, PROBE_LIMIT)
+        probe_data = self.get(
+            channels,
+            start,
+            end,
+            limit=probe_limit,
+            interpolation="raw",
+            scan_archives=False,
+            archive_keys=archive_keys,
+            tz=tz,
+            stitch=stitch,
+            columnar=columnar,
+        )
+        complete = True
+        estimated = 0
+        for channel_data in probe_data:
+            times_ns = channel_data.times_ns
+            count = len(times_ns)
+            if count < probe_limit:
+                estimated = max(estimated, count)
+                continue
+            complete = False
+            # Stitched data holds up to probe_limit samples from each
+            # archive, so the rate is taken from the first probe_limit.
+            # Samples sharing one time are treated as 1 ns apart.
+            count = probe_limit
+            span = max(int(times_ns[count - 1]) - max(int(times_ns[0]), start_ns), 1)
+            covered = covered_for_channel[channel_data.channel]
+            estimated = max(estimated, count * covered // span)
+        if complete:
+            plan = QueryPlan(
+                "raw", probe_limit, False, estimated, "the probe returned every sample"
+            )
+            return plan, probe_data
+        if estimated <= points:
+            return QueryPlan("raw", points, True, estimated, "the raw samples fit in points"), None
+        plan = QueryPlan(
+            "plot-binning", points, False, estimated, "there are more raw samples than points"
+        )
+        return plan, None
+
     def get(
         self,
         channels,
@@ -122,12 +1153,19 @@ class Archiver(object):
         scan_archives=True,
         archive_keys=None,
         tz=None,
+        paginate=False,
+        stitch=False,
+        columnar=False,
+        points=None,
+        probe=True,
+        deadline=None,
     ):
         """
         Retrieves archived data.
 
         Args:
-            channels (str or List[str]): The channels to get data for.
+            channels (str or List[str]): The channels to get data for. A
+                channel listed more than once is only requested once.
             start (str or datetime): Start time as a datetime or ISO 8601
                 formatted string.  If no timezone is specified, assumes
                 local timezone.
@@ -150,6 +1188,42 @@ class Archiver(object):
                 requested time interval will be used.
             tz (Optional[tzinfo]): The timezone that datetimes should be returned
                 in. If omitted, the timezone of start will be used.
+            paginate (Optional[bool]): Whether to keep requesting data from
+                the last returned timestamp until end is reached. This
+                retrieves all the samples in the interval even if there are
+                more than limit or the maximum count allowed by the archiver,
+                in which case limit is the number of samples per request.
+                Intended for use with 'raw' interpolation. As each request
+                starts at a timestamp, samples sharing a timestamp with
+                more samples than fit in one page cannot all be retrieved,
+                and a SamplesSkippedWarning is given when some may have been
+                skipped.
+                Default: False
+            stitch (Optional[bool]): Whether to combine data from every archive
+                covering part of the requested interval rather than only using
+                the archive with the greatest coverage. The interval is split at
+                archive boundaries, the segments are requested separately
+                (concurrently if max_workers allows) and merged in time order,
+                with samples repeated at the boundaries removed. limit applies
+                to each segment. archive_key on the returned data is the key of
+                the archive with the greatest coverage. Ignored if archive_keys
+                is given.
+                Default: False
+            columnar (Optional[bool]): Whether to store the data in numpy arrays
+                rather than lists. Times are kept as an int64 array in times_ns.
+                Requires numpy.
+                Default: False
+            points (Optional[int]): The number of samples wanted for each
+                channel, such as the width of a plot in pixels. If given,
+                limit, interpolation and paginate are chosen by
+                .plan_query() and the plan is stored in the query_plan
+                attribute of the returned data.
+            probe (Optional[bool]): Whether .plan_query() may make a probe
+                request. Only used with points.
+                Default: True
+            deadline (Optional[float]): Maximum number of seconds for the
+                whole call, including scans, retries and pages. If it passes,
+                ArchiverTimeout is raised.
 
         Returns:
             ChannelData objects. If the channels parameters was a string the
@@ -158,70 +1232,235 @@ class Archiver(object):
 
         """
 
+        if deadline is not None:
+            with self._deadline(deadline):
+                return self.get(
+                    channels,
+                    start,
+                    end,
+                    limit=limit,
+                    interpolation=interpolation,
+                    scan_archives=scan_archives,
+                    archive_keys=archive_keys,
+                    tz=tz,
+                    paginate=paginate,
+                    stitch=stitch,
+                    columnar=columnar,
+                    points=points,
+                    probe=probe,
+                )
+
         received_str = isinstance(channels, utils.StrType)
         if received_str:
             channels = [channels]
             if archive_keys is not None:
                 archive_keys = [archive_keys]
 
-        if isinstance(start, utils.StrType):
-            start = utils.datetime_from_isoformat(start)
-        if isinstance(end, utils.StrType):
-            end = utils.datetime_from_isoformat(end)
-        if isinstance(interpolation, utils.StrType):
-            interpolation = codes.interpolation[interpolation]
+        if columnar and not models.HAS_NUMPY:
+            raise NumpyNotInstalled("Numpy is required for columnar data")
 
-        if start.tzinfo is None:
-            start = utils.localize_datetime(start, utils.local_tz)
+        start, end, tz = _normalize_times(start, end, tz)
 
-        if end.tzinfo is None:
-            end = utils.localize_datetime(end, utils.local_tz)
+        plan = None
+        if points is not None:
+            plan, probe_data = self._plan_query(
+                channels,
+                start,
+                end,
+                points,
+                probe,
+                scan_archives,
+                archive_keys,
+                tz,
+                stitch,
+                columnar,
+            )
+            if probe_data is not None:
+                for channel_data in probe_data:
+                    channel_data.query_plan = plan
+                return probe_data if not received_str else probe_data[0]
+            limit = plan.limit
+            interpolation = plan.interpolation
+            paginate = plan.paginate
+            scan_archives = False
 
-        if tz is None:
-            tz = start.tzinfo
+        if isinstance(interpolation, utils.StrType):
+            interpolation = codes.interpolation[interpolation]
 
         # Convert datetimes to seconds and nanoseconds for archiver request
         start_sec, start_nano = utils.sec_and_nano_from_datetime(start)
         end_sec, end_nano = utils.sec_and_nano_from_datetime(end)
 
-        if archive_keys is None:
+        if self.cache is not None:
+            cache_key = (
+                tuple(channels),
+                start_sec,
+                start_nano,
+                end_sec,
+                end_nano,
+                limit,
+                interpolation,
+                None if archive_keys is None else tuple(archive_keys),
+                repr(tz),
+                paginate,
+                stitch,
+                columnar,
+            )
+            cached_data = self.cache.get(cache_key)
+            if self.hooks is not None:
+                self.hooks.on_cache(cached_data is not None)
+            if cached_data is not None:
+                return_data = [
+                    None if channel_data is None else models.detached_copy(channel_data)
+                    for channel_data in cached_data
+                ]
+                return return_data if not received_str else return_data[0]
+
+        if stitch and archive_keys is None:
             if scan_archives:
                 self.scan_archives(channels)
-            channels_for_key = defaultdict(list)
-            for channel in channels:
-                greatest_overlap = None
-                key_with_greatest_overlap = None
-                archives = self.archives_for_channel[channel]
-                for archive_key, archive_start, archive_end in archives:
-                    overlap = utils.overlap_between_intervals(
-                        start, end, archive_start, archive_end
-                    )
-                    if greatest_overlap is None or overlap > greatest_overlap:
-                        key_with_greatest_overlap = archive_key
-                        greatest_overlap = overlap
-                if key_with_greatest_overlap is None:
-                    raise ChannelNotFound(
-                        f"Channel {channel} not found in any archive (a scan may be needed)"
-                    )
-                channels_for_key[key_with_greatest_overlap].append(channel)
+            channels_for_segment, key_for_channel = self._plan_segments(
+                _unique(channels), start, end
+            )
+            # Requests are made in time order so each channel's segments can
+            # be appended to one another as they are received.
+            requests = []
+            for segment in sorted(channels_for_segment, key=lambda seg: seg[1]):
+                archive_key, segment_start, segment_end = segment
+                times = utils.sec_and_nano_from_datetime(
+                    segment_start
+                ) + utils.sec_and_nano_from_datetime(segment_end)
+                for batch in self._batches(channels_for_segment[segment]):
+                    requests.append((archive_key, batch) + times)
         else:
-            # Group by archive key so we can request multiple channels
-            # with a single query
-            if len(channels) != len(archive_keys):
-                raise ChannelKeyMismatch(
-                    "Number of archive keys must equal number of channels."
-                )
-            key_for_channel = dict(zip(channels, archive_keys))
-            grouping_func = key_for_channel.get
-            groups = groupby(sorted(channels, key=grouping_func), key=grouping_func)
-            channels_for_key = {key: list(channels) for key, channels in groups}
+            channels_for_key = self._channels_for_key(
+                channels, start, end, scan_archives, archive_keys
+            )
+            requests = [
+                (archive_key, batch, start_sec, start_nano, end_sec, end_nano)
+                for archive_key, channels_on_archive in channels_for_key.items()
+                for batch in self._batches(channels_on_archive)
+            ]
+            key_for_channel = None
+
+        def fetch(request):
+            data = self._values(*request, limit, interpolation, paginate)
+            return request[0], data
+
+        data_for_channel = {}
+        for archive_key, data in self._map(fetch, requests):
+            for archive_data in data:
+                channel = archive_data["name"]
+                if channel in data_for_channel:
+                    _extend_samples(data_for_channel[channel][1], archive_data["values"])
+                else:
+                    data_for_channel[channel] = (archive_key, archive_data)
+
+        positions = defaultdict(list)
+        for index, channel in enumerate(channels):
+            positions[channel].append(index)
 
         return_data = [None] * len(channels)
+        for channel, (archive_key, archive_data) in data_for_channel.items():
+            channel_data = self._parse_values(archive_data, tz, columnar)
+            channel_data.archive_key = archive_key
+            if key_for_channel is not None:
+                channel_data.archive_key = key_for_channel[channel]
+            channel_data.interpolation = interpolation
+            channel_data.query_plan = plan
+            # A channel requested more than once gets a copy at each position
+            for i, index in enumerate(positions[channel]):
+                return_data[index] = models.detached_copy(channel_data) if i else channel_data
+
+        if self.cache is not None:
+            final = self._is_final(channels, end)
+            if final or self.cache_ttl is not None:
+                size = sum(
+                    channel_data.nbytes
+                    for channel_data in return_data
+                    if channel_data is not None
+                )
+                # The cache keeps its own copies so callers can modify the data
+                cached_data = [
+                    None if channel_data is None else models.detached_copy(channel_data)
+                    for channel_data in return_data
+                ]
+                self.cache.put(cache_key, cached_data, size, None if final else self.cache_ttl)
+
+        return return_data if not received_str else return_data[0]
+
+    def iter_values(
+        self,
+        channels,
+        start,
+        end,
+        limit=1000,
+        interpolation="raw",
+        scan_archives=True,
+        archive_keys=None,
+        tz=None,
+        columnar=False,
+    ):
+        """
+        Retrieves archived data in chunks. Data is requested page by page,
+        as with .get(paginate=True), but each page is yielded as soon as it
+        is received rather than being accumulated, so memory use is bounded
+        by the page size regardless of the length of the interval.
+
+        Args:
+            channels (str or List[str]): The channels to get data for.
+            start (str or datetime): Start time.
+            end (str or datetime): End time.
+            limit (Optional[int]): Maximum number of samples to request per
+                page.
+            interpolation (Optional[str]): Method of interpolating the data.
+                Default: 'raw'
+            scan_archives (Optional[bool]): Whether or not to perform a scan to
+                determine which archives the channels are on.
+                Default: True
+            archive_keys (Optional[List[int]]): The keys of the archives to get
+                data from. Should be the same length as channels.
+            tz (Optional[tzinfo]): The timezone that datetimes should be returned
+                in. If omitted, the timezone of start will be used.
+            columnar (Optional[bool]): Whether to store each chunk in numpy
+                arrays rather than lists. See .get().
+                Default: False
+
+        Yields:
+            ChannelData objects each holding one page of samples for one
+            channel. Pages for a channel are yielded in time order but pages
+            for different channels may be interleaved.
+
+        """
 
-        for archive_key, channels_on_archive in channels_for_key.items():
-            data = self.archiver.values(
+        if isinstance(channels, utils.StrType):
+            channels = [channels]
+            if archive_keys is not None:
+                archive_keys = [archive_keys]
+
+        if columnar and not models.HAS_NUMPY:
+            raise NumpyNotInstalled("Numpy is required for columnar data")
+
+        start, end, tz = _normalize_times(start, end, tz)
+        if isinstance(interpolation, utils.StrType):
+            interpolation = codes.interpolation[interpolation]
+
+        start_sec, start_nano = utils.sec_and_nano_from_datetime(start)
+        end_sec, end_nano = utils.sec_and_nano_from_datetime(end)
+
+        channels_for_key = self._channels_for_key(
+            channels, start, end, scan_archives, archive_keys
+        )
+
+        batches = [
+            (archive_key, batch)
+            for archive_key, channels_on_archive in channels_for_key.items()
+            for batch in self._batches(channels_on_archive)
+        ]
+        for archive_key, batch in batches:
+            pages = self._iter_pages(
                 archive_key,
-                channels_on_archive,
+                batch,
                 start_sec,
                 start_nano,
                 end_sec,
@@ -229,11 +1468,117 @@ class Archiver(object):
                 limit,
                 interpolation,
             )
-            for archive_data in data:
-                channel_data = self._parse_values(archive_data, tz)
+            for archive_data in pages:
+                channel_data = self._parse_values(archive_data, tz, columnar)
                 channel_data.archive_key = archive_key
                 channel_data.interpolation = interpolation
-                index = channels.index(channel_data.channel)
-                return_data[index] = channel_data
+                yield channel_data
 
-        return return_data if not received_str else return_data[0]
+
+def _normalize_times(start, end, tz):
+    """
+    Parse start and end if they are strings, localize them if they are
+    naive and choose the timezone returned data should be in.
+
+    """
+    if isinstance(start, utils.StrType):
+        start = utils.datetime_from_isoformat(start)
+    if isinstance(end, utils.StrType):
+        end = utils.datetime_from_isoformat(end)
+
+    if start.tzinfo is None:
+        start = utils.localize_datetime(start, utils.local_tz)
+
+    if end.tzinfo is None:
+        end = utils.localize_datetime(end, utils.local_tz)
+
+    if tz is None:
+        tz = start.tzinfo
+
+    return start, end, tz
+
+
+def _channel_patterns(channels, max_length):
+    """
+    Build regular expressions matching exactly the given channel names,
+    grouping as many names into each as fit in max_length characters. A
+    name too long to fit on its own still gets a pattern.
+
+    """
+    patterns = []
+    names = []
+    length = 0
+    for channel in channels:
+        name = _escape_name(channel)
+        # Room for the name, a separator and the anchors
+        if names and length + len(name) + 1 + 4 > max_length:
+            patterns.append("^(" + "|".join(names) + ")$")
+            names = []
+            length = 0
+        length += len(name) + (1 if names else 0)
+        names.append(name)
+    if names:
+        patterns.append("^(" + "|".join(names) + ")$")
+    return patterns
+
+
+def _escape_name(channel):
+    """
+    Escape the characters in a channel name that are special in POSIX
+    extended regular expressions, which ArchiveDataServer uses.
+
+    """
+    return _special_characters.sub(r"\\\1", channel)
+
+
+def _unique(channels):
+    """Return channels without repeats, keeping the order they first appear in."""
+    return list(OrderedDict.fromkeys(channels))
+
+
+def _extend_samples(archive_data, samples):
+    """
+    Append samples to the samples in archive_data, skipping any at the
+    start that are at or before the last sample already present.
+
+    """
+    existing = archive_data["values"]
+    if existing:
+        last_time = (existing[-1]["secs"], existing[-1]["nano"])
+        repeats = 0
+        for sample in reversed(existing):
+            if (sample["secs"], sample["nano"]) != last_time:
+                break
+            repeats += 1
+        samples = _drop_boundary_samples(samples, last_time, repeats)
+    existing.extend(samples)
+
+
+def _drop_boundary_samples(samples, boundary_time, repeats):
+    """
+    Remove samples from the start of a follow-up page that were already
+    returned by the previous page: samples before boundary_time and up to
+    repeats samples stamped exactly at boundary_time.
+
+    """
+    index = 0
+    for sample in samples:
+        sample_time = (sample["secs"], sample["nano"])
+        if sample_time > boundary_time:
+            break
+        if sample_time == boundary_time:
+            if repeats == 0:
+                break
+            repeats -= 1
+        index += 1
+    return samples[index:]
+
+
+def _next_time(seconds, nanoseconds):
+    nanoseconds += 1
+    if nanoseconds == 1000000000:
+        return seconds + 1, 0
+    return seconds, nanoseconds
+
+
+_special_characters = re.compile(r"([\\.\[\](){}*+?|^$])")
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client-side downsampling of ChannelData to a size suitable for plotting,
+for use on raw data held locally instead of the archiver's plot-binning and
+averaged interpolation. Bins are reduced with numpy reductions rather than
+a loop over the samples.
+
+Every point of the result carries the status and severity of the sample
+with the worst alarm severity in its bin, so alarms are not hidden by
+downsampling.
+
+Example usage:
+
+    >>> from channelarchiver.downsample import downsample
+    >>> data = archiver.get(channel, '2013-01', '2013-08', interpolation='raw')
+    >>> plot_data = downsample(data, 2000, method='lttb')
+
+"""
+
+from . import codes
+from . import exceptions
+from .models import HAS_NUMPY, channel_arrays, with_arrays
+
+if HAS_NUMPY:
+    import numpy as np
+
+
+METHODS = ["minmax", "lttb", "mean"]
+
+
+def downsample(data, points, method="minmax"):
+    """
+    Reduce channels to at most a number of points.
+
+    Args:
+        data (ChannelData or List[ChannelData]): The data to downsample.
+        points (int): The maximum number of points for each channel.
+        method (Optional[str]): 'minmax' keeps the lowest and highest sample
+            in each of points / 2 equal time bins, 'lttb' picks the samples
+            that best preserve the shape of the data with the Largest
+            Triangle Three Buckets algorithm and 'mean' averages each of
+            points equal time bins.
+            Default: 'minmax'
+
+    Returns:
+        Downsampled ChannelData in columnar form, or a list of them if data
+        is a list.
+
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if isinstance(data, list):
+        return [downsample(channel_data, points, method) for channel_data in data]
+    if method == "minmax":
+        return minmax(data, max(1, points // 2))
+    elif method == "lttb":
+        return lttb(data, points)
+    return mean(data, points)
+
+
+def minmax(channel_data, bins):
+    """
+    Divide the time range of channel_data into equal bins and keep the
+    samples with the lowest and highest value in each, in time order. At
+    most 2 * bins points are returned. For waveforms the element-wise
+    minimum and maximum of each bin are returned at the times of its first
+    and last samples.
+
+    Args:
+        channel_data (ChannelData): The data to downsample.
+        bins (int): The number of time bins.
+
+    """
+    times_ns, values, statuses, severities = _arrays(channel_data)
+    if len(times_ns) <= 2 * bins:
+        return with_arrays(channel_data, times_ns, values, statuses, severities)
+    starts, counts = _time_bins(times_ns, bins)
+    bin_ids = np.repeat(np.arange(len(starts)), counts)
+    worst_status, worst_severity = _worst_alarms(statuses, severities, starts, counts, bin_ids)
+
+    if values.ndim == 1:
+        lowest = _first_in_bins(
+            values == np.repeat(np.fmin.reduceat(values, starts), counts), bin_ids, starts
+        )
+        highest = _first_in_bins(
+            values == np.repeat(np.fmax.reduceat(values, starts), counts), bin_ids, starts
+        )
+        indexes = np.column_stack([np.minimum(lowest, highest), np.maximum(lowest, highest)])
+        keep = np.column_stack([np.ones(len(starts), bool), lowest != highest]).ravel()
+        indexes = indexes.ravel()[keep]
+        new_times = times_ns[indexes]
+        new_values = values[indexes]
+    else:
+        # Bins with one sample only give one row
+        ends = starts + counts - 1
+        new_times = np.column_stack([times_ns[starts], times_ns[ends]]).ravel()
+        new_values = np.stack(
+            [np.fmin.reduceat(values, starts, axis=0), np.fmax.reduceat(values, starts, axis=0)],
+            axis=1,
+        ).reshape((-1,) + values.shape[1:])
+        keep = np.column_stack([np.ones(len(starts), bool), counts > 1]).ravel()
+        new_times = new_times[keep]
+        new_values = new_values[keep]
+    point_bins = np.repeat(np.arange(len(starts)), 2)[keep]
+    return with_arrays(
+        channel_data,
+        new_times,
+        new_values,
+        worst_status[point_bins],
+        worst_severity[point_bins],
+    )
+
+
+def mean(channel_data, bins):
+    """
+    Divide the time range of channel_data into equal bins and return the
+    mean value of each, ignoring NaNs, at the mean time of its samples.
+    Waveforms are averaged element by element.
+
+    Args:
+        channel_data (ChannelData): The data to downsample.
+        bins (int): The number of time bins.
+
+    """
+    times_ns, values, statuses, severities = _arrays(channel_data)
+    if channel_data.data_type == codes.data_type.ENUM:
+        raise ValueError("ENUM channels cannot be averaged")
+    if len(times_ns) <= bins:
+        return with_arrays(channel_data, times_ns, values, statuses, severities)
+    starts, counts = _time_bins(times_ns, bins)
+    bin_ids = np.repeat(np.arange(len(starts)), counts)
+    worst_status, worst_severity = _worst_alarms(statuses, severities, starts, counts, bin_ids)
+    values = values.astype(float)
+    present = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        new_values = np.add.reduceat(np.where(present, values, 0), starts, axis=0) / (
+            np.add.reduceat(present, starts, axis=0)
+        )
+    # Offsets from the start of each bin keep the sums in range
+    first_times = times_ns[starts]
+    offsets = (times_ns - np.repeat(first_times, counts)).astype(float)
+    new_times = first_times + np.round(np.add.reduceat(offsets, starts) / counts).astype(np.int64)
+    return with_arrays(channel_data, new_times, new_values, worst_status, worst_severity)
+
+
+def lttb(channel_data, points):
+    """
+    Select points samples with the Largest Triangle Three Buckets algorithm.
+    The first and last samples are always kept and the rest are split into
+    buckets of equal size. From each bucket the sample forming the largest
+    triangle with the sample chosen from the previous bucket and the mean of
+    the next bucket is kept. Waveforms are selected by the mean of their
+    elements and returned whole.
+
+    The loop is over buckets, with the samples of each bucket handled by
+    array operations.
+
+    Args:
+        channel_data (ChannelData): The data to downsample.
+        points (int): The number of samples to keep. Must be at least 3.
+
+    """
+    if points < 3:
+        raise ValueError("lttb needs at least 3 points")
+    times_ns, values, statuses, severities = _arrays(channel_data)
+    count = len(times_ns)
+    if count <= points:
+        return with_arrays(channel_data, times_ns, values, statuses, severities)
+
+    x = (times_ns - times_ns[0]).astype(float)
+    y = values.astype(float)
+    if y.ndim == 2:
+        y = y.mean(axis=1)
+    # Edges of the points - 2 buckets between the first and last samples
+    edges = np.linspace(1, count - 1, points - 1).astype(np.intp)
+    bucket_counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[: count - 1], edges[:-1]) / bucket_counts
+    mean_y = np.add.reduceat(y[: count - 1], edges[:-1]) / bucket_counts
+    mean_x = np.append(mean_x[1:], x[-1])
+    mean_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = count - 1
+    chosen = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[chosen] - mean_x[bucket]) * (y[start:end] - y[chosen])
+            - (x[chosen] - x[start:end]) * (mean_y[bucket] - y[chosen])
+        )
+        chosen = start + np.argmax(np.where(np.isnan(area), -1.0, area))
+        selected[bucket + 1] = chosen
+
+    starts = np.concatenate([[0], edges[:-1], [count - 1]])
+    counts = np.diff(np.append(starts, count))
+    bin_ids = np.repeat(np.arange(len(starts)), counts)
+    worst_status, worst_severity = _worst_alarms(statuses, severities, starts, counts, bin_ids)
+    return with_arrays(
+        channel_data, times_ns[selected], values[selected], worst_status, worst_severity
+    )
+
+
+def _arrays(channel_data):
+    if not HAS_NUMPY:
+        raise exceptions.NumpyNotInstalled("Numpy not found")
+    if channel_data.data_type == codes.data_type.STRING:
+        raise ValueError("STRING channels cannot be downsampled")
+    return channel_arrays(channel_data)
+
+
+def _time_bins(times_ns, bins):
+    """
+    Split sorted times into bins of equal duration covering them.
+
+    Returns:
+        The index of the first sample and the number of samples of each
+        bin that holds any samples.
+
+    """
+    first = int(times_ns[0])
+    width = -(-(int(times_ns[-1]) - first + 1) // bins)
+    edges = first + width * np.arange(bins, dtype=np.int64)
+    starts = np.searchsorted(times_ns, edges)
+    starts = np.unique(starts[starts < len(times_ns)])
+    counts = np.diff(np.append(starts, len(times_ns)))
+    return starts, counts
+
+
+def _first_in_bins(mask, bin_ids, starts):
+    """
+    Return the index of the first sample of each bin where mask is True, or
+    of the bin's first sample if there is none.
+
+    """
+    positions = np.flatnonzero(mask)
+    bins, first = np.unique(bin_ids[positions], return_index=True)
+    indexes = starts.copy()
+    indexes[bins] = positions[first]
+    return indexes
+
+
+def _worst_alarms(statuses, severities, starts, counts, bin_ids):
+    """
+    Return the status and severity of the sample with the worst alarm
+    severity in each bin. Severities above INVALID, which mark repeats and
+    archiver states rather than alarms, are only used for bins without
+    alarm severities.
+
+    """
+    rank = np.where(severities <= codes.severity.INVALID, severities.astype(np.int32), -1)
+    worst = np.maximum.reduceat(rank, starts)
+    indexes = _first_in_bins(rank == np.repeat(worst, counts), bin_ids, starts)
+    return statuses[indexes], severities[indexes]
@@ -9,5 +9,25 @@ class ChannelKeyMismatch(IndexError):
     """There should be the same number of keys as channels."""
 
 
+class ArchiverTimeout(TimeoutError):
+    """The archiver did not respond before the deadline."""
+
+
+class SamplesSkippedWarning(UserWarning):
+    """Samples sharing a timestamp at a page boundary may have been skipped."""
+
+
 class NumpyNotInstalled(ImportError):
     """Numpy must be installed for this operation."""
+
+
+class PandasNotInstalled(ImportError):
+    """Pandas must be installed for this operation."""
+
+
+class XarrayNotInstalled(ImportError):
+    """Xarray must be installed for this operation."""
+
+
+class PrometheusNotInstalled(ImportError):
+    """prometheus_client must be installed for this operation."""
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Conversion of the results of Archiver.get for several channels into pandas
+and xarray objects. Each channel is converted with ChannelData.to_pandas or
+ChannelData.to_xarray, which use the arrays of columnar mode without
+copying, so it is fastest to call get with columnar=True.
+
+Example usage:
+
+    >>> from channelarchiver.export import to_frame
+    >>> data = archiver.get(channels, '2013-08-10', '2013-08-11', columnar=True)
+    >>> frame = to_frame(data)
+    >>> frame.loc['SR11BCM01:CURRENT_MONITOR', 'value']
+
+"""
+
+from . import exceptions
+from .models import HAS_PANDAS, HAS_XARRAY
+
+if HAS_PANDAS:
+    import pandas as pd
+if HAS_XARRAY:
+    import xarray as xr
+
+
+def to_frame(data, categorical=True):
+    """
+    Combine the data for several channels into one pandas DataFrame in long
+    form, indexed by channel and time, with the columns of
+    ChannelData.to_pandas.
+
+    Args:
+        data (List[ChannelData]): The channels to combine, such as the
+            result of Archiver.get.
+        categorical (Optional[bool]): Whether statuses and severities are
+            categoricals of their names rather than integer codes.
+            Default: True
+
+    Returns:
+        A pandas DataFrame with a (channel, time) MultiIndex.
+
+    """
+    if not HAS_PANDAS:
+        raise exceptions.PandasNotInstalled("Pandas not found")
+    data = list(data)
+    if not data:
+        return pd.DataFrame()
+    return pd.concat(
+        [channel_data.to_pandas(categorical) for channel_data in data],
+        keys=[channel_data.channel for channel_data in data],
+        names=["channel", "time"],
+    )
+
+
+def to_xarray(data):
+    """
+    Combine the data for several channels into an xarray Dataset on the
+    union of their times. Each channel is a variable named after the
+    channel, with its statuses and severities in variables named
+    <channel>.status and <channel>.severity. Channels without a sample at a
+    time are NaN there. Waveforms share the element dimension and shorter
+    waveforms are padded with NaN. The times of each channel must be unique.
+
+    Args:
+        data (List[ChannelData]): The channels to combine, such as the
+            result of Archiver.get.
+
+    Returns:
+        An xarray Dataset with a time dimension in UTC.
+
+    """
+    if not HAS_XARRAY:
+        raise exceptions.XarrayNotInstalled("Xarray not found")
+    variables = {}
+    for channel_data in data:
+        array = channel_data.to_xarray()
+        for name in ["status", "severity"]:
+            flags = array.coords[name].reset_coords(drop=True)
+            variables[f"{channel_data.channel}.{name}"] = flags
+        variables[channel_data.channel] = array.drop_vars(["status", "severity"])
+    # Variables are aligned on the union of their coordinates
+    return xr.Dataset(variables)
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hooks for measuring where the time goes in Archiver calls. An Archiver
+given a Hooks object reports each XML-RPC call, the size of its response,
+the samples parsed from it, the conversion of times to datetimes and each
+lookup in the result cache.
+
+Example usage:
+
+    >>> from channelarchiver.instrumentation import StatsHooks
+    >>> stats = StatsHooks()
+    >>> archiver = Archiver(url, hooks=stats)
+    >>> data = archiver.get(channels, start, end)
+    >>> stats.calls[('values', 1001)]
+    CallStats(count=1, seconds=0.08, errors=0)
+
+"""
+
+import threading
+from collections import defaultdict, namedtuple
+
+try:
+    import prometheus_client
+
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+
+from . import exceptions
+
+
+CallStats = namedtuple("CallStats", "count seconds errors")
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Hooks(object):
+    """
+    Base class for instrumentation hooks. Every method does nothing, so
+    subclasses only override the measurements they want. Hooks may be
+    called from several threads at once when the Archiver has more than one
+    worker.
+
+    """
+
+    def on_call(self, method, archive_key, seconds, error=None):
+        """
+        Called after each XML-RPC call to the archiver, including retries
+        and hedged duplicates. The time includes receiving and decoding the
+        response, which for values calls is where most samples are parsed.
+
+        Args:
+            method (str): The archiver method, such as 'values' or 'names'.
+            archive_key (int): The archive the call was for, or None for
+                methods that do not take one.
+            seconds (float): How long the call took.
+            error (Exception): The exception raised by the call, if any.
+
+        """
+
+    def on_response(self, method, archive_key, size):
+        """
+        Called after each successful call with the number of bytes received,
+        before any gzip decoding. Only reported by transports using
+        ValuesParserMixin.
+
+        """
+
+    def on_parse(self, channel, samples, seconds):
+        """
+        Called after the response for a channel is converted into a
+        ChannelData object.
+
+        Args:
+            channel (str): The channel name.
+            samples (int): The number of samples.
+            seconds (float): Time spent in Archiver._parse_values.
+
+        """
+
+    def on_datetime_conversion(self, channel, samples, seconds):
+        """
+        Called when the times of a ChannelData object are first converted
+        from nanoseconds to datetimes.
+
+        """
+
+    def on_cache(self, hit):
+        """Called after each lookup in the result cache of Archiver.get."""
+
+
+class StatsHooks(Hooks):
+    """
+    Hooks that keep running totals in memory.
+
+    Attributes:
+        calls (Dict[Tuple[str, int], CallStats]): Number of calls, total
+            seconds and number of errors for each method and archive key.
+        response_bytes (Dict[str, int]): Bytes received for each method.
+        samples_parsed (int): Number of samples parsed.
+        parse_seconds (float): Total time spent in Archiver._parse_values.
+        datetime_seconds (float): Total time spent converting times to
+            datetimes.
+        cache_hits (int): Number of lookups answered by the result cache.
+        cache_misses (int): Number of lookups not found in the cache.
+
+    """
+
+    def __init__(self):
+        super(StatsHooks, self).__init__()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Set all totals back to zero."""
+        with self._lock:
+            self.calls = defaultdict(lambda: CallStats(0, 0.0, 0))
+            self.response_bytes = defaultdict(int)
+            self.samples_parsed = 0
+            self.parse_seconds = 0.0
+            self.datetime_seconds = 0.0
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    def on_call(self, method, archive_key, seconds, error=None):
+        with self._lock:
+            count, total, errors = self.calls[method, archive_key]
+            self.calls[method, archive_key] = CallStats(
+                count + 1, total + seconds, errors + (error is not None)
+            )
+
+    def on_response(self, method, archive_key, size):
+        with self._lock:
+            self.response_bytes[method] += size
+
+    def on_parse(self, channel, samples, seconds):
+        with self._lock:
+            self.samples_parsed += samples
+            self.parse_seconds += seconds
+
+    def on_datetime_conversion(self, channel, samples, seconds):
+        with self._lock:
+            self.datetime_seconds += seconds
+
+    def on_cache(self, hit):
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+
+class PrometheusHooks(Hooks):
+    """
+    Hooks that record metrics with prometheus_client. Call latencies and
+    parse times are histograms and the rest are counters, all named with
+    the given prefix:
+
+        <prefix>_request_seconds{method, archive_key}
+        <prefix>_request_errors_total{method, archive_key}
+        <prefix>_response_bytes_total{method}
+        <prefix>_samples_parsed_total
+        <prefix>_parse_seconds
+        <prefix>_datetime_conversion_seconds
+        <prefix>_cache_lookups_total{result}
+
+    Example usage:
+
+        >>> hooks = PrometheusHooks()
+        >>> archiver = Archiver(url, hooks=hooks)
+        >>> prometheus_client.start_http_server(8000)
+
+    """
+
+    def __init__(self, prefix="channelarchiver", registry=None):
+        """
+        Args:
+            prefix (Optional[str]): Prefix of the metric names.
+                Default: 'channelarchiver'
+            registry (Optional[CollectorRegistry]): The registry to add the
+                metrics to. If omitted, the default registry is used.
+
+        """
+        if not HAS_PROMETHEUS:
+            raise exceptions.PrometheusNotInstalled("prometheus_client not found")
+        super(PrometheusHooks, self).__init__()
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        self.request_seconds = prometheus_client.Histogram(
+            f"{prefix}_request_seconds",
+            "Latency of archiver XML-RPC calls",
+            ["method", "archive_key"],
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.request_errors = prometheus_client.Counter(
+            f"{prefix}_request_errors",
+            "Archiver XML-RPC calls that raised an exception",
+            ["method", "archive_key"],
+            registry=registry,
+        )
+        self.response_bytes = prometheus_client.Counter(
+            f"{prefix}_response_bytes",
+            "Bytes received from the archiver",
+            ["method"],
+            registry=registry,
+        )
+        self.samples_parsed = prometheus_client.Counter(
+            f"{prefix}_samples_parsed", "Samples parsed", registry=registry
+        )
+        self.parse_seconds = prometheus_client.Histogram(
+            f"{prefix}_parse_seconds",
+            "Time to convert the response for a channel to ChannelData",
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.datetime_seconds = prometheus_client.Histogram(
+            f"{prefix}_datetime_conversion_seconds",
+            "Time to convert the times of a channel to datetimes",
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.cache_lookups = prometheus_client.Counter(
+            f"{prefix}_cache_lookups",
+            "Lookups in the result cache",
+            ["result"],
+            registry=registry,
+        )
+
+    def on_call(self, method, archive_key, seconds, error=None):
+        labels = (method, "" if archive_key is None else str(archive_key))
+        self.request_seconds.labels(*labels).observe(seconds)
+        if error is not None:
+            self.request_errors.labels(*labels).inc()
+
+    def on_response(self, method, archive_key, size):
+        self.response_bytes.labels(method).inc(size)
+
+    def on_parse(self, channel, samples, seconds):
+        self.samples_parsed.inc(samples)
+        self.parse_seconds.observe(seconds)
+
+    def on_datetime_conversion(self, channel, samples, seconds):
+        self.datetime_seconds.observe(seconds)
+
+    def on_cache(self, hit):
+        self.cache_lookups.labels("hit" if hit else "miss").inc()
+
+
+class OpenTelemetryHooks(Hooks):
+    """
+    Hooks that record metrics with an OpenTelemetry Meter, using the same
+    names as PrometheusHooks with dots in place of underscores and seconds
+    and bytes as units. Only the create_histogram and create_counter
+    methods of the meter are used.
+
+    Example usage:
+
+        >>> from opentelemetry import metrics
+        >>> hooks = OpenTelemetryHooks(metrics.get_meter('channelarchiver'))
+        >>> archiver = Archiver(url, hooks=hooks)
+
+    """
+
+    def __init__(self, meter, prefix="channelarchiver"):
+        """
+        Args:
+            meter (opentelemetry.metrics.Meter): The meter to create the
+                instruments with.
+            prefix (Optional[str]): Prefix of the instrument names.
+                Default: 'channelarchiver'
+
+        """
+        super(OpenTelemetryHooks, self).__init__()
+        self.request_seconds = meter.create_histogram(
+            f"{prefix}.request.duration", unit="s", description="Latency of archiver calls"
+        )
+        self.request_errors = meter.create_counter(
+            f"{prefix}.request.errors", description="Archiver calls that raised an exception"
+        )
+        self.response_bytes = meter.create_counter(
+            f"{prefix}.response.size", unit="By", description="Bytes received from the archiver"
+        )
+        self.samples_parsed = meter.create_counter(
+            f"{prefix}.samples.parsed", description="Samples parsed"
+        )
+        self.parse_seconds = meter.create_histogram(
+            f"{prefix}.parse.duration", unit="s", description="Time to convert responses"
+        )
+        self.datetime_seconds = meter.create_histogram(
+            f"{prefix}.datetime_conversion.duration",
+            unit="s",
+            description="Time to convert times to datetimes",
+        )
+        self.cache_lookups = meter.create_counter(
+            f"{prefix}.cache.lookups", description="Lookups in the result cache"
+        )
+
+    def on_call(self, method, archive_key, seconds, error=None):
+        attributes = {"method": method}
+        if archive_key is not None:
+            attributes["archive_key"] = archive_key
+        self.request_seconds.record(seconds, attributes)
+        if error is not None:
+            self.request_errors.add(1, attributes)
+
+    def on_response(self, method, archive_key, size):
+        self.response_bytes.add(size, {"method": method})
+
+    def on_parse(self, channel, samples, seconds):
+        self.samples_parsed.add(samples)
+        self.parse_seconds.record(seconds)
+
+    def on_datetime_conversion(self, channel, samples, seconds):
+        self.datetime_seconds.record(seconds)
+
+    def on_cache(self, hit):
+        self.cache_lookups.add(1, {"result": "hit" if hit else "miss"})
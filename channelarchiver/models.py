@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import sys
+import time
 from collections import namedtuple
 
 from . import codes
 from . import utils
 from . import exceptions
+from .structures import SampleColumns
 
 
 try:
@@ -14,9 +18,26 @@ except ImportError:
 else:
     HAS_NUMPY = True
 
+try:
+    import pandas as pd
+except ImportError:
+    HAS_PANDAS = False
+else:
+    HAS_PANDAS = True
+
+try:
+    import xarray as xr
+except ImportError:
+    HAS_XARRAY = False
+else:
+    HAS_XARRAY = True
+
 
 ArchiveProperties = namedtuple("ArchiveProperties", "key start_time end_time")
 Limits = namedtuple("Limits", "low high")
+QueryPlan = namedtuple(
+    "QueryPlan", "interpolation limit paginate estimated_samples reason"
+)
 
 
 class ChannelData(object):
@@ -43,6 +64,19 @@ class ChannelData(object):
         display_precision (int): The number of decimal places to show in user
             interfaces.
         archive_key (int): The archive the data was pulled from.
+        times_ns (List[int]): Timestamps as integer nanoseconds since the Epoch.
+            This is how times are stored for retrieved data, as an int64 numpy
+            array in columnar mode, and times is computed from these when first
+            accessed.
+        tz (tzinfo): The timezone times are given in.
+        query_plan (QueryPlan): How the data was requested when .get() was
+            given a number of points rather than a limit and interpolation.
+        hooks (Hooks): Instrumentation hooks told how long the conversion of
+            times_ns to datetimes takes.
+
+    In columnar mode values, statuses and severities are numpy arrays rather
+    than lists. Waveform values are stored as a 2-D array with one row per
+    sample.
 
     """
 
@@ -63,13 +97,17 @@ class ChannelData(object):
         display_precision=None,
         archive_key=None,
         interpolation=None,
+        times_ns=None,
+        tz=None,
+        query_plan=None,
     ):
 
         super(ChannelData, self).__init__()
 
         self.channel = channel
         self.values = values
-        self.times = times
+        self._times = times
+        self._times_ns = times_ns
         self.statuses = statuses
         self.severities = severities
         self.units = units
@@ -82,11 +120,61 @@ class ChannelData(object):
         self.display_precision = display_precision
         self.archive_key = archive_key
         self.interpolation = interpolation
+        self.tz = tz
+        self.query_plan = query_plan
+        self.hooks = None
         self._array = None
 
+    @property
+    def times(self):
+        if self._times is None and self._times_ns is not None:
+            if self.hooks is None:
+                self._times = utils.datetimes_from_ns(self._times_ns, self.tz)
+            else:
+                started = time.perf_counter()
+                self._times = utils.datetimes_from_ns(self._times_ns, self.tz)
+                self.hooks.on_datetime_conversion(
+                    self.channel, len(self._times), time.perf_counter() - started
+                )
+        return self._times
+
+    @times.setter
+    def times(self, times):
+        self._times = times
+        self._times_ns = None
+
+    @property
+    def times_ns(self):
+        if self._times_ns is None and self._times is not None:
+            seconds, nanoseconds = utils.sec_and_nano_from_datetimes(self._times)
+            self._times_ns = [
+                sec * utils.NANOSECONDS_PER_SECOND + nano
+                for sec, nano in zip(seconds, nanoseconds)
+            ]
+        return self._times_ns
+
+    @times_ns.setter
+    def times_ns(self, times_ns):
+        self._times_ns = times_ns
+        self._times = None
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the values, times, statuses and severities."""
+        return sum(
+            _sizeof(attr)
+            for attr in [
+                self.values,
+                self._times,
+                self._times_ns,
+                self.statuses,
+                self.severities,
+            ]
+        )
+
     @property
     def array(self):
-        """Return the data in a numpy array structure."""
+        """Return the data in a numpy structured array."""
 
         if not HAS_NUMPY:
             raise exceptions.NumpyNotInstalled("Numpy not found")
@@ -94,28 +182,99 @@ class ChannelData(object):
         # Only compute the array once
         if self._array is None:
 
-            if self.data_type == codes.data_type.STRING:
-                value_dtype = np.str
-            elif self.data_type == codes.data_type.ENUM:
-                value_dtype = np.uint8
-            elif self.data_type == codes.data_type.INT:
-                value_dtype = np.int
-            else:
-                value_dtype = np.dtype(float)
-
+            times_ns = self.times_ns
+            value_shape = () if self.elements == 1 else (self.elements,)
             dtypes = [
-                ("time", np.dtype("datetime64[us]")),
-                ("value", value_dtype, self.elements),
-                ("status", np.uint8),
+                ("time", np.dtype("datetime64[ns]")),
+                ("value", value_dtype(self.data_type), value_shape),
+                ("status", np.uint16),
                 ("severity", np.uint16),
             ]
 
-            data = zip(self.times, self.values, self.statuses, self.severities)
-
-            self._array = np.array(data, dtype=dtypes)
+            array = np.empty(len(times_ns), dtype=dtypes)
+            array["time"] = np.asarray(times_ns, dtype=np.int64).view("datetime64[ns]")
+            array["value"] = self.values
+            array["status"] = self.statuses
+            array["severity"] = self.severities
+            self._array = array
 
         return self._array
 
+    def to_pandas(self, categorical=True):
+        """
+        Return the data as a pandas DataFrame indexed by time, with value,
+        status and severity columns. The numpy arrays of columnar mode are
+        used without copying. Waveform values occupy one column per element
+        under a ("value", element) column MultiIndex, so frame["value"] is a
+        2-D block of the waveforms.
+
+        Args:
+            categorical (Optional[bool]): If True, statuses and severities
+                are categoricals of their names, such as 'HIHI_ALARM' and
+                'MAJOR'. Otherwise they are left as integer codes.
+                Default: True
+
+        """
+        if not HAS_PANDAS:
+            raise exceptions.PandasNotInstalled("Pandas not found")
+
+        times_ns, values, statuses, severities = channel_arrays(self)
+        index = pd.DatetimeIndex(times_ns.view("datetime64[ns]"), name="time")
+        index = index.tz_localize("UTC")
+        if self.tz is not None:
+            index = index.tz_convert(self.tz)
+        if categorical:
+            statuses = _categorical(statuses, codes.status)
+            severities = _categorical(severities, codes.severity)
+
+        if values.ndim == 1:
+            columns = {"value": values, "status": statuses, "severity": severities}
+            return pd.DataFrame(columns, index=index, copy=False)
+        elements = pd.MultiIndex.from_product([["value"], range(values.shape[1])])
+        frame = pd.DataFrame(values, index=index, columns=elements, copy=False)
+        frame["status", ""] = statuses
+        frame["severity", ""] = severities
+        return frame
+
+    def to_xarray(self):
+        """
+        Return the data as an xarray DataArray named after the channel, with
+        a time dimension and, for waveforms, an element dimension. Statuses
+        and severities are time coordinates holding the integer codes, with
+        their names given by flag_values and flag_meanings attributes. Times
+        are in UTC. The numpy arrays of columnar mode are used without
+        copying.
+
+        """
+        if not HAS_XARRAY:
+            raise exceptions.XarrayNotInstalled("Xarray not found")
+
+        times_ns, values, statuses, severities = channel_arrays(self)
+        time = times_ns.view("datetime64[ns]")
+        coords = {
+            "time": time,
+            "status": ("time", statuses, _flag_attributes(codes.status)),
+            "severity": ("time", severities, _flag_attributes(codes.severity)),
+        }
+        if values.ndim == 1:
+            dims = ("time",)
+        else:
+            dims = ("time", "element")
+            coords["element"] = np.arange(values.shape[1])
+        attrs = {}
+        for attr in [
+            "units",
+            "states",
+            "display_limits",
+            "warn_limits",
+            "alarm_limits",
+            "display_precision",
+        ]:
+            value = getattr(self, attr)
+            if value is not None:
+                attrs[attr] = list(value) if isinstance(value, tuple) else value
+        return xr.DataArray(values, coords=coords, dims=dims, name=self.channel, attrs=attrs)
+
     def __repr__(self):
 
         if self.data_type == codes.data_type.DOUBLE:
@@ -124,13 +283,14 @@ class ChannelData(object):
             fmt = "{0!r}"
 
         s = "ChannelData(\n"
+        values = _as_list(self.values)
         if self.elements == 1:
-            s += utils.pretty_list_repr(self.values, fmt, prefix="    values=")
+            s += utils.pretty_list_repr(values, fmt, prefix="    values=")
         else:
-            s += utils.pretty_waveform_repr(self.values, fmt, prefix="    values=")
+            s += utils.pretty_waveform_repr(values, fmt, prefix="    values=")
         s += ",\n"
         for attr in ["times", "statuses", "severities", "states"]:
-            value = self.__getattribute__(attr)
+            value = _as_list(self.__getattribute__(attr))
             if value is None:
                 continue
             prefix = f"    {attr}="
@@ -157,22 +317,26 @@ class ChannelData(object):
 
     def __str__(self):
         times = ["time"] + [dt.strftime("%Y-%m-%d %H:%M:%S") for dt in self.times]
-        statuses = ["status"] + [codes.status.str_value(s) for s in self.statuses]
+        statuses = ["status"] + [
+            codes.status.str_value(s) for s in _as_list(self.statuses)
+        ]
         severities = ["severity"] + [
-            codes.severity.str_value(s) for s in self.severities
+            codes.severity.str_value(s) for s in _as_list(self.severities)
         ]
+        values = _as_list(self.values)
         times_len = max(len(s) for s in times)
         statuses_len = max(len(s) for s in statuses)
         severities_len = max(len(s) for s in severities)
         out = ""
         value_format = "{0:.9g}"
         if self.elements == 1:
-            values = ["value"] + [value_format.format(v) for v in self.values]
+            values = ["value"] + [value_format.format(v) for v in values]
         else:
             len_for_values = 79 - times_len - statuses_len - severities_len - 6
+            waveforms = values
             values = ["value"]
-            max_value_len = utils.max_value_len_in_waveform(self.values, value_format)
-            for value in self.values:
+            max_value_len = utils.max_value_len_in_waveform(waveforms, value_format)
+            for value in waveforms:
                 formatted_value = utils.pretty_list_repr(
                     value,
                     value_format,
@@ -201,3 +365,174 @@ class ChannelData(object):
                 else:
                     out += spec.format("", line.ljust(values_len), "", "")
         return out.rstrip()
+
+
+def value_dtype(data_type):
+    """Return the numpy dtype used to store values of the given data type."""
+    if data_type == codes.data_type.STRING:
+        return np.dtype(object)
+    elif data_type == codes.data_type.ENUM:
+        return np.dtype(np.uint16)
+    elif data_type == codes.data_type.INT:
+        return np.dtype(np.int32)
+    else:
+        return np.dtype(float)
+
+
+def columns_from_samples(samples, data_type, elements):
+    """
+    Build numpy arrays of times, values, statuses and severities directly
+    from the samples returned by the archiver.
+
+    Returns:
+        A tuple of (times_ns, values, statuses, severities) arrays. times_ns
+        holds int64 nanoseconds since the Epoch.
+
+    """
+    if isinstance(samples, SampleColumns):
+        return _columns_from_sample_columns(samples, data_type, elements)
+    count = len(samples)
+    ns_per_sec = utils.NANOSECONDS_PER_SECOND
+    times_ns = np.fromiter(
+        (sample["secs"] * ns_per_sec + sample["nano"] for sample in samples),
+        np.int64,
+        count,
+    )
+    statuses = np.fromiter((sample["stat"] for sample in samples), np.uint16, count)
+    severities = np.fromiter((sample["sevr"] for sample in samples), np.uint16, count)
+    dtype = value_dtype(data_type)
+    if elements == 1:
+        values = np.fromiter((sample["value"][0] for sample in samples), dtype, count)
+    else:
+        values = np.zeros((count, elements), dtype)
+        for row, sample in zip(values, samples):
+            value = sample["value"]
+            row[: len(value)] = value
+    return times_ns, values, statuses, severities
+
+
+def _columns_from_sample_columns(samples, data_type, elements):
+    """Build the arrays for columns_from_samples without a per-sample loop."""
+    count = len(samples)
+    times_ns = np.asarray(samples.secs, dtype=np.int64) * utils.NANOSECONDS_PER_SECOND
+    times_ns += np.asarray(samples.nano, dtype=np.int64)
+    statuses = np.asarray(samples.stat).astype(np.uint16)
+    severities = np.asarray(samples.sevr).astype(np.uint16)
+    dtype = value_dtype(data_type)
+    if samples.values is None:
+        flat = np.empty(0, dtype)
+    elif dtype == object:
+        flat = np.empty(len(samples.values), dtype)
+        flat[:] = samples.values
+    else:
+        flat = np.asarray(samples.values).astype(dtype)
+    if elements == 1 and samples.is_scalar():
+        values = flat
+    elif len(flat) == count * elements:
+        values = flat.reshape(count, elements)
+    else:
+        # Some samples hold fewer elements than the channel so pad them
+        offsets = np.asarray(samples.offsets)
+        values = np.zeros((count, elements), dtype)
+        for row, start, end in zip(values, offsets[:-1], offsets[1:]):
+            row[: end - start] = flat[start:end]
+        if elements == 1:
+            values = values[:, 0]
+    return times_ns, values, statuses, severities
+
+
+def channel_arrays(channel_data):
+    """
+    Return the times_ns, values, statuses and severities of channel_data as
+    numpy arrays, converting lists but not copying arrays. Waveform values
+    are 2-D.
+
+    """
+    times_ns = np.asarray(channel_data.times_ns, dtype=np.int64)
+    values = channel_data.values
+    if not isinstance(values, np.ndarray):
+        values = np.asarray([] if values is None else values, value_dtype(channel_data.data_type))
+    if channel_data.elements != 1 and values.ndim == 1 and not len(values):
+        values = values.reshape(0, channel_data.elements)
+    statuses = np.asarray(channel_data.statuses, dtype=np.uint16)
+    severities = np.asarray(channel_data.severities, dtype=np.uint16)
+    return times_ns, values, statuses, severities
+
+
+def detached_copy(channel_data):
+    """
+    Return a copy of channel_data whose values, times, statuses and
+    severities can be modified without affecting channel_data.
+
+    """
+    new_data = copy.copy(channel_data)
+    new_data._array = None
+    new_data.values = _copy_container(channel_data.values)
+    new_data._times = _copy_container(channel_data._times)
+    new_data._times_ns = _copy_container(channel_data._times_ns)
+    new_data.statuses = _copy_container(channel_data.statuses)
+    new_data.severities = _copy_container(channel_data.severities)
+    return new_data
+
+
+def _copy_container(items):
+    """Copy a list, including any waveform lists it holds, or an array."""
+    if isinstance(items, list):
+        return [list(item) if isinstance(item, list) else item for item in items]
+    return copy.copy(items)
+
+
+def with_arrays(channel_data, times_ns, values, statuses, severities):
+    """
+    Return a copy of channel_data, keeping its channel properties, that holds
+    the given times_ns, values, statuses and severities arrays.
+
+    """
+    new_data = copy.copy(channel_data)
+    new_data._array = None
+    new_data.times_ns = times_ns
+    new_data.values = values
+    new_data.statuses = statuses
+    new_data.severities = severities
+    return new_data
+
+
+def _categorical(values, code_table):
+    """
+    Convert integer codes into a pandas Categorical of their names with an
+    array lookup. Codes missing from code_table become NaN.
+
+    """
+    items = code_table.items()
+    lookup = np.full(items[-1][0] + 1, -1, dtype=np.int16)
+    for position, (value, _) in enumerate(items):
+        lookup[value] = position
+    values = np.asarray(values, dtype=np.int64)
+    known = (values >= 0) & (values < len(lookup))
+    positions = np.where(known, lookup[np.where(known, values, 0)], -1)
+    return pd.Categorical.from_codes(positions, categories=[name for _, name in items])
+
+
+def _flag_attributes(code_table):
+    """Describe the codes in code_table with CF flag_values and flag_meanings."""
+    items = code_table.items()
+    return {
+        "flag_values": np.array([value for value, _ in items], dtype=np.uint16),
+        "flag_meanings": " ".join(name for _, name in items),
+    }
+
+
+def _sizeof(obj):
+    """Approximate size in bytes of an array or a (nested) list of values."""
+    if obj is None:
+        return 0
+    if hasattr(obj, "nbytes"):
+        return obj.nbytes
+    if isinstance(obj, list):
+        return sys.getsizeof(obj) + sum(_sizeof(item) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def _as_list(values):
+    """Convert numpy arrays to lists for formatting."""
+    return values.tolist() if hasattr(values, "tolist") else values
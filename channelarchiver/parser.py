@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+from xml.parsers import expat
+
+try:
+    from xmlrpc.client import Binary, DateTime, Fault
+except ImportError:  # Python 2
+    from xmlrpclib import Binary, DateTime, Fault
+
+import base64
+import html
+import re
+
+from .structures import SampleColumns
+
+
+VALUES_METHOD = b"<methodName>archiver.values</methodName>"
+
+_SCALAR_TAGS = rb"(?:double|i4|int|i8|string|boolean)"
+
+
+def _int_member(name):
+    return (
+        rb"<member>\s*<name>" + name + rb"</name>\s*<value>\s*<(?:i4|int)>\s*"
+        rb"(-?\d+)\s*</(?:i4|int)>\s*</value>\s*</member>\s*"
+    )
+
+
+# A sample in the layout sent by ArchiveDataServer, with its members in the
+# usual order. Samples in any other form are decoded by expat instead.
+SAMPLE = re.compile(
+    rb"\s*<value>\s*<struct>\s*"
+    + _int_member(b"stat")
+    + _int_member(b"sevr")
+    + _int_member(b"secs")
+    + _int_member(b"nano")
+    + rb"<member>\s*<name>value</name>\s*<value>\s*<array>\s*<data>("
+    rb"(?:\s*<value>(?:\s*<" + _SCALAR_TAGS + rb">[^<]*</" + _SCALAR_TAGS + rb">\s*"
+    rb"|[^<]*)</value>)*"
+    rb")\s*</data>\s*</array>\s*</value>\s*</member>\s*</struct>\s*</value>"
+)
+ELEMENT = re.compile(
+    rb"<value>(?:\s*<(" + _SCALAR_TAGS + rb")>([^<]*)</\1>\s*|([^<]*))</value>"
+)
+
+
+def is_values_request(request_body):
+    """Whether an encoded XML-RPC request calls the archiver's values method."""
+    return VALUES_METHOD in request_body
+
+
+def getparser(use_builtin_types=False):
+    """
+    Create a parser for the response to an archiver.values request.
+
+    Returns:
+        A (parser, unmarshaller) tuple in the same form as
+        xmlrpc.client.getparser(). Data is fed to the parser as it is
+        received and unmarshaller.close() returns the decoded response.
+
+    """
+    unmarshaller = ValuesUnmarshaller(use_builtin_types)
+    return ValuesParser(unmarshaller), unmarshaller
+
+
+class ValuesParser(object):
+    """
+    Feeds an archiver.values response to a ValuesUnmarshaller. Samples are
+    decoded with a single regular expression match each while the
+    unmarshaller is between the samples of a channel; everything else is
+    passed to expat a tag at a time so it is always known whether the next
+    bytes start a sample.
+
+    """
+
+    def __init__(self, target):
+        self._target = target
+        self._buffer = b""
+        self._parser = expat.ParserCreate(None, None)
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = target.start
+        self._parser.EndElementHandler = target.end
+        self._parser.CharacterDataHandler = target.data
+        if hasattr(self._parser, "SetReparseDeferralEnabled"):
+            self._parser.SetReparseDeferralEnabled(False)
+
+    def feed(self, data):
+        buffer = self._buffer + data
+        target = self._target
+        parser = self._parser
+        position = 0
+        while True:
+            if target.between_samples():
+                match = SAMPLE.match(buffer, position)
+                if match is not None:
+                    target.add_sample(*match.groups())
+                    position = match.end()
+                    continue
+                if buffer.find(b"</struct>", position) == -1:
+                    # The next sample may not have been received in full
+                    break
+            tag_end = buffer.find(b">", position)
+            if tag_end == -1:
+                break
+            parser.Parse(buffer[position : tag_end + 1], False)
+            position = tag_end + 1
+        self._buffer = buffer[position:]
+
+    def close(self):
+        try:
+            parser = self._parser
+        except AttributeError:
+            return
+        del self._parser
+        parser.Parse(self._buffer, True)
+        self._buffer = b""
+        # Break the reference cycle between the parser and its handlers
+        parser.StartElementHandler = None
+        parser.EndElementHandler = None
+        parser.CharacterDataHandler = None
+
+
+class ValuesUnmarshaller(object):
+    """
+    Streaming decoder for archiver.values responses. It decodes XML-RPC like
+    xmlrpc.client.Unmarshaller except that the samples of each channel, the
+    array under its "values" member, are written straight into a
+    SampleColumns rather than being built as a dict and value list per
+    sample.
+
+    """
+
+    def __init__(self, use_builtin_types=False):
+        self._use_builtin_types = use_builtin_types
+        self._stack = []
+        self._marks = []
+        self._text = []
+        self._bare_value = False
+        self._fault = False
+        self._values_member = False
+        # State while decoding the samples of a channel
+        self._columns = None
+        self._depth = 0
+        self._field = None
+        self._in_sample = False
+
+    def close(self):
+        if self._fault:
+            raise Fault(**self._stack[0])
+        return tuple(self._stack)
+
+    def between_samples(self):
+        """Whether the next item is a sample of the channel being decoded."""
+        return self._columns is not None and self._depth == 1 and not self._in_sample
+
+    def add_sample(self, stat, sevr, secs, nano, data):
+        """Add a sample matched by SAMPLE to the channel being decoded."""
+        columns = self._columns
+        columns.stat.append(int(stat))
+        columns.sevr.append(int(sevr))
+        columns.secs.append(int(secs))
+        columns.nano.append(int(nano))
+        for tag, text, bare in ELEMENT.findall(data):
+            if tag == b"double":
+                columns.add_value(float(text))
+            elif tag == b"string" or not tag:
+                columns.add_value(_unescape(text if tag else bare))
+            elif tag == b"boolean":
+                columns.add_value(text.strip() == b"1")
+            else:
+                columns.add_value(int(text))
+        columns.end_sample()
+
+    def data(self, text):
+        self._text.append(text)
+
+    def start(self, tag, attrs):
+        self._text = []
+        self._bare_value = tag == "value"
+        if self._columns is not None:
+            if tag == "array":
+                self._depth += 1
+            elif tag == "struct":
+                self._in_sample = True
+            return
+        if tag == "array" and self._values_member:
+            self._columns = SampleColumns()
+            self._depth = 1
+        elif tag == "array" or tag == "struct":
+            self._marks.append(len(self._stack))
+
+    def end(self, tag):
+        text = "".join(self._text)
+        if self._columns is not None:
+            self._end_sample_tag(tag, text)
+            return
+        if tag == "value":
+            if self._bare_value:
+                self._stack.append(text)
+                self._bare_value = False
+            self._values_member = False
+        elif tag in ("int", "i4", "i8"):
+            self._stack.append(int(text))
+        elif tag == "double":
+            self._stack.append(float(text))
+        elif tag == "string":
+            self._stack.append(text)
+        elif tag == "name":
+            self._stack.append(text)
+            self._values_member = text == "values"
+        elif tag == "struct":
+            mark = self._marks.pop()
+            items = self._stack[mark:]
+            self._stack[mark:] = [dict(zip(items[::2], items[1::2]))]
+        elif tag == "array":
+            mark = self._marks.pop()
+            self._stack[mark:] = [self._stack[mark:]]
+        elif tag == "boolean":
+            self._stack.append(text.strip() == "1")
+        elif tag == "nil":
+            self._stack.append(None)
+        elif tag == "dateTime.iso8601":
+            self._stack.append(DateTime(text))
+        elif tag == "base64":
+            data = base64.decodebytes(text.encode("ascii"))
+            self._stack.append(data if self._use_builtin_types else Binary(data))
+        elif tag == "fault":
+            self._fault = True
+
+    def _end_sample_tag(self, tag, text):
+        columns = self._columns
+        if tag in ("int", "i4", "i8"):
+            self._add_to_sample(int(text))
+        elif tag == "double":
+            self._add_to_sample(float(text))
+        elif tag == "name":
+            self._field = text
+        elif tag == "value":
+            if self._bare_value:
+                self._add_to_sample(text)
+                self._bare_value = False
+        elif tag == "string":
+            self._add_to_sample(text)
+        elif tag == "struct":
+            columns.end_sample()
+            self._in_sample = False
+        elif tag == "array":
+            self._depth -= 1
+            if not self._depth:
+                self._stack.append(columns)
+                self._columns = None
+                self._values_member = False
+        elif tag == "boolean":
+            self._add_to_sample(text.strip() == "1")
+
+    def _add_to_sample(self, value):
+        field = self._field
+        columns = self._columns
+        if field == "value":
+            columns.add_value(value)
+        elif field == "secs":
+            columns.secs.append(value)
+        elif field == "nano":
+            columns.nano.append(value)
+        elif field == "stat":
+            columns.stat.append(value)
+        elif field == "sevr":
+            columns.sevr.append(value)
+
+
+def _unescape(text):
+    text = text.decode("utf-8")
+    return html.unescape(text) if "&" in text else text
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+from collections import defaultdict, deque
+
+try:
+    from xmlrpc.client import ProtocolError
+    from http.client import HTTPException
+except ImportError:  # Python 2
+    from xmlrpclib import ProtocolError
+    from httplib import HTTPException
+
+from .exceptions import ArchiverTimeout
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before repeating a failed archiver call. All
+    the archiver's methods only read data, so any call can safely be
+    repeated. Connection errors, timeouts and HTTP errors that indicate a
+    temporary problem, such as a crashed CGI process, are retried with
+    exponential backoff and full jitter. Faults returned by the archiver
+    are not retried.
+
+    Example usage:
+
+        >>> retry = RetryPolicy(attempts=4, backoff=0.5, max_backoff=10)
+        >>> archiver = Archiver(url, retry=retry)
+
+    """
+
+    def __init__(
+        self,
+        attempts=3,
+        backoff=0.5,
+        max_backoff=30.0,
+        statuses=(408, 429, 500, 502, 503, 504),
+        seed=None,
+    ):
+        """
+        Args:
+            attempts (Optional[int]): Maximum number of times to make a call,
+                including the first.
+                Default: 3
+            backoff (Optional[float]): Seconds to wait, at most, before the
+                first retry. The maximum doubles for each later retry.
+                Default: 0.5
+            max_backoff (Optional[float]): Upper limit on the wait in seconds.
+                Default: 30
+            statuses (Optional[List[int]]): HTTP status codes to retry.
+            seed (Optional[int]): Seed for the random jitter.
+
+        """
+        super(RetryPolicy, self).__init__()
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def is_retryable(self, exception):
+        """Whether a call that raised exception should be repeated."""
+        if isinstance(exception, ArchiverTimeout):
+            return False
+        if isinstance(exception, ProtocolError):
+            return exception.errcode in self.statuses
+        return isinstance(exception, (OSError, HTTPException))
+
+    def delay(self, retry):
+        """Seconds to wait before the given retry, counting from 0."""
+        limit = min(self.max_backoff, self.backoff * 2 ** retry)
+        with self._lock:
+            return self._random.uniform(0, limit)
+
+
+class HedgePolicy(object):
+    """
+    When to send a duplicate of a slow archiver call. If a call has not
+    completed after a given percentile of the recent latencies of its
+    method, the same request is sent again on another connection and the
+    first response to arrive is used. This trims the tail latency caused by
+    occasional stalled requests at the cost of a small number of extra
+    requests.
+
+    Example usage:
+
+        >>> archiver = Archiver(url, hedge=HedgePolicy(percentile=95))
+
+    """
+
+    def __init__(self, percentile=95, min_delay=0.05, window=100, min_samples=20, delay=None):
+        """
+        Args:
+            percentile (Optional[float]): Percentile of recent latencies
+                after which a call is hedged.
+                Default: 95
+            min_delay (Optional[float]): Minimum seconds to wait before
+                hedging.
+                Default: 0.05
+            window (Optional[int]): Number of recent latencies kept for each
+                method.
+                Default: 100
+            min_samples (Optional[int]): Number of latencies a method needs
+                before its calls are hedged.
+                Default: 20
+            delay (Optional[float]): If given, calls are hedged after this
+                many seconds instead of a percentile of their latencies.
+
+        """
+        super(HedgePolicy, self).__init__()
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.fixed_delay = delay
+        # Number of duplicate calls sent
+        self.hedged = 0
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, method, seconds):
+        """Record the latency of a successful call."""
+        with self._lock:
+            self._latencies[method].append(seconds)
+
+    def count_hedge(self):
+        """Count a duplicate call being sent."""
+        with self._lock:
+            self.hedged += 1
+
+    def delay(self, method):
+        """Seconds after which to hedge a call, or None to not hedge it."""
+        if self.fixed_delay is not None:
+            return self.fixed_delay
+        with self._lock:
+            latencies = sorted(self._latencies[method])
+        if len(latencies) < self.min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+        return max(self.min_delay, latencies[index])
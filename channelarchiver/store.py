@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import json
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .catalog import connect, _Connection
+from .structures import SampleColumns
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    interpolation INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    PRIMARY KEY (host, channel, key, interpolation)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    interpolation INTEGER NOT NULL,
+    start_ns INTEGER NOT NULL,
+    end_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS coverage_series
+    ON coverage (host, channel, key, interpolation, start_ns);
+CREATE TABLE IF NOT EXISTS chunks (
+    host TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    interpolation INTEGER NOT NULL,
+    start_ns INTEGER NOT NULL,
+    end_ns INTEGER NOT NULL,
+    secs BLOB NOT NULL,
+    nano BLOB NOT NULL,
+    stat BLOB NOT NULL,
+    sevr BLOB NOT NULL,
+    offsets BLOB NOT NULL,
+    value_type TEXT,
+    value_data BLOB
+);
+CREATE INDEX IF NOT EXISTS chunks_series
+    ON chunks (host, channel, key, interpolation, start_ns);
+"""
+
+# Version 1 stored each sample in its own row of a samples table
+SCHEMA_VERSION = 2
+
+CHUNK_COLUMNS = "secs, nano, stat, sevr, offsets, value_type, value_data"
+
+
+class SampleStore(object):
+    """
+    Persistent store of retrieved samples that remembers which time ranges
+    it holds for each (host, channel, archive key, interpolation). An
+    Archiver with a sample store only requests the parts of an interval
+    that are missing from the store. It can be shared between processes.
+
+    Samples are stored in chunks, one for each interval added, holding the
+    columns of a SampleColumns as binary arrays, and are loaded back into
+    a SampleColumns.
+
+    Example usage:
+
+        >>> store = SampleStore('/var/cache/channelarchiver-samples.db')
+        >>> archiver = Archiver(url, sample_store=store)
+
+    """
+
+    def __init__(self, path, settle_time=60.0):
+        """
+        Args:
+            path (str): Path to the SQLite database file. It will be created
+                if it does not exist.
+            settle_time (Optional[float]): Samples from the last settle_time
+                seconds, or after the end of the archive, are stored but
+                requested again next time, as the archive engine may still
+                be writing samples for that period.
+                Default: 60
+
+        """
+        super(SampleStore, self).__init__()
+        self.path = path
+        self.settle_time = settle_time
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                # Coverage recorded for samples in the old format is dropped
+                connection.execute("DROP TABLE IF EXISTS samples")
+                connection.execute("DROP TABLE IF EXISTS coverage")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Context manager in which the calls made by the current thread share
+        one database connection rather than each opening their own.
+
+        """
+        if getattr(self._local, "connection", None) is not None:
+            yield
+            return
+        with _Connection(connect(self.path)) as connection:
+            self._local.connection = connection
+            try:
+                yield
+            finally:
+                self._local.connection = None
+
+    @contextlib.contextmanager
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            with _Connection(connect(self.path)) as connection:
+                yield connection
+            return
+        try:
+            yield connection
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+    def gaps(self, host, channel, key, interpolation, start_ns, end_ns):
+        """
+        Find the parts of an interval not held in the store.
+
+        Returns:
+            A list of (start_ns, end_ns) tuples in time order.
+
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT start_ns, end_ns FROM coverage "
+                "WHERE host = ? AND channel = ? AND key = ? AND interpolation = ? "
+                "AND start_ns <= ? AND end_ns >= ? ORDER BY start_ns",
+                (host, channel, key, interpolation, end_ns, start_ns),
+            ).fetchall()
+        gaps = []
+        cursor = start_ns
+        for covered_start, covered_end in rows:
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end_ns:
+            gaps.append((cursor, end_ns))
+        return gaps
+
+    def add(self, host, key, interpolation, archive_data, start_ns, end_ns, covered_end_ns=None):
+        """
+        Store the samples in archive_data, as returned by the archiver's
+        values method, and record that the store holds every sample for the
+        channel between start_ns and end_ns inclusive. Samples outside the
+        interval are ignored. If covered_end_ns is given, the store is only
+        recorded as holding every sample up to it, so that later samples
+        are requested again.
+
+        """
+        if covered_end_ns is None:
+            covered_end_ns = end_ns
+        channel = archive_data["name"]
+        series = (host, channel, key, interpolation)
+        samples = archive_data["values"]
+        if not isinstance(samples, SampleColumns):
+            columns = SampleColumns()
+            columns.extend(samples)
+            samples = columns
+        samples = _slice(samples, start_ns, end_ns)
+
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?, ?)",
+                series
+                + (
+                    archive_data["type"],
+                    archive_data["count"],
+                    json.dumps(archive_data["meta"]),
+                ),
+            )
+            # Chunks overlapping the interval are replaced by the parts of
+            # them outside it
+            overlapping = connection.execute(
+                f"SELECT rowid, start_ns, end_ns, {CHUNK_COLUMNS} FROM chunks "
+                "WHERE host = ? AND channel = ? AND key = ? AND interpolation = ? "
+                "AND start_ns <= ? AND end_ns >= ?",
+                series + (end_ns, start_ns),
+            ).fetchall()
+            chunks = [(start_ns, end_ns, samples)]
+            for row in overlapping:
+                rowid, chunk_start, chunk_end = row[:3]
+                connection.execute("DELETE FROM chunks WHERE rowid = ?", (rowid,))
+                chunk = _decode(row[3:])
+                if chunk_start < start_ns:
+                    chunks.append((chunk_start, start_ns - 1, _slice(chunk, None, start_ns - 1)))
+                if chunk_end > end_ns:
+                    chunks.append((end_ns + 1, chunk_end, _slice(chunk, end_ns + 1, None)))
+            connection.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    series + (chunk_start, chunk_end) + _encode(chunk)
+                    for chunk_start, chunk_end, chunk in chunks
+                    if len(chunk)
+                ],
+            )
+            if covered_end_ns < start_ns:
+                connection.execute("COMMIT")
+                return
+            end_ns = min(end_ns, covered_end_ns)
+            # Merge the new interval with any it overlaps or touches
+            overlapping = connection.execute(
+                "SELECT rowid, start_ns, end_ns FROM coverage "
+                "WHERE host = ? AND channel = ? AND key = ? AND interpolation = ? "
+                "AND start_ns <= ? AND end_ns >= ?",
+                series + (end_ns, start_ns),
+            ).fetchall()
+            for rowid, covered_start, covered_end in overlapping:
+                start_ns = min(start_ns, covered_start)
+                end_ns = max(end_ns, covered_end)
+                connection.execute("DELETE FROM coverage WHERE rowid = ?", (rowid,))
+            connection.execute(
+                "INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?)",
+                series + (start_ns, end_ns),
+            )
+            connection.execute("COMMIT")
+
+    def load(self, host, channel, key, interpolation, start_ns, end_ns, limit=None):
+        """
+        Load the stored samples for a channel between start_ns and end_ns.
+
+        Returns:
+            A dict in the form returned by the archiver's values method,
+            with the samples in a SampleColumns, or None if nothing has been
+            stored for the channel.
+
+        """
+        series = (host, channel, key, interpolation)
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT type, count, meta FROM series "
+                "WHERE host = ? AND channel = ? AND key = ? AND interpolation = ?",
+                series,
+            ).fetchone()
+            if row is None:
+                return None
+            chunk_rows = connection.execute(
+                f"SELECT start_ns, end_ns, {CHUNK_COLUMNS} FROM chunks "
+                "WHERE host = ? AND channel = ? AND key = ? AND interpolation = ? "
+                "AND start_ns <= ? AND end_ns >= ? ORDER BY start_ns",
+                series + (end_ns, start_ns),
+            ).fetchall()
+        data_type, count, meta = row
+        samples = SampleColumns()
+        for chunk_row in chunk_rows:
+            if limit is not None and len(samples) >= limit:
+                break
+            chunk_start, chunk_end = chunk_row[:2]
+            chunk = _decode(chunk_row[2:])
+            if chunk_start < start_ns or chunk_end > end_ns:
+                chunk = _slice(chunk, start_ns, end_ns)
+            if limit is not None:
+                chunk = chunk[: limit - len(samples)]
+            if not len(samples):
+                samples = chunk
+            else:
+                samples.extend(chunk)
+        return {
+            "name": channel,
+            "type": data_type,
+            "count": count,
+            "meta": json.loads(meta),
+            "values": samples,
+        }
+
+
+def _slice(samples, start_ns, end_ns):
+    """The samples of a time-ordered SampleColumns between start_ns and end_ns."""
+    times = samples.times_ns()
+    start = 0 if start_ns is None else bisect_left(times, start_ns)
+    end = len(times) if end_ns is None else bisect_right(times, end_ns)
+    if start == 0 and end == len(times):
+        return samples
+    return samples[start:end]
+
+
+def _encode(samples):
+    """Convert a SampleColumns to the column values of a chunk."""
+    values = samples.values
+    if values is None:
+        value_type, value_data = None, None
+    elif isinstance(values, array):
+        value_type, value_data = values.typecode, values.tobytes()
+    else:
+        value_type, value_data = "json", json.dumps(values)
+    return (
+        samples.secs.tobytes(),
+        samples.nano.tobytes(),
+        samples.stat.tobytes(),
+        samples.sevr.tobytes(),
+        samples.offsets.tobytes(),
+        value_type,
+        value_data,
+    )
+
+
+def _decode(row):
+    """Convert the columns of a chunk, in CHUNK_COLUMNS order, to a SampleColumns."""
+    secs, nano, stat, sevr, offsets, value_type, value_data = row
+    samples = SampleColumns()
+    samples.secs.frombytes(secs)
+    samples.nano.frombytes(nano)
+    samples.stat.frombytes(stat)
+    samples.sevr.frombytes(sevr)
+    samples.offsets = array("q")
+    samples.offsets.frombytes(offsets)
+    if value_type == "json":
+        samples.values = json.loads(value_data)
+    elif value_type is not None:
+        samples.values = array(value_type)
+        samples.values.frombytes(value_data)
+    return samples
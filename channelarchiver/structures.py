@@ -1,5 +1,15 @@
 # -*- coding: utf-8 -*-
 
+import fnmatch
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from . import utils
+
 
 class Codes(object):
     def __init__(self, **kws):
@@ -10,6 +20,10 @@ class Codes(object):
     def str_value(self, value):
         return self._reverse_dict[value]
 
+    def items(self):
+        """Return (value, name) pairs for the codes in order of value."""
+        return sorted(self._reverse_dict.items())
+
     def __setattr__(self, name, value):
         super(Codes, self).__setattr__(name, value)
         if not name.startswith("_"):
@@ -23,3 +37,371 @@ class Codes(object):
 
     def __getitem__(self, key):
         return self.__dict__[key.replace("-", "_").upper()]
+
+
+class IntervalIndex(object):
+    """
+    Index of the archives holding a channel for quickly finding those that
+    overlap an interval. Archive start and end times are stored as integer
+    nanoseconds since the Epoch, sorted by start time, alongside a running
+    maximum of the end times. Finding the overlapping archives takes
+    logarithmic time plus time proportional to the number found.
+
+    """
+
+    def __init__(self, archives):
+        """
+        Args:
+            archives (List[ArchiveProperties]): The archives to index.
+
+        """
+        self.archives = archives
+        self.size = len(archives)
+        entries = sorted(
+            (
+                utils.ns_from_datetime(archive.start_time),
+                position,
+                utils.ns_from_datetime(archive.end_time),
+            )
+            for position, archive in enumerate(archives)
+        )
+        self._starts = [start for start, _, _ in entries]
+        self._positions = [position for _, position, _ in entries]
+        self._ends = [end for _, _, end in entries]
+        self._max_ends = []
+        max_end = None
+        for end in self._ends:
+            max_end = end if max_end is None else max(max_end, end)
+            self._max_ends.append(max_end)
+
+    def is_current(self, archives):
+        """Whether the index was built from archives in their current state."""
+        return archives is self.archives and len(archives) == self.size
+
+    def overlaps(self, start, end):
+        """
+        Find the archives overlapping an interval.
+
+        Args:
+            start (int): Start of the interval in nanoseconds since the Epoch.
+            end (int): End of the interval in nanoseconds since the Epoch.
+
+        Returns:
+            A list of (position, overlap) tuples, in order of archive start
+            time, where position is the index of the archive in the list the
+            index was built from and overlap is in nanoseconds. Only archives
+            with a non-zero overlap are included.
+
+        """
+        first = bisect_right(self._max_ends, start)
+        last = bisect_left(self._starts, end)
+        overlaps = []
+        for i in range(first, last):
+            overlap = min(end, self._ends[i]) - max(start, self._starts[i])
+            if overlap > 0:
+                overlaps.append((self._positions[i], overlap))
+        return overlaps
+
+    def best(self, start, end):
+        """
+        Return the position of the archive with the greatest overlap with
+        the interval, preferring earlier positions when overlaps are equal.
+        If no archive overlaps the interval the first archive is chosen. Returns
+        None if the index is empty.
+
+        """
+        if not self.size:
+            return None
+        best_position = 0
+        greatest_overlap = 0
+        for position, overlap in self.overlaps(start, end):
+            if overlap > greatest_overlap or (
+                overlap == greatest_overlap and position < best_position
+            ):
+                best_position = position
+                greatest_overlap = overlap
+        return best_position
+
+
+class NameIndex(object):
+    """
+    Sorted index of channel names for searching with shell-style wildcards.
+    The literal prefix of a pattern, the part before its first wildcard, is
+    located with a binary search so only the names sharing that prefix are
+    matched against the rest of the pattern. Plain prefixes and exact names
+    take logarithmic time.
+
+    """
+
+    _wildcard = re.compile(r"[*?\[]")
+
+    def __init__(self, names):
+        """
+        Args:
+            names (Iterable[str]): The channel names to index.
+
+        """
+        self.names = sorted(set(names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        i = bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def prefix_range(self, prefix):
+        """Return the (first, last) positions of names starting with prefix."""
+        first = bisect_left(self.names, prefix)
+        # Names with the prefix sort before the shortest string that is
+        # greater than the prefix without starting with it
+        stripped = prefix.rstrip("\U0010ffff")
+        if not stripped:
+            return first, len(self.names)
+        upper = stripped[:-1] + chr(ord(stripped[-1]) + 1)
+        return first, bisect_left(self.names, upper, first)
+
+    def prefix(self, prefix):
+        """Return the names starting with prefix in sorted order."""
+        first, last = self.prefix_range(prefix)
+        return self.names[first:last]
+
+    def search(self, pattern):
+        """
+        Find the names matching a pattern.
+
+        Args:
+            pattern (str): A case-sensitive shell-style pattern as used by
+                fnmatch, where * matches any characters, ? matches a single
+                character and [seq] matches any character in seq.
+
+        Returns:
+            A sorted list of the matching names.
+
+        """
+        wildcard = self._wildcard.search(pattern)
+        if wildcard is None:
+            return [pattern] if pattern in self else []
+        literal = pattern[: wildcard.start()]
+        first, last = self.prefix_range(literal)
+        if pattern == literal + "*":
+            return self.names[first:last]
+        match = re.compile(fnmatch.translate(pattern)).match
+        return [name for name in self.names[first:last] if match(name)]
+
+
+class LRUCache(object):
+    """
+    Thread-safe least recently used cache limited by the total size in bytes
+    of its values rather than the number of entries. Values may be given a
+    time to live, after which they are treated as missing.
+
+    Attributes:
+        max_bytes (int): The maximum total size of the cached values.
+        nbytes (int): The current total size of the cached values.
+        hits (int): The number of lookups that found a value.
+        misses (int): The number of lookups that did not find a value.
+
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value for key, or None if it is not cached."""
+        with self._lock:
+            try:
+                value, size, expires = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires is not None and time.monotonic() >= expires:
+                self.nbytes -= size
+                self.misses += 1
+                return None
+            self._entries[key] = (value, size, expires)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size, ttl=None):
+        """
+        Cache value under key, evicting the least recently used values to
+        make room. Values larger than max_bytes are not cached. If ttl is
+        given, the value expires after that many seconds.
+
+        """
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            while self.nbytes + size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+            expires = None if ttl is None else time.monotonic() + ttl
+            self._entries[key] = (value, size, expires)
+            self.nbytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class SampleColumns(object):
+    """
+    Compact, column-oriented store of the samples returned by the archiver's
+    values method. Times, statuses and severities are held in typed arrays
+    and the values of every sample in one flat array, with offsets marking
+    where each sample's values begin. Values are kept in a float or integer
+    array while they are all of that type and in a list otherwise.
+
+    Behaves like the list of sample dicts returned by the standard XML-RPC
+    parser: indexing and iterating create the dicts as needed, and slicing
+    and extending keep the columnar form.
+
+    """
+
+    def __init__(self):
+        self.secs = array("q")
+        self.nano = array("q")
+        self.stat = array("i")
+        self.sevr = array("i")
+        self.values = None
+        self.offsets = array("q", [0])
+
+    def add_value(self, value):
+        """Append an element to the value of the sample being built."""
+        if self.values is None:
+            if isinstance(value, float):
+                self.values = array("d")
+            elif isinstance(value, int) and not isinstance(value, bool):
+                self.values = array("q")
+            else:
+                self.values = []
+        try:
+            self.values.append(value)
+        except (TypeError, OverflowError):
+            self.values = list(self.values)
+            self.values.append(value)
+
+    def end_sample(self):
+        """Finish the sample being built once its fields have been added."""
+        self.offsets.append(0 if self.values is None else len(self.values))
+
+    def append(self, sample):
+        """Append a sample given as a dict."""
+        self.secs.append(sample["secs"])
+        self.nano.append(sample["nano"])
+        self.stat.append(sample["stat"])
+        self.sevr.append(sample["sevr"])
+        for value in sample["value"]:
+            self.add_value(value)
+        self.end_sample()
+
+    def extend(self, samples):
+        """Append samples given as another SampleColumns or a list of dicts."""
+        if not isinstance(samples, SampleColumns):
+            for sample in samples:
+                self.append(sample)
+            return
+        if not len(samples):
+            return
+        base = self.offsets[-1]
+        self.secs.extend(samples.secs)
+        self.nano.extend(samples.nano)
+        self.stat.extend(samples.stat)
+        self.sevr.extend(samples.sevr)
+        self.offsets.extend(base + offset for offset in samples.offsets[1:])
+        if self.values is None:
+            self.values = samples.values[:]
+        elif type(self.values) is type(samples.values) and (
+            not isinstance(self.values, array)
+            or self.values.typecode == samples.values.typecode
+        ):
+            self.values.extend(samples.values)
+        else:
+            self.values = list(self.values) + list(samples.values)
+
+    def is_scalar(self):
+        """Whether every sample has exactly one value."""
+        return len(self.offsets) - 1 == (0 if self.values is None else len(self.values))
+
+    def times_ns(self):
+        """Return the sample times as a list of nanoseconds since the Epoch."""
+        ns_per_sec = utils.NANOSECONDS_PER_SECOND
+        return [secs * ns_per_sec + nano for secs, nano in zip(self.secs, self.nano)]
+
+    def value_lists(self, elements):
+        """
+        Return the values as a list with one item per sample: the value
+        itself for scalar channels (elements == 1) and a list of values for
+        waveforms.
+
+        """
+        if elements == 1 and self.is_scalar():
+            return [] if self.values is None else list(self.values)
+        offsets = self.offsets
+        values = self.values
+        if elements == 1:
+            return [values[offsets[i]] for i in range(len(self))]
+        return [list(values[offsets[i] : offsets[i + 1]]) for i in range(len(self))]
+
+    def __len__(self):
+        return len(self.secs)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("SampleColumns slices must be contiguous")
+            stop = max(start, stop)
+            sliced = SampleColumns()
+            sliced.secs = self.secs[start:stop]
+            sliced.nano = self.nano[start:stop]
+            sliced.stat = self.stat[start:stop]
+            sliced.sevr = self.sevr[start:stop]
+            first = self.offsets[start]
+            sliced.offsets = array(
+                "q", (offset - first for offset in self.offsets[start : stop + 1])
+            )
+            if self.values is not None:
+                sliced.values = self.values[first : self.offsets[stop]]
+            return sliced
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SampleColumns index out of range")
+        start = self.offsets[index]
+        end = self.offsets[index + 1]
+        return {
+            "stat": self.stat[index],
+            "sevr": self.sevr[index],
+            "secs": self.secs[index],
+            "nano": self.nano[index],
+            "value": [] if self.values is None else list(self.values[start:end]),
+        }
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return f"SampleColumns({list(self)!r})"
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import threading
+import time
+from collections import defaultdict
+
+try:
+    from xmlrpc.client import (
+        Fault,
+        GzipDecodedResponse,
+        ProtocolError,
+        SafeTransport,
+        Transport,
+    )
+    from http.client import HTTPConnection, HTTPException, HTTPSConnection
+except ImportError:  # Python 2
+    from xmlrpclib import (
+        Fault,
+        GzipDecodedResponse,
+        ProtocolError,
+        SafeTransport,
+        Transport,
+    )
+    from httplib import HTTPConnection, HTTPException, HTTPSConnection
+
+from . import parser
+
+
+READ_SIZE = 65536
+
+_response_state = threading.local()
+
+
+def last_response_size():
+    """
+    Return the number of bytes, before gzip decoding, of the last response
+    received by the current thread through a transport using
+    ValuesParserMixin, or None if no response was read.
+
+    """
+    return getattr(_response_state, "size", None)
+
+
+class _CountingResponse(object):
+    """Wrapper for an HTTP response that counts the bytes read from it."""
+
+    def __init__(self, response):
+        self._response = response
+        self.size = 0
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        self.size += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+def default_transport(host, timeout=None):
+    """
+    Create the transport used for host when none is given to the Archiver.
+    timeout is the number of seconds to wait for the connection and for
+    data from the server, or None to wait indefinitely.
+
+    """
+    if host.startswith("https:"):
+        return SafeArchiverTransport(timeout=timeout)
+    return ArchiverTransport(timeout=timeout)
+
+
+class ValuesParserMixin(object):
+    """
+    Transport mixin that decodes archiver.values responses with the
+    streaming parser in channelarchiver.parser, which stores samples in
+    compact columns. Other responses are decoded as usual.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ValuesParserMixin, self).__init__(*args, **kwargs)
+        self._request_state = threading.local()
+
+    def request(self, host, handler, request_body, verbose=False):
+        self._request_state.values = parser.is_values_request(request_body)
+        _response_state.size = None
+        return super(ValuesParserMixin, self).request(
+            host, handler, request_body, verbose
+        )
+
+    def getparser(self):
+        if getattr(self._request_state, "values", False):
+            return parser.getparser(self._use_builtin_types)
+        return super(ValuesParserMixin, self).getparser()
+
+    def parse_response(self, response):
+        counting_response = _CountingResponse(response)
+        try:
+            return self._parse_counted_response(counting_response)
+        finally:
+            _response_state.size = counting_response.size
+
+    def _parse_counted_response(self, response):
+        if not getattr(self._request_state, "values", False):
+            return super(ValuesParserMixin, self).parse_response(response)
+        # As for the standard transport but reading larger blocks, as
+        # values responses can be many megabytes.
+        if response.getheader("Content-Encoding", "") == "gzip":
+            stream = GzipDecodedResponse(response)
+        else:
+            stream = response
+        values_parser, unmarshaller = self.getparser()
+        while True:
+            data = stream.read(READ_SIZE)
+            if not data:
+                break
+            if self.verbose:
+                print("body:", repr(data))
+            values_parser.feed(data)
+        if stream is not response:
+            stream.close()
+        values_parser.close()
+        return unmarshaller.close()
+
+
+class TimeoutMixin(object):
+    """Transport mixin applying a socket timeout to its connections."""
+
+    def __init__(self, *args, **kwargs):
+        self.timeout = kwargs.pop("timeout", None)
+        super(TimeoutMixin, self).__init__(*args, **kwargs)
+
+    def make_connection(self, host):
+        connection = super(TimeoutMixin, self).make_connection(host)
+        if self.timeout is not None:
+            connection.timeout = self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(self.timeout)
+        return connection
+
+
+class ArchiverTransport(TimeoutMixin, ValuesParserMixin, Transport):
+    """Standard HTTP transport using the streaming values parser."""
+
+
+class SafeArchiverTransport(TimeoutMixin, ValuesParserMixin, SafeTransport):
+    """Standard HTTPS transport using the streaming values parser."""
+
+
+class PooledTransport(ValuesParserMixin, Transport):
+    """
+    Thread-safe XML-RPC transport that keeps a pool of persistent HTTP
+    connections, applies separate connect and read timeouts and asks the
+    server for gzip compressed responses. A single instance can be shared
+    by all the worker threads of an Archiver.
+
+    Example usage:
+
+        >>> transport = PooledTransport(connect_timeout=5, read_timeout=60)
+        >>> archiver = Archiver(url, max_workers=8, transport=transport)
+
+    """
+
+    def __init__(
+        self,
+        max_idle=10,
+        max_idle_time=4.0,
+        connect_timeout=None,
+        read_timeout=None,
+        gzip=True,
+        https=False,
+        context=None,
+        use_datetime=False,
+        use_builtin_types=False,
+        headers=(),
+    ):
+        """
+        Args:
+            max_idle (Optional[int]): Maximum number of idle connections to
+                keep open for each host.
+                Default: 10
+            max_idle_time (Optional[float]): Seconds after which an idle
+                connection is closed rather than reused. Should be less than
+                the server's keep-alive timeout, 5 seconds by default for
+                Apache. A reused connection that the server has closed
+                anyway is replaced by a new one before the request fails.
+                Default: 4
+            connect_timeout (Optional[float]): Seconds to wait for a connection
+                to be established. If omitted, waits indefinitely.
+            read_timeout (Optional[float]): Seconds to wait for data from the
+                server once connected. If omitted, waits indefinitely.
+            gzip (Optional[bool]): Whether to accept gzip compressed responses.
+                Default: True
+            https (Optional[bool]): Whether to connect with HTTPS. Must
+                match the scheme of the Archiver's URL.
+                Default: False
+            context (Optional[ssl.SSLContext]): SSL context for HTTPS
+                connections.
+
+        """
+        super(PooledTransport, self).__init__(
+            use_datetime=use_datetime,
+            use_builtin_types=use_builtin_types,
+            headers=headers,
+        )
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.accept_gzip_encoding = gzip
+        self.https = https
+        self.context = context
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _acquire(self, host):
+        """Return an idle connection to host, or None if there is none."""
+        expired = []
+        connection = None
+        with self._lock:
+            idle = self._idle[host]
+            if self.max_idle_time is not None:
+                oldest = time.monotonic() - self.max_idle_time
+                # Connections are appended when released so the oldest are first
+                while idle and idle[0][1] < oldest:
+                    expired.append(idle.pop(0)[0])
+            if idle:
+                connection = idle.pop()[0]
+        for expired_connection in expired:
+            expired_connection.close()
+        return connection
+
+    def _connect(self, host):
+        """Create a new connection to host."""
+        chost, _, _ = self.get_host_info(host)
+        if self.https:
+            return HTTPSConnection(
+                chost, timeout=self.connect_timeout, context=self.context
+            )
+        return HTTPConnection(chost, timeout=self.connect_timeout)
+
+    def _release(self, host, connection):
+        with self._lock:
+            if len(self._idle[host]) < self.max_idle:
+                self._idle[host].append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def _send(self, connection, host, handler, request_body, verbose):
+        if connection.sock is None:
+            connection.connect()
+            connection.sock.settimeout(self.read_timeout)
+        if verbose:
+            connection.set_debuglevel(1)
+        _, extra_headers, _ = self.get_host_info(host)
+        headers = self._headers + extra_headers
+        if self.accept_gzip_encoding:
+            connection.putrequest("POST", handler, skip_accept_encoding=True)
+            headers.append(("Accept-Encoding", "gzip"))
+        else:
+            connection.putrequest("POST", handler)
+        headers.append(("Content-Type", "text/xml"))
+        headers.append(("User-Agent", self.user_agent))
+        self.send_headers(connection, headers)
+        self.send_content(connection, request_body)
+
+    def _send_and_get_response(self, host, handler, request_body, verbose):
+        """
+        Send a request and return the connection and response. If an idle
+        connection fails before a response arrives, the server has probably
+        closed it, so the request is sent again on a new connection.
+
+        """
+        connection = self._acquire(host)
+        if connection is not None:
+            try:
+                self._send(connection, host, handler, request_body, verbose)
+                return connection, connection.getresponse()
+            except socket.timeout:
+                connection.close()
+                raise
+            except (OSError, HTTPException):
+                connection.close()
+        connection = self._connect(host)
+        try:
+            self._send(connection, host, handler, request_body, verbose)
+            return connection, connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+
+    def single_request(self, host, handler, request_body, verbose=False):
+        self.verbose = verbose
+        connection, response = self._send_and_get_response(
+            host, handler, request_body, verbose
+        )
+        try:
+            if response.status != 200:
+                response.read()
+                connection.close()
+                raise ProtocolError(
+                    host + handler,
+                    response.status,
+                    response.reason,
+                    dict(response.getheaders()),
+                )
+            result = self.parse_response(response)
+        except Fault:
+            # The response has been read in full so the connection can be reused
+            self._release(host, connection)
+            raise
+        except Exception:
+            connection.close()
+            raise
+        self._release(host, connection)
+        return result
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle = [c for connections in self._idle.values() for c, _ in connections]
+            self._idle.clear()
+        for connection in idle:
+            connection.close()
@@ -5,6 +5,13 @@ import calendar
 import re
 from tzlocal import get_localzone
 
+try:
+    import numpy as np
+except ImportError:
+    HAS_NUMPY = False
+else:
+    HAS_NUMPY = True
+
 try:
     StrType = basestring
 except NameError:  # Python 3
@@ -15,6 +22,7 @@ MINUTES_PER_HOUR = 60
 HOURS_PER_DAY = 24
 SECONDS_PER_HOUR = MINUTES_PER_HOUR * SECONDS_PER_MINUTE
 SECONDS_PER_DAY = HOURS_PER_DAY * SECONDS_PER_HOUR
+NANOSECONDS_PER_SECOND = 1000000000
 
 
 class UTC(datetime.tzinfo):
@@ -147,6 +155,119 @@ def datetime_from_sec_and_nano(seconds, nanoseconds=0, tz=None):
     return dt.astimezone(tz)
 
 
+def datetimes_from_sec_and_nano(seconds, nanoseconds, tz=None):
+    """
+    Convert sequences of seconds and nanoseconds since the Epoch into a list
+    of datetimes with given timezone. Gives the same results as calling
+    datetime_from_sec_and_nano for each pair but, if numpy is installed, does
+    the rounding and epoch arithmetic on whole arrays and only creates the
+    datetime objects in Python. Timezones with a fixed offset avoid a per
+    datetime timezone conversion.
+
+    """
+    if tz is None:
+        tz = local_tz
+    if not HAS_NUMPY:
+        return [
+            datetime_from_sec_and_nano(sec, nano, tz)
+            for sec, nano in zip(seconds, nanoseconds)
+        ]
+    seconds = np.asarray(seconds, dtype=np.int64)
+    nanoseconds = np.asarray(nanoseconds, dtype=np.int64)
+    # Round to microseconds the same way datetime_from_sec_and_nano does
+    microseconds = np.round(1.e-3 * nanoseconds).astype(np.int64)
+    rounds_up = nanoseconds >= 999999500
+    microseconds[rounds_up] = 0
+    total_us = (seconds + rounds_up) * 1000000 + microseconds
+    offset = tz.utcoffset(None)
+    if offset is not None:
+        total_us += offset // _one_us
+        naive = total_us.view("datetime64[us]").astype(object)
+        return [dt.replace(tzinfo=tz) for dt in naive]
+    return _datetimes_in_tz(total_us, tz)
+
+
+def _datetimes_in_tz(total_us, tz):
+    """
+    Convert microseconds since the Epoch into datetimes in a timezone whose
+    offset varies. The timezone is only consulted at the start and end of
+    each hour that contains a timestamp. Hours with the same offset at both
+    ends are converted with array arithmetic and hours containing a
+    transition are converted one datetime at a time.
+
+    """
+    us_per_hour = SECONDS_PER_HOUR * 1000000
+    hours, inverse = np.unique(total_us // us_per_hour, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    offsets = np.zeros(len(hours), dtype=np.int64)
+    tzinfos = []
+    uniform = np.ones(len(hours), dtype=bool)
+    for i, hour in enumerate(hours.tolist()):
+        first = _epoch_utc + datetime.timedelta(hours=hour)
+        first = first.astimezone(tz)
+        last = (_epoch_utc + datetime.timedelta(hours=hour + 1) - _one_us).astimezone(tz)
+        tzinfos.append((first.tzinfo, first.fold))
+        offsets[i] = first.utcoffset() // _one_us
+        uniform[i] = first.utcoffset() == last.utcoffset() and first.fold == last.fold
+    naive = (total_us + offsets[inverse]).view("datetime64[us]").astype(object)
+    dts = []
+    for dt, i in zip(naive, inverse.tolist()):
+        if uniform[i]:
+            tzinfo, fold = tzinfos[i]
+            dts.append(dt.replace(tzinfo=tzinfo, fold=fold))
+        else:
+            utc_dt = dt - datetime.timedelta(microseconds=int(offsets[i]))
+            dts.append(utc_dt.replace(tzinfo=utc).astimezone(tz))
+    return dts
+
+
+def datetimes_from_ns(times_ns, tz=None):
+    """
+    Convert a sequence of integer nanoseconds since the Epoch into a list of
+    datetimes with given timezone. See datetimes_from_sec_and_nano.
+
+    """
+    if HAS_NUMPY:
+        seconds, nanoseconds = np.divmod(
+            np.asarray(times_ns, dtype=np.int64), NANOSECONDS_PER_SECOND
+        )
+    else:
+        seconds = [t // NANOSECONDS_PER_SECOND for t in times_ns]
+        nanoseconds = [t % NANOSECONDS_PER_SECOND for t in times_ns]
+    return datetimes_from_sec_and_nano(seconds, nanoseconds, tz)
+
+
+def datetime64_from_sec_and_nano(seconds, nanoseconds):
+    """
+    Convert sequences of seconds and nanoseconds since the Epoch into a
+    numpy datetime64[ns] array. Unlike datetimes, no precision is lost.
+
+    """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    nanoseconds = np.asarray(nanoseconds, dtype=np.int64)
+    times_ns = seconds * NANOSECONDS_PER_SECOND + nanoseconds
+    return times_ns.view("datetime64[ns]")
+
+
+def sec_and_nano_from_datetimes(dts):
+    """
+    Convert a sequence of datetimes to lists of seconds and nanoseconds since
+    the Epoch. Naive datetimes are treated as UTC, as in
+    sec_and_nano_from_datetime.
+
+    """
+    seconds = []
+    nanoseconds = []
+    for dt in dts:
+        if dt.tzinfo is None or dt.utcoffset() is None:
+            delta = dt.replace(tzinfo=None) - _epoch
+        else:
+            delta = dt - _epoch_utc
+        seconds.append(delta.days * SECONDS_PER_DAY + delta.seconds)
+        nanoseconds.append(delta.microseconds * 1000)
+    return seconds, nanoseconds
+
+
 def sec_and_nano_from_datetime(dt):
     """
     Convert a datetime to seconds and nanoseconds since the Epoch.
@@ -157,6 +278,15 @@ def sec_and_nano_from_datetime(dt):
     return seconds, nanoseconds
 
 
+def ns_from_datetime(dt):
+    """
+    Convert a datetime to integer nanoseconds since the Epoch.
+
+    """
+    seconds, nanoseconds = sec_and_nano_from_datetime(dt)
+    return seconds * NANOSECONDS_PER_SECOND + nanoseconds
+
+
 def overlap_between_intervals(
     first_range_start, first_range_end, second_range_start, second_range_end
 ):
@@ -217,3 +347,6 @@ def pretty_waveform_repr(lst, value_format="{0!r}", max_line_len=79, prefix=""):
 
 utc = UTC()
 local_tz = get_localzone()
+_epoch = datetime.datetime(1970, 1, 1)
+_epoch_utc = _epoch.replace(tzinfo=utc)
+_one_us = datetime.timedelta(microseconds=1)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A local HTTP server speaking the Channel Archiver's XML-RPC protocol.
+
+Serves the data of MockArchiver or of a SyntheticArchiver of any size, with
+optional per-request latency, bandwidth throttling, injected errors and
+stalls and a server-side limit on the number of samples returned, so the
+whole client stack can be exercised without a real ArchiveDataServer.
+
+Example usage:
+
+    $ python tests/archiver_server.py --data synthetic --channels 1000 \\
+          --samples 100000 --latency 0.02 --bandwidth 5e6 --max-count 10000
+    Serving on http://127.0.0.1:8080/cgi-bin/ArchiveDataServer.cgi
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+try:
+    from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+from channelarchiver import codes  # noqa: E402
+from mock_archiver import MockArchiver  # noqa: E402
+from synthetic_archiver import SyntheticArchiver  # noqa: E402
+
+PATH = "/cgi-bin/ArchiveDataServer.cgi"
+
+
+class ThrottledWriter(object):
+    """File-like wrapper that limits the rate data is written at."""
+
+    def __init__(self, wfile, bandwidth, chunk_size=8192):
+        self._wfile = wfile
+        self._bandwidth = bandwidth
+        self._chunk_size = chunk_size
+
+    def write(self, data):
+        start = time.time()
+        for i in range(0, len(data), self._chunk_size):
+            chunk = data[i : i + self._chunk_size]
+            self._wfile.write(chunk)
+            # Sleep until the bytes written so far are due
+            delay = start + (i + len(chunk)) / self._bandwidth - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._wfile, name)
+
+
+class ArchiverRequestHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rpc_paths = (PATH, "/", "/RPC2")
+
+    def setup(self):
+        SimpleXMLRPCRequestHandler.setup(self)
+        if self.server.bandwidth:
+            self.wfile = ThrottledWriter(self.wfile, self.server.bandwidth)
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            error = server.random.random() < server.error_rate
+            stall = not error and server.random.random() < server.stall_rate
+            delay = server.latency + server.random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        if stall:
+            time.sleep(server.stall_time)
+        if error:
+            # Like the CGI process crashing; the request body is discarded
+            self.rfile.read(int(self.headers.get("content-length", 0)))
+            self.send_response(500, "Internal Server Error")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        SimpleXMLRPCRequestHandler.do_POST(self)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            SimpleXMLRPCRequestHandler.log_message(self, format, *args)
+
+
+class ArchiverServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Multi-threaded XML-RPC server providing the archiver.info, archives,
+    names and values methods of an archiver object such as a MockArchiver
+    or SyntheticArchiver.
+
+    Example usage:
+
+        >>> server = ArchiverServer(SyntheticArchiver(), latency=0.05)
+        >>> url = server.start()
+        >>> archiver = Archiver(url)
+        ...
+        >>> server.stop()
+
+    Attributes:
+        requests (int): The number of requests received.
+
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        archiver,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        jitter=0.0,
+        bandwidth=None,
+        error_rate=0.0,
+        stall_rate=0.0,
+        stall_time=30.0,
+        max_count=None,
+        seed=None,
+        verbose=False,
+    ):
+        """
+        Args:
+            archiver: The object whose methods are served.
+            address (Optional[Tuple[str, int]]): Host and port to listen on.
+                Port 0 picks a free port.
+            latency (Optional[float]): Seconds to wait before handling each
+                request.
+            jitter (Optional[float]): Maximum random number of seconds added
+                to latency.
+            bandwidth (Optional[float]): Maximum bytes per second to send on
+                each connection. If omitted, responses are not throttled.
+            error_rate (Optional[float]): Fraction of requests answered with
+                an HTTP 500 error.
+            stall_rate (Optional[float]): Fraction of requests that wait an
+                extra stall_time seconds before being handled.
+            stall_time (Optional[float]): Length of stalls in seconds.
+            max_count (Optional[int]): Maximum number of samples returned
+                per channel by values, like the limit set in an
+                ArchiveDataServer's configuration.
+            seed (Optional[int]): Seed for the random choice of errors,
+                stalls and jitter.
+            verbose (Optional[bool]): Whether to log each request.
+
+        """
+        SimpleXMLRPCServer.__init__(self, address, ArchiverRequestHandler, logRequests=verbose)
+        self.archiver = archiver
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self.max_count = max_count
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self._thread = None
+        for name in ["info", "archives", "names"]:
+            self.register_function(getattr(archiver, name), "archiver." + name)
+        self.register_function(self._values, "archiver.values")
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+    def _values(self, key, channels, start_sec, start_nano, end_sec, end_nano, count, how):
+        if self.max_count is not None:
+            count = min(count, self.max_count)
+        return self.archiver.values(
+            key, channels, start_sec, start_nano, end_sec, end_nano, count, how
+        )
+
+    def start(self):
+        """Serve requests from a background thread and return the server URL."""
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop serving requests and close the server."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+
+def add_arguments(arg_parser):
+    """Add the options for creating an ArchiverServer to an ArgumentParser."""
+    group = arg_parser.add_argument_group("archiver data")
+    group.add_argument(
+        "--data",
+        choices=["mock", "synthetic"],
+        default="synthetic",
+        help="serve the MockArchiver test data or generated data (default: synthetic)",
+    )
+    group.add_argument("--archives", type=int, default=4)
+    group.add_argument("--channels", type=int, default=100)
+    group.add_argument(
+        "--samples", type=int, default=10000, help="samples per channel (default: 10000)"
+    )
+    group.add_argument("--elements", type=int, default=1)
+    group.add_argument(
+        "--types",
+        nargs="+",
+        default=["DOUBLE"],
+        choices=["STRING", "ENUM", "INT", "DOUBLE"],
+    )
+    group = arg_parser.add_argument_group("fault injection")
+    group.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    group.add_argument("--jitter", type=float, default=0.0, help="maximum extra latency")
+    group.add_argument("--bandwidth", type=float, help="bytes per second per connection")
+    group.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing")
+    group.add_argument(
+        "--stall-rate", type=float, default=0.0, help="fraction of requests stalling"
+    )
+    group.add_argument("--stall-time", type=float, default=30.0)
+    group.add_argument("--max-count", type=int, help="maximum samples per channel from values")
+    group.add_argument("--seed", type=int)
+
+
+def server_from_arguments(args, address=("127.0.0.1", 0)):
+    """Create an ArchiverServer from options added by add_arguments."""
+    if args.data == "mock":
+        archiver = MockArchiver()
+    else:
+        archiver = SyntheticArchiver(
+            num_archives=args.archives,
+            num_channels=args.channels,
+            num_samples=args.samples,
+            elements=args.elements,
+            data_types=[codes.data_type[name] for name in args.types],
+        )
+    return ArchiverServer(
+        archiver,
+        address,
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        stall_rate=args.stall_rate,
+        stall_time=args.stall_time,
+        max_count=args.max_count,
+        seed=args.seed,
+        verbose=getattr(args, "verbose", False),
+    )
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    arg_parser.add_argument("--verbose", action="store_true", help="log each request")
+    add_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    server = server_from_arguments(args, (args.host, args.port))
+    print(f"Serving on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -132,18 +132,18 @@ class MockArchiver(object):
         archive_data = self._archives[key]["data"]
         return_data = []
 
-        start = start_sec + 1e-9 * start_nano
-        end = end_sec + 1e-9 * end_nano
+        start = (start_sec, start_nano)
+        end = (end_sec, end_nano)
 
         for channel in channels:
             try:
                 channel_data = archive_data[channel].copy()
-                channel_values = channel_data["values"]
-                for index, value in enumerate(channel_values):
-                    time = value["secs"] + 1e-9 * value["nano"]
-                    if not start <= time <= end:
-                        channel_values.pop(index)
-                del channel_values[count:]
+                channel_values = [
+                    value
+                    for value in channel_data["values"]
+                    if start <= (value["secs"], value["nano"]) <= end
+                ]
+                channel_data["values"] = channel_values[:count]
             except KeyError:
                 channel_data = {
                     "count": 1,
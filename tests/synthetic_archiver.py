@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+try:
+    from xmlrpclib import Fault
+except ImportError:  # Python 3
+    from xmlrpc.client import Fault
+from channelarchiver import codes, utils
+
+
+NANOSECONDS_PER_SECOND = utils.NANOSECONDS_PER_SECOND
+
+ENUM_STATES = ["Off", "On", "Fault", "Unknown"]
+
+TYPE_NAMES = {
+    codes.data_type.STRING: "STRING",
+    codes.data_type.ENUM: "ENUM",
+    codes.data_type.INT: "INT",
+    codes.data_type.DOUBLE: "DOUBLE",
+}
+
+
+class SyntheticArchiver(object):
+    """
+    A stand-in for the XML-RPC interface of a Channel Archiver that
+    generates its data rather than loading it, so it can be made as large
+    as needed for benchmarking.
+
+    Every channel has num_samples samples spaced period seconds apart from
+    start_sec, and the archives divide that interval between them in equal,
+    consecutive parts. Channels are named SYNTH:<TYPE>:<n> for each data
+    type in data_types, with channels shared between the types as evenly
+    as possible. Samples are computed when requested so memory use does not
+    depend on the size of the archiver.
+
+    The interpolation method is checked but samples are always returned
+    raw.
+
+    """
+
+    def __init__(
+        self,
+        num_archives=4,
+        num_channels=10,
+        num_samples=1000,
+        elements=1,
+        data_types=(codes.data_type.DOUBLE,),
+        start_sec=1342137600,
+        period=1.0,
+    ):
+        """
+        Args:
+            num_archives (Optional[int]): Number of archives.
+            num_channels (Optional[int]): Total number of channels.
+            num_samples (Optional[int]): Number of samples for each channel
+                across all archives.
+            elements (Optional[int]): Number of elements in each sample.
+                Values greater than 1 create waveform channels.
+            data_types (Optional[List[int]]): Data types of the channels,
+                as codes.data_type values.
+            start_sec (Optional[int]): Time of the first sample in seconds
+                since the Epoch.
+            period (Optional[float]): Seconds between samples.
+
+        """
+        self.num_archives = num_archives
+        self.num_samples = num_samples
+        self.elements = elements
+        self.start_ns = start_sec * NANOSECONDS_PER_SECOND
+        self.period_ns = int(period * NANOSECONDS_PER_SECOND)
+        self.channels = {}
+        for i in range(num_channels):
+            data_type = data_types[i % len(data_types)]
+            name = f"SYNTH:{TYPE_NAMES[data_type]}:{i:06d}"
+            self.channels[name] = (i, data_type)
+        self._samples_per_archive = -(-num_samples // num_archives)
+
+    def info(self):
+        return {
+            "desc": "Synthetic Channel Archiver",
+            "how": ["raw", "spreadsheet", "averaged", "plot-binning", "linear"],
+            "stat": [codes.status.str_value(i) for i in range(22)],
+            "sevr": [
+                {
+                    "has_value": True,
+                    "num": num,
+                    "sevr": codes.severity.str_value(num),
+                    "txt_stat": True,
+                }
+                for num in range(4)
+            ],
+            "ver": 0,
+        }
+
+    def archives(self):
+        return [
+            {"key": key, "name": f"Archive {key}", "path": f"/archives/{key}/index"}
+            for key in self._keys()
+        ]
+
+    def names(self, key, pattern):
+        first, last = self._sample_range(key)
+        regex = re.compile(pattern)
+        start_sec, start_nano = self._time(first)
+        end_sec, end_nano = self._time(last - 1)
+        return [
+            {
+                "name": channel,
+                "start_sec": start_sec,
+                "start_nano": start_nano,
+                "end_sec": end_sec,
+                "end_nano": end_nano,
+            }
+            for channel in self.channels
+            if regex.search(channel) is not None
+        ]
+
+    def values(
+        self,
+        key,
+        channels,
+        start_sec,
+        start_nano,
+        end_sec,
+        end_nano,
+        count,
+        interpolation,
+    ):
+        if not 0 <= interpolation <= 4:
+            raise Fault(
+                codes.archiver.ARGUMENT_ERROR, "Invalid how={0}".format(interpolation)
+            )
+        first, last = self._sample_range(key)
+        start_ns = start_sec * NANOSECONDS_PER_SECOND + start_nano
+        end_ns = end_sec * NANOSECONDS_PER_SECOND + end_nano
+        # Index of the first sample at or after start and after the last at
+        # or before end
+        first = max(first, -(-(start_ns - self.start_ns) // self.period_ns))
+        last = min(last, (end_ns - self.start_ns) // self.period_ns + 1)
+        last = max(first, min(last, first + count))
+        return [self._channel_values(channel, first, last) for channel in channels]
+
+    def _keys(self):
+        return [1000 + i for i in range(self.num_archives)]
+
+    def _sample_range(self, key):
+        if key not in self._keys():
+            raise Fault(codes.archiver.NO_INDEX, "Invalid key {0}".format(key))
+        first = (key - 1000) * self._samples_per_archive
+        last = min(first + self._samples_per_archive, self.num_samples)
+        return first, last
+
+    def _time(self, index):
+        return divmod(self.start_ns + index * self.period_ns, NANOSECONDS_PER_SECOND)
+
+    def _channel_values(self, channel, first, last):
+        try:
+            channel_index, data_type = self.channels[channel]
+        except KeyError:
+            channel_index, data_type = 0, codes.data_type.DOUBLE
+            first = last = 0
+        if data_type == codes.data_type.ENUM:
+            meta = {"type": 0, "states": ENUM_STATES}
+        else:
+            meta = {
+                "type": 1,
+                "disp_low": 0.0,
+                "disp_high": 100.0,
+                "alarm_low": 0.0,
+                "alarm_high": 0.0,
+                "warn_low": 0.0,
+                "warn_high": 0.0,
+                "prec": 3,
+                "units": "mA",
+            }
+        values = []
+        for i in range(first, last):
+            secs, nano = self._time(i)
+            values.append(
+                {
+                    "stat": 0 if i % 10 else codes.status.HIHI_ALARM,
+                    "sevr": 0 if i % 10 else codes.severity.MAJOR,
+                    "secs": secs,
+                    "nano": nano,
+                    "value": [
+                        self._value(data_type, channel_index, i, element)
+                        for element in range(self.elements)
+                    ],
+                }
+            )
+        return {
+            "name": channel,
+            "type": data_type,
+            "count": self.elements,
+            "meta": meta,
+            "values": values,
+        }
+
+    @staticmethod
+    def _value(data_type, channel_index, i, element):
+        if data_type == codes.data_type.DOUBLE:
+            return channel_index + (i % 1000) * 0.125 + element
+        elif data_type == codes.data_type.INT:
+            return channel_index + i % 1000 + element
+        elif data_type == codes.data_type.ENUM:
+            return (i + element) % len(ENUM_STATES)
+        return f"value {(i + element) % 100}"
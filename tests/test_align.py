@@ -0,0 +1,110 @@
+import pytest
+
+from channelarchiver import codes, utils
+from channelarchiver.align import align, align_frame
+from channelarchiver.models import ChannelData
+
+np = pytest.importorskip("numpy")
+
+utc = utils.UTC()
+SECOND = utils.NANOSECONDS_PER_SECOND
+
+
+def channel(name, seconds, values, data_type=codes.data_type.DOUBLE, elements=1):
+    return ChannelData(
+        channel=name,
+        values=np.array(values),
+        times_ns=np.array(seconds, dtype=np.int64) * SECOND,
+        statuses=np.arange(len(seconds), dtype=np.uint16),
+        severities=np.zeros(len(seconds), dtype=np.uint16),
+        data_type=data_type,
+        elements=elements,
+        tz=utc,
+    )
+
+
+@pytest.fixture
+def data():
+    return [
+        channel("A", [0, 10, 20], [1.0, 2.0, 3.0]),
+        channel("B", [5, 15], [10, 20], codes.data_type.INT),
+    ]
+
+
+def test_align_previous(data):
+    a, b = align(data)
+    assert a.times_ns.tolist() == [t * SECOND for t in [0, 5, 10, 15, 20]]
+    assert b.times_ns is a.times_ns
+    assert a.values.tolist() == [1.0, 1.0, 2.0, 2.0, 3.0]
+    assert np.isnan(b.values[0])
+    assert b.values[1:].tolist() == [10, 10, 20, 20]
+    assert b.statuses.tolist() == [codes.status.UDF_ALARM, 0, 0, 1, 1]
+    assert b.severities[0] == codes.severity.INVALID
+    assert a.values is not data[0].values
+
+
+def test_align_linear_and_nearest(data):
+    a, b = align(data, period=4, method="linear")
+    assert a.times_ns.tolist() == [t * SECOND for t in [0, 4, 8, 12, 16, 20]]
+    assert a.values.tolist() == pytest.approx([1.0, 1.4, 1.8, 2.2, 2.6, 3.0])
+    assert b.values[2] == pytest.approx(13.0)
+    # Grid times outside the samples cannot be interpolated
+    assert np.isnan(b.values[[0, 1, 4, 5]]).all()
+    a, b = align(data, times=[4 * SECOND, 13 * SECOND], method="nearest")
+    assert a.values.tolist() == [1.0, 2.0]
+    assert b.values.tolist() == [10, 20]
+    assert b.statuses.tolist() == [0, 1]
+
+
+def test_align_linear_before_nan():
+    (a,) = align([channel("A", [0, 10, 20], [1.0, np.nan, 3.0])], period=5, method="linear")
+    assert a.values[0] == 1.0
+    assert np.isnan(a.values[1:4]).all()
+    assert a.values[4] == 3.0
+    (w,) = align(
+        [channel("W", [0, 10], [[1.0, 2.0], [np.nan, 4.0]], elements=2)],
+        times=[0, 5 * SECOND],
+        method="linear",
+    )
+    assert w.values[0].tolist() == [1.0, 2.0]
+    assert np.isnan(w.values[1, 0]) and w.values[1, 1] == 3.0
+
+
+def test_align_tolerance(data):
+    a, b = align(data, times=[3 * SECOND, 7 * SECOND, 30 * SECOND], tolerance=5)
+    assert a.values[0] == 1.0
+    assert np.isnan(a.values[1:]).all()
+    assert np.isnan(b.values[0]) and b.values[1] == 10 and np.isnan(b.values[2])
+    a, _ = align(data, times=[5 * SECOND], method="linear", tolerance=4)
+    assert np.isnan(a.values[0])
+
+
+def test_align_waveforms_and_strings():
+    waveform = channel("W", [0, 10], [[0.0, 10.0], [10.0, 30.0]], elements=2)
+    strings = channel("S", [0, 10], np.array(["a", "b"], dtype=object), codes.data_type.STRING)
+    empty = channel("E", [], [])
+    w, s, e = align([waveform, strings, empty], times=[-SECOND, 5 * SECOND], method="linear")
+    assert np.isnan(w.values[0]).all()
+    assert w.values[1].tolist() == [5.0, 20.0]
+    assert s.values.tolist() == [None, "a"]
+    assert np.isnan(e.values).all()
+    assert e.severities.tolist() == [codes.severity.INVALID] * 2
+
+
+def test_align_frame(data):
+    pytest.importorskip("pandas")
+    waveform = channel("W", [0, 20], [[1, 2], [3, 4]], codes.data_type.INT, 2)
+    frame = align_frame(data + [waveform], period=10, statuses=True)
+    assert list(frame.columns) == (
+        ["A", "A.status", "A.severity", "B", "B.status", "B.severity"]
+        + ["W[0]", "W[1]", "W.status", "W.severity"]
+    )
+    assert frame["A"].tolist() == [1.0, 2.0, 3.0]
+    assert frame["W[1]"].tolist() == [2, 2, 4]
+    assert frame["B.severity"].tolist()[0] == "INVALID"
+    assert frame.index[1].timestamp() == 10
+
+
+def test_align_invalid_method(data):
+    with pytest.raises(ValueError):
+        align(data, method="cubic")
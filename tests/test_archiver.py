@@ -1,3 +1,4 @@
+import time
 from datetime import datetime
 
 import pytest
@@ -5,7 +6,9 @@ from unittest.mock import Mock
 
 from channelarchiver import Archiver, codes, utils, exceptions
 from channelarchiver.models import ChannelData, ArchiveProperties
+from channelarchiver.structures import LRUCache
 from mock_archiver import MockArchiver
+from synthetic_archiver import SyntheticArchiver
 
 utc = utils.UTC()
 local_tz = utils.local_tz
@@ -256,3 +259,497 @@ def test_get_with_wrong_number_of_keys(archiver):
             archive_keys=[1001, 1008],
             interpolation=codes.interpolation.RAW,
         )
+
+
+def test_get_paginated(archiver):
+    values_mock = Mock(wraps=archiver.archiver.values)
+    archiver.archiver.values = values_mock
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    channel_data = archiver.get(
+        "EXAMPLE:DOUBLE_SCALAR",
+        start,
+        end,
+        limit=2,
+        interpolation=codes.interpolation.RAW,
+        paginate=True,
+    )
+    assert channel_data.values == [200.5, 199.9, 198.7, 196.1]
+    assert channel_data.statuses == [0, 6, 6, 5]
+    assert channel_data.times == [
+        datetime(2012, 7, 12, 21, 47, 23, 664000, utc),
+        datetime(2012, 7, 13, 2, 5, 1, 443589, utc),
+        datetime(2012, 7, 13, 7, 19, 31, 806097, utc),
+        datetime(2012, 7, 13, 11, 18, 55, 671259, utc),
+    ]
+    second_call = values_mock.call_args_list[1]
+    assert second_call[0][1:4] == (["EXAMPLE:DOUBLE_SCALAR"], 1342145101, 443588732)
+    assert values_mock.call_count == 4
+
+
+def test_get_paginated_multiple(archiver):
+    start = datetime(2012, 1, 1)
+    end = datetime(2013, 1, 1)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM", "EXAMPLE:ENUM_SCALAR"]
+    # With one sample per page a second sample at a timestamp cannot be ruled out
+    with pytest.warns(exceptions.SamplesSkippedWarning):
+        data = archiver.get(
+            channels,
+            start,
+            end,
+            limit=1,
+            interpolation=codes.interpolation.RAW,
+            paginate=True,
+        )
+    assert [d.channel for d in data] == channels
+    assert data[0].values == [200.5, 199.9, 198.7, 196.1]
+    assert data[1].values == [[3, 5, 13], [2, 4, 11], [0, 7, 1]]
+    assert data[2].values == [7, 1, 8]
+
+
+def test_get_paginated_complete_first_pages(archiver):
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM", "EXAMPLE:ENUM_SCALAR"]
+    archiver.scan_archives(channels)
+    archiver.get(channels, start, end, interpolation="raw", paginate=True, scan_archives=False)
+    # Only the longest page of each archive is followed up, as the
+    # archiver's max_count is unknown
+    assert archiver.archiver.values.call_count == 4
+    follow_up = archiver.archiver.values.call_args_list[1]
+    assert follow_up[0][:2] == (1001, ["EXAMPLE:DOUBLE_SCALAR"])
+
+    archiver.archiver.values.reset_mock()
+    archiver.max_count = 1000
+    data = archiver.get(
+        channels, start, end, interpolation="raw", paginate=True, scan_archives=False
+    )
+    assert archiver.archiver.values.call_count == 2
+    assert data[2].values == [7, 1, 8]
+
+
+def test_get_paginated_archiver_returns_one_sample(synthetic):
+    synthetic.archiver = SyntheticArchiver(num_archives=1, num_channels=1, num_samples=45)
+    values = synthetic.archiver.values
+    synthetic.archiver.values = lambda *args: values(*args[:6], min(args[6], 1), args[7])
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    with pytest.warns(exceptions.SamplesSkippedWarning):
+        data = synthetic.get("SYNTH:DOUBLE:000000", start, end, interpolation="raw", paginate=True)
+    assert len(data.values) == 45
+    assert synthetic._observed_max_count == 1
+
+
+def test_get_paginated_warns_of_skipped_samples(archiver):
+    samples = [
+        {"secs": 1342137600, "nano": 0, "stat": 0, "sevr": 0, "value": [float(i)]}
+        for i in range(3)
+    ]
+    samples.append({"secs": 1342137601, "nano": 0, "stat": 0, "sevr": 0, "value": [3.0]})
+
+    def values(key, channels, start_sec, start_nano, end_sec, end_nano, count, how):
+        page = [s for s in samples if (s["secs"], s["nano"]) >= (start_sec, start_nano)]
+        return [dict(archive_data, values=page[: min(count, 2)])]
+
+    archive_data = archiver.archiver.values(
+        1001, ["EXAMPLE:DOUBLE_SCALAR"], 0, 0, 1342137600, 0, 1, 0
+    )[0]
+    archiver.archiver.values = values
+    archiver.max_count = 2
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    with pytest.warns(exceptions.SamplesSkippedWarning):
+        data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw", paginate=True)
+    # The third sample at the first timestamp could not be requested
+    assert data.values == [0.0, 1.0, 3.0]
+
+
+def test_iter_values(archiver):
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    chunks = list(archiver.iter_values("EXAMPLE:DOUBLE_SCALAR", start, end, limit=3))
+    assert [chunk.values for chunk in chunks] == [[200.5, 199.9, 198.7], [196.1]]
+    assert all(chunk.channel == "EXAMPLE:DOUBLE_SCALAR" for chunk in chunks)
+    assert chunks[1].times == [datetime(2012, 7, 13, 11, 18, 55, 671259, utc)]
+    assert chunks[1].archive_key == 1001
+    assert chunks[1].interpolation == codes.interpolation.RAW
+
+
+def test_iter_values_is_lazy(archiver):
+    values_mock = Mock(wraps=archiver.archiver.values)
+    archiver.archiver.values = values_mock
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    chunks = archiver.iter_values("EXAMPLE:DOUBLE_SCALAR", start, end, limit=1)
+    assert next(chunks).values == [200.5]
+    assert values_mock.call_count == 1
+
+
+def test_get_concurrent(archiver):
+    archiver.max_workers = 4
+    archiver._new_proxy = MockArchiver
+    start = datetime(2012, 1, 1)
+    end = datetime(2013, 1, 1)
+    channels = ["EXAMPLE:ENUM_SCALAR", "EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM"]
+    data = archiver.get(channels, start, end, interpolation=codes.interpolation.RAW)
+    assert [d.channel for d in data] == channels
+    assert [d.archive_key for d in data] == [1008, 1001, 1001]
+    assert data[0].values == [7, 1, 8]
+    assert data[1].values == [200.5, 199.9, 198.7, 196.1]
+
+
+def test_get_repeated_channels(archiver):
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:ENUM_SCALAR", "EXAMPLE:DOUBLE_SCALAR"]
+    data = archiver.get(channels, start, end, interpolation=codes.interpolation.RAW)
+    assert [d.channel for d in data] == channels
+    assert data[0].values == data[2].values == [200.5, 199.9, 198.7, 196.1]
+    assert data[0] is not data[2]
+    requested = [call[0][1] for call in archiver.archiver.values.call_args_list]
+    assert sorted(requested) == [["EXAMPLE:DOUBLE_SCALAR"], ["EXAMPLE:ENUM_SCALAR"]]
+
+
+def test_get_max_channels_per_request(archiver):
+    add_split_channel(archiver.archiver)
+    archiver.max_channels_per_request = 2
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM", "EXAMPLE:SPLIT_SCALAR"]
+    data = archiver.get(channels, start, end, interpolation=codes.interpolation.RAW)
+    assert [d.channel for d in data] == channels
+    assert data[1].values == [[3, 5, 13], [2, 4, 11], [0, 7, 1]]
+    requested = [call[0][1] for call in archiver.archiver.values.call_args_list]
+    assert requested == [channels[:2], channels[2:]]
+
+
+def test_get_concurrent_uses_worker_proxies(archiver):
+    archiver.max_workers = 2
+    proxies = []
+
+    def new_proxy():
+        proxy = MockArchiver()
+        proxy.values = Mock(wraps=proxy.values)
+        proxies.append(proxy)
+        return proxy
+
+    archiver._new_proxy = new_proxy
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    channels = ["EXAMPLE:ENUM_SCALAR", "EXAMPLE:DOUBLE_SCALAR"]
+    archiver.get(channels, "2012-01-01Z", "2013-01-01Z", interpolation="raw")
+    assert archiver.archiver.values.call_count == 0
+    assert sum(proxy.values.call_count for proxy in proxies) == 2
+
+
+def test_scan_archives_incremental(archiver):
+    archiver.archiver.names = Mock(wraps=archiver.archiver.names)
+    archiver.scan_archives(["EXAMPLE:DOUBLE_SCALAR"], incremental=True)
+    assert archiver.archiver.names.call_count == 4
+    archiver.scan_archives(["EXAMPLE:DOUBLE_SCALAR"], incremental=True)
+    assert archiver.archiver.names.call_count == 4
+    archiver.scan_archives(
+        ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:ENUM_SCALAR"], incremental=True
+    )
+    assert archiver.archiver.names.call_args[0][1] == "^(EXAMPLE:ENUM_SCALAR)$"
+    assert "EXAMPLE:ENUM_SCALAR" in archiver.archives_for_channel
+
+
+def test_scan_archives_matches_exact_names(archiver):
+    archiver.scan_archives(["EXAMPLE:DOUBLE", "EXAMPLE.ENUM_SCALAR"])
+    assert not archiver.archives_for_channel
+
+
+def test_scan_archives_splits_patterns(archiver):
+    archiver.max_pattern_length = 30
+    archiver.archiver.names = Mock(wraps=archiver.archiver.names)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:ENUM_SCALAR", "EXAMPLE:INT_WAVEFORM"]
+    archiver.scan_archives(channels)
+    patterns = {call[0][1] for call in archiver.archiver.names.call_args_list}
+    assert patterns == {"^(" + channel + ")$" for channel in channels}
+    assert archiver.archiver.names.call_count == 12
+    assert set(archiver.archives_for_channel) == set(channels)
+
+
+def test_scan_archives_concurrent(archiver):
+    archiver.max_workers = 4
+    archiver._new_proxy = MockArchiver
+    archiver.scan_archives()
+    assert set(archiver.archives_for_channel) >= {
+        "EXAMPLE:DOUBLE_SCALAR",
+        "EXAMPLE:INT_WAVEFORM",
+        "EXAMPLE:ENUM_SCALAR",
+    }
+    assert archiver.archives_for_channel["EXAMPLE:ENUM_SCALAR"][0].key == 1008
+
+
+def test_search(archiver):
+    archiver.archiver.names = Mock(wraps=archiver.archiver.names)
+    assert archiver.search("EXAMPLE:*_SCALAR") == [
+        "EXAMPLE:DOUBLE_SCALAR",
+        "EXAMPLE:ENUM_SCALAR",
+    ]
+    assert archiver.archiver.names.call_count == 4
+    assert archiver.search("EXAMPLE:INT*") == ["EXAMPLE:INT_WAVEFORM"]
+    assert archiver.search("*WAVE*") == ["EXAMPLE:INT_WAVEFORM"]
+    assert archiver.search("EXAMPLE:MISSING") == []
+    assert archiver.archiver.names.call_count == 4
+    archiver.search("*", refresh=True)
+    assert archiver.archiver.names.call_count == 8
+
+
+def add_split_channel(mock_archiver):
+    """Add a channel whose samples are split between archives 1001 and 1008."""
+    hour = 3600
+    midnight = 1342137600  # 2012-07-13 00:00 UTC
+
+    def channel_data(hours):
+        return {
+            "count": 1,
+            "meta": mock_archiver._archives["1001"]["data"]["EXAMPLE:DOUBLE_SCALAR"][
+                "meta"
+            ],
+            "name": "EXAMPLE:SPLIT_SCALAR",
+            "type": codes.data_type.DOUBLE,
+            "values": [
+                {
+                    "secs": midnight + h * hour,
+                    "nano": 0,
+                    "stat": 0,
+                    "sevr": 0,
+                    "value": [float(h)],
+                }
+                for h in hours
+            ],
+        }
+
+    mock_archiver._archives["1001"]["data"]["EXAMPLE:SPLIT_SCALAR"] = channel_data(
+        [0, 1, 2]
+    )
+    mock_archiver._archives["1008"]["data"]["EXAMPLE:SPLIT_SCALAR"] = channel_data(
+        [2, 3, 4, 5]
+    )
+
+
+def test_get_stitched(archiver):
+    add_split_channel(archiver.archiver)
+    start = datetime(2012, 7, 12, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    unstitched = archiver.get(
+        "EXAMPLE:SPLIT_SCALAR", start, end, interpolation=codes.interpolation.RAW
+    )
+    assert unstitched.values == [2.0, 3.0, 4.0, 5.0]
+    stitched = archiver.get(
+        "EXAMPLE:SPLIT_SCALAR",
+        start,
+        end,
+        interpolation=codes.interpolation.RAW,
+        stitch=True,
+    )
+    assert stitched.values == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    assert stitched.times[2] == datetime(2012, 7, 13, 2, tzinfo=utc)
+    assert stitched.archive_key == 1001
+
+
+def test_get_stitched_requests_segments(archiver):
+    add_split_channel(archiver.archiver)
+    values_mock = Mock(wraps=archiver.archiver.values)
+    archiver.archiver.values = values_mock
+    start = datetime(2012, 7, 13, 1, tzinfo=utc)
+    end = datetime(2012, 7, 13, 4, tzinfo=utc)
+    channels = ["EXAMPLE:SPLIT_SCALAR", "EXAMPLE:DOUBLE_SCALAR"]
+    split, double = archiver.get(
+        channels, start, end, interpolation=codes.interpolation.RAW, stitch=True
+    )
+    assert split.values == [1.0, 2.0, 3.0, 4.0]
+    assert double.values == [199.9]
+    split_calls = [
+        call[0][:6]
+        for call in values_mock.call_args_list
+        if call[0][1] == ["EXAMPLE:SPLIT_SCALAR"]
+    ]
+    assert split_calls == [
+        (1001, ["EXAMPLE:SPLIT_SCALAR"], 1342141200, 0, 1342144800, 0),
+        (1008, ["EXAMPLE:SPLIT_SCALAR"], 1342144800, 0, 1342152000, 0),
+    ]
+
+
+def test_get_columnar(archiver):
+    np = pytest.importorskip("numpy")
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM", "EXAMPLE:ENUM_SCALAR"]
+    scalar, waveform, enum = archiver.get(
+        channels, start, end, interpolation=codes.interpolation.RAW, columnar=True
+    )
+    assert scalar.values.dtype == np.float64
+    assert scalar.values.tolist() == [200.5, 199.9, 198.7, 196.1]
+    assert scalar.statuses.dtype == np.uint16
+    assert scalar.statuses.tolist() == [0, 6, 6, 5]
+    assert scalar.severities.tolist() == [0, 1, 1, 2]
+    assert scalar.times_ns.dtype == np.int64
+    assert scalar.times_ns[0] == 1342129643663999895
+    assert scalar.times[0] == datetime(2012, 7, 12, 21, 47, 23, 664000, utc)
+    assert waveform.values.shape == (3, 3)
+    assert waveform.values.dtype == np.int32
+    assert waveform.values.tolist() == [[3, 5, 13], [2, 4, 11], [0, 7, 1]]
+    assert enum.values.dtype == np.uint16
+    assert enum.values.tolist() == [7, 1, 8]
+
+
+def test_get_times_are_lazy(archiver, monkeypatch):
+    conversion = Mock(wraps=utils.datetimes_from_sec_and_nano)
+    monkeypatch.setattr(utils, "datetimes_from_sec_and_nano", conversion)
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 13, 10, tzinfo=utc)
+    archiver.scan_archives()
+    conversion.reset_mock()
+    channel_data = archiver.get(
+        "EXAMPLE:DOUBLE_SCALAR",
+        start,
+        end,
+        interpolation=codes.interpolation.RAW,
+        scan_archives=False,
+    )
+    assert channel_data.times_ns == [1342145101443588732, 1342163971806097162]
+    assert conversion.call_count == 0
+    assert channel_data.times[1] == datetime(2012, 7, 13, 7, 19, 31, 806097, utc)
+    assert conversion.call_count == 1
+
+
+def test_get_cached(archiver):
+    archiver.cache = LRUCache(10 ** 6)
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2012, 7, 13, 11, tzinfo=utc)
+    first = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    second = archiver.get(
+        ["EXAMPLE:DOUBLE_SCALAR"], start, end, interpolation=codes.interpolation.RAW
+    )[0]
+    assert archiver.archiver.values.call_count == 1
+    assert second.values == first.values == [200.5, 199.9, 198.7]
+    assert second is not first
+    assert (archiver.cache.hits, archiver.cache.misses) == (1, 1)
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, limit=2, interpolation="raw")
+    assert archiver.archiver.values.call_count == 2
+    assert archiver.cache.nbytes > 0
+
+
+def test_get_cache_expires_data_that_may_change(archiver, monkeypatch):
+    archiver.cache = LRUCache(10 ** 6)
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    # The archive ends at 2012-07-13 11:18:55 so more samples may arrive
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert archiver.archiver.values.call_count == 1
+    expired = time.monotonic() + archiver.cache_ttl
+    monkeypatch.setattr(time, "monotonic", lambda: expired)
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert archiver.archiver.values.call_count == 2
+    monkeypatch.undo()
+    archiver.cache.clear()
+    archiver.cache_ttl = None
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert len(archiver.cache) == 0
+    # A channel missing from the response does not stop caching
+    values = archiver.archiver.values
+    archiver.archiver.values = lambda *args: values(*args)[:1]
+    end = datetime(2012, 7, 13, 8, tzinfo=utc)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM"]
+    data = archiver.get(channels, start, end, interpolation="raw")
+    assert data[1] is None
+    assert len(archiver.cache) == 1
+
+
+def test_get_cached_data_is_copied(archiver):
+    archiver.cache = LRUCache(10 ** 6)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2012, 7, 13, 11, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    data.values[0] = -1
+    data.values.append(999)
+    assert archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw").values == [
+        200.5,
+        199.9,
+        198.7,
+    ]
+    columnar = archiver.get(
+        "EXAMPLE:INT_WAVEFORM", start, end, interpolation="raw", columnar=True
+    )
+    columnar.values *= 0
+    columnar = archiver.get(
+        "EXAMPLE:INT_WAVEFORM", start, end, interpolation="raw", columnar=True
+    )
+    assert columnar.values[0].tolist() == [3, 5, 13]
+
+
+def test_get_cache_size_limit(archiver):
+    archiver.cache = LRUCache(1)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert len(archiver.cache) == 0
+
+
+@pytest.fixture
+def synthetic():
+    archiver = Archiver("http://fake")
+    archiver.archiver = SyntheticArchiver(num_archives=4, num_channels=2, num_samples=1000)
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    return archiver
+
+
+def test_plan_query(synthetic):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    channels = ["SYNTH:DOUBLE:000000", "SYNTH:DOUBLE:000001"]
+    plan = synthetic.plan_query(channels, start, end, 2000, stitch=True)
+    assert plan.interpolation == "raw"
+    assert plan.paginate
+    assert 900 < plan.estimated_samples < 1100
+    plan = synthetic.plan_query(channels, start, end, 200, stitch=True)
+    assert plan.interpolation == "plot-binning"
+    assert plan.limit == 200
+    plan = synthetic.plan_query(channels, start, end, 200, probe=False)
+    assert plan.interpolation == "plot-binning"
+    assert plan.estimated_samples is None
+    later = datetime(2013, 1, 1, tzinfo=utc)
+    plan = synthetic.plan_query(channels, later, later.replace(day=2), 200)
+    assert plan.interpolation == "raw"
+    assert plan.estimated_samples == 0
+
+
+def test_get_points(synthetic):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    channel = "SYNTH:DOUBLE:000000"
+    data = synthetic.get(channel, start, datetime(2012, 7, 13, 0, 0, 50, tzinfo=utc), points=500)
+    # The probe held every sample so no further request was made
+    assert synthetic.archiver.values.call_count == 1
+    assert len(data.values) == 51
+    assert data.query_plan.interpolation == "raw"
+    assert data.interpolation == codes.interpolation.RAW
+
+    synthetic.archiver.values.reset_mock()
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    data = synthetic.get(channel, start, end, points=2000, stitch=True)
+    assert len(data.values) == 1000
+    assert data.query_plan.paginate
+
+    data = synthetic.get(channel, start, end, points=100, stitch=True)
+    assert data.interpolation == codes.interpolation.PLOT_BINNING
+    assert synthetic.archiver.values.call_args[0][-2:] == (100, codes.interpolation.PLOT_BINNING)
+
+
+def test_get_paginated_batches_follow_ups(synthetic):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 13, 0, 2, tzinfo=utc)
+    channels = ["SYNTH:DOUBLE:000000", "SYNTH:DOUBLE:000001"]
+    data = synthetic.get(channels, start, end, limit=50, interpolation="raw", paginate=True)
+    assert [len(channel_data.values) for channel_data in data] == [121, 121]
+    # The channels share timestamps so each page is requested for both
+    requested = [call[0][1] for call in synthetic.archiver.values.call_args_list]
+    assert requested == [channels] * 3
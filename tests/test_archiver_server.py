@@ -0,0 +1,191 @@
+import socket
+import threading
+import time
+from datetime import datetime
+
+try:
+    from xmlrpc.client import ProtocolError
+except ImportError:  # Python 2
+    from xmlrpclib import ProtocolError
+
+import pytest
+
+from channelarchiver import (
+    Archiver,
+    HedgePolicy,
+    PooledTransport,
+    RetryPolicy,
+    utils,
+)
+from channelarchiver.exceptions import ArchiverTimeout
+from archiver_server import ArchiverServer
+from mock_archiver import MockArchiver
+from synthetic_archiver import SyntheticArchiver
+
+utc = utils.UTC()
+start = datetime(2012, 7, 12, tzinfo=utc)
+end = datetime(2012, 7, 14, tzinfo=utc)
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start_server(archiver, **kwargs):
+        server = ArchiverServer(archiver, **kwargs)
+        servers.append(server)
+        return server, server.start()
+
+    yield start_server
+    for server in servers:
+        server.stop()
+
+
+def test_archiver_server_serves_mock_data(start_server):
+    server, url = start_server(MockArchiver())
+    data = Archiver(url).get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [200.5, 199.9, 198.7, 196.1]
+    # archives, names for each of the 4 archives and values
+    assert server.requests == 6
+
+
+def test_archiver_server_max_count(start_server):
+    server, url = start_server(SyntheticArchiver(num_archives=1, num_samples=50), max_count=20)
+    archiver = Archiver(url)
+    data = archiver.get("SYNTH:DOUBLE:000000", start, end, limit=100, interpolation="raw")
+    assert len(data.values) == 20
+    data = archiver.get(
+        "SYNTH:DOUBLE:000000", start, end, limit=100, interpolation="raw", paginate=True
+    )
+    assert len(data.values) == 50
+    # The archiver's limit was learned from the page it cut short
+    assert archiver._observed_max_count == 20
+
+
+def test_archiver_server_latency_and_bandwidth(start_server):
+    server, url = start_server(
+        SyntheticArchiver(num_archives=1, num_samples=200), latency=0.05, bandwidth=100000
+    )
+    archiver = Archiver(url, transport=PooledTransport(gzip=False))
+    archiver.scan_archives()
+    request_start = time.time()
+    archiver.get("SYNTH:DOUBLE:000000", start, end, limit=200, interpolation="raw")
+    # About 90 kB is sent for 200 samples
+    assert time.time() - request_start > 0.5
+
+
+def test_archiver_server_errors(start_server):
+    server, url = start_server(MockArchiver(), error_rate=1.0)
+    archiver = Archiver(url)
+    with pytest.raises(ProtocolError) as exc_info:
+        archiver.scan_archives()
+    assert exc_info.value.errcode == 500
+    server.error_rate = 0.0
+    archiver.scan_archives()
+    assert "EXAMPLE:ENUM_SCALAR" in archiver.archives_for_channel
+
+
+def test_archiver_server_errors_retried(start_server):
+    server, url = start_server(MockArchiver(), error_rate=0.5, seed=0)
+    archiver = Archiver(url, retry=RetryPolicy(attempts=20, backoff=0.001))
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [200.5, 199.9, 198.7, 196.1]
+    assert server.requests > 6
+
+
+def test_archiver_server_timeout(start_server):
+    server, url = start_server(MockArchiver(), stall_rate=1.0, stall_time=2.0)
+    archiver = Archiver(url, timeout=0.1)
+    request_start = time.time()
+    with pytest.raises(socket.timeout):
+        archiver.scan_archives()
+    assert time.time() - request_start < 1.0
+
+
+def test_archiver_server_deadline(start_server):
+    server, url = start_server(MockArchiver(), stall_rate=1.0, stall_time=2.0)
+    archiver = Archiver(url)
+    request_start = time.time()
+    with pytest.raises(ArchiverTimeout):
+        archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, deadline=0.2)
+    assert time.time() - request_start < 1.0
+
+
+def test_archiver_server_recovers_after_deadlines(start_server):
+    server, url = start_server(MockArchiver(), stall_rate=1.0, stall_time=5.0)
+    archiver = Archiver(url)
+    for _ in range(6):
+        with pytest.raises(ArchiverTimeout):
+            archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, deadline=0.1)
+    server.stall_rate = 0.0
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw", deadline=2.0)
+    assert data.values == [200.5, 199.9, 198.7, 196.1]
+
+
+def test_archiver_server_abandoned_calls_time_out(start_server):
+    server, url = start_server(MockArchiver(), stall_rate=1.0, stall_time=5.0)
+    archiver = Archiver(url)
+    threads = threading.active_count()
+    with pytest.raises(ArchiverTimeout):
+        archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, deadline=0.1)
+    # The abandoned call's socket times out at the deadline, ending its thread
+    time.sleep(0.5)
+    assert threading.active_count() == threads
+
+
+def test_archiver_hedge_requires_timeout():
+    with pytest.raises(ValueError):
+        Archiver("http://host/cgi-bin/ArchiveDataServer.cgi", hedge=HedgePolicy())
+
+
+def test_archiver_server_hedged_requests(start_server):
+    server, url = start_server(MockArchiver())
+    hedge = HedgePolicy(delay=0.1)
+    archiver = Archiver(url, timeout=10, hedge=hedge)
+    archiver.scan_archives()
+    assert hedge.hedged == 0
+    # Only the first values request stalls, so its duplicate is faster
+    stalled = []
+    original_values = server.archiver.values
+
+    def values(*args):
+        if not stalled:
+            stalled.append(True)
+            time.sleep(2.0)
+        return original_values(*args)
+
+    server.archiver.values = values
+    request_start = time.time()
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert time.time() - request_start < 1.0
+    assert data.values == [200.5, 199.9, 198.7, 196.1]
+    assert hedge.hedged == 1
+
+
+def test_archiver_shared_between_threads(start_server):
+    server, url = start_server(SyntheticArchiver(num_archives=1, num_samples=200), latency=0.01)
+    archiver = Archiver(url)
+    archiver.scan_archives()
+    errors = []
+
+    def client():
+        try:
+            for _ in range(5):
+                data = archiver.get(
+                    "SYNTH:DOUBLE:000000",
+                    start,
+                    end,
+                    limit=200,
+                    interpolation="raw",
+                    scan_archives=False,
+                )
+                assert len(data.values) == 200
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=client) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,118 @@
+import time
+from datetime import datetime
+
+import pytest
+from unittest.mock import Mock
+
+from channelarchiver import Archiver, ArchiveCatalog, utils
+from channelarchiver.models import ArchiveProperties
+from mock_archiver import MockArchiver
+
+utc = utils.UTC()
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ArchiveCatalog(str(tmp_path / "catalog.db"))
+
+
+def make_archiver(catalog):
+    archiver = Archiver("http://fake", catalog=catalog)
+    archiver.archiver = MockArchiver()
+    archiver.archiver.names = Mock(wraps=archiver.archiver.names)
+    archiver._new_proxy = lambda: archiver.archiver
+    return archiver
+
+
+def test_store_and_load(catalog):
+    archives = [
+        ArchiveProperties(
+            1001,
+            datetime(2012, 7, 12, 21, 47, 23, 664000, utc),
+            datetime(2012, 7, 13, 11, 18, 55, 671259, utc),
+        ),
+        ArchiveProperties(
+            1008,
+            datetime(2012, 7, 14, tzinfo=utc),
+            datetime(2012, 7, 15, tzinfo=utc),
+        ),
+    ]
+    catalog.store("http://a", {"CHAN:A": archives, "CHAN:B": []})
+    entries = catalog.load("http://a", ["CHAN:A", "CHAN:B", "CHAN:C"])
+    assert entries["CHAN:A"][0] == archives
+    assert entries["CHAN:B"][0] == []
+    assert "CHAN:C" not in entries
+    assert catalog.load("http://b") == {}
+    assert catalog.last_full_scan("http://a") is None
+
+
+def test_catalog_shared_between_archivers(catalog):
+    first = make_archiver(catalog)
+    first.scan_archives(["EXAMPLE:DOUBLE_SCALAR"])
+    assert first.archiver.names.call_count == 4
+
+    second = make_archiver(catalog)
+    second.scan_archives(["EXAMPLE:DOUBLE_SCALAR"])
+    assert second.archiver.names.call_count == 0
+    assert (
+        second.archives_for_channel["EXAMPLE:DOUBLE_SCALAR"]
+        == first.archives_for_channel["EXAMPLE:DOUBLE_SCALAR"]
+    )
+
+
+def test_catalog_full_scan(catalog):
+    make_archiver(catalog).scan_archives()
+    archiver = make_archiver(catalog)
+    archiver.scan_archives()
+    assert archiver.archiver.names.call_count == 0
+    assert archiver.archives_for_channel["EXAMPLE:ENUM_SCALAR"][0].key == 1008
+
+
+def test_catalog_remembers_missing_channels(catalog):
+    make_archiver(catalog).scan_archives(["EXAMPLE:MISSING"])
+    archiver = make_archiver(catalog)
+    archiver.scan_archives(["EXAMPLE:MISSING"])
+    assert archiver.archiver.names.call_count == 0
+    assert not archiver.archives_for_channel.get("EXAMPLE:MISSING")
+
+
+def test_catalog_stale_entries_refreshed_in_background(catalog):
+    make_archiver(catalog).scan_archives(["EXAMPLE:DOUBLE_SCALAR"])
+    catalog.ttl = 0
+    archiver = make_archiver(catalog)
+    archiver.scan_archives(["EXAMPLE:DOUBLE_SCALAR"])
+    assert archiver.archives_for_channel["EXAMPLE:DOUBLE_SCALAR"][0].key == 1001
+    deadline = time.time() + 5
+    while archiver.archiver.names.call_count < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    assert archiver.archiver.names.call_count == 4
+
+
+def test_catalog_background_refresh_updates_search(catalog):
+    make_archiver(catalog).scan_archives()
+    catalog.ttl = 0
+    archiver = make_archiver(catalog)
+    names = archiver.archiver.names
+    before = []
+
+    def names_with_new_channel(key, pattern):
+        before.append(archiver.archives_for_channel)
+        new_channel = {
+            "name": "EXAMPLE:NEW",
+            "start_sec": 1342093643,
+            "start_nano": 0,
+            "end_sec": 1342142335,
+            "end_nano": 0,
+        }
+        return names(key, pattern) + ([new_channel] if key == 1001 else [])
+
+    archiver.archiver.names = Mock(side_effect=names_with_new_channel)
+    assert "EXAMPLE:DOUBLE_SCALAR" in archiver.search("EXAMPLE:*")
+    deadline = time.time() + 5
+    while (archiver._refreshing or "EXAMPLE:NEW" not in archiver.archives_for_channel) and (
+        time.time() < deadline
+    ):
+        time.sleep(0.01)
+    # The refresh replaces the dictionary instead of changing it while it may be read
+    assert "EXAMPLE:NEW" not in before[0]
+    assert archiver.search("EXAMPLE:NEW*") == ["EXAMPLE:NEW"]
@@ -130,3 +130,68 @@ def test_array_str(array_channel):
         "                       86,  85,  84,  83,  82,  81]"
     )
     assert str(array_channel) == expected_str
+
+
+def test_scalar_array(scalar_channel):
+    np = pytest.importorskip("numpy")
+    array = scalar_channel.array
+    assert array["value"].tolist() == [200.5, 199.9, 198.7, 196.1]
+    assert array["status"].tolist() == [0, 6, 6, 5]
+    assert array["severity"].tolist() == [0, 1, 1, 2]
+    assert array["time"][0] == np.datetime64("2012-07-12T21:47:23.664000")
+
+
+def test_waveform_array(array_channel):
+    pytest.importorskip("numpy")
+    array = array_channel.array
+    assert array["value"].shape == (2, 20)
+    assert array["value"][1, 0] == 100
+
+
+@pytest.fixture
+def columnar_channel(scalar_channel):
+    np = pytest.importorskip("numpy")
+    times_ns = np.array(
+        [
+            1342129643664000000,
+            1342145101443589000,
+            1342163971806097000,
+            1342178335671259000,
+        ]
+    )
+    scalar_channel.times = None
+    scalar_channel.times_ns = times_ns
+    scalar_channel.tz = utc
+    scalar_channel.values = np.array(scalar_channel.values)
+    scalar_channel.statuses = np.array(scalar_channel.statuses, np.uint16)
+    scalar_channel.severities = np.array(scalar_channel.severities, np.uint16)
+    return scalar_channel
+
+
+def test_columnar_times(columnar_channel):
+    assert columnar_channel.times == [
+        datetime.datetime(2012, 7, 12, 21, 47, 23, 664000, utc),
+        datetime.datetime(2012, 7, 13, 2, 5, 1, 443589, utc),
+        datetime.datetime(2012, 7, 13, 7, 19, 31, 806097, utc),
+        datetime.datetime(2012, 7, 13, 11, 18, 55, 671259, utc),
+    ]
+
+
+def test_columnar_str(columnar_channel):
+    assert str(columnar_channel) == (
+        "               time  value      status  severity\n"
+        "2012-07-12 21:47:23  200.5    NO_ALARM  NO_ALARM\n"
+        "2012-07-13 02:05:01  199.9   LOW_ALARM     MINOR\n"
+        "2012-07-13 07:19:31  198.7   LOW_ALARM     MINOR\n"
+        "2012-07-13 11:18:55  196.1  LOLO_ALARM     MAJOR"
+    )
+    assert "statuses=[0, 6, 6, 5]" in repr(columnar_channel)
+
+
+def test_times_ns_from_times(scalar_channel):
+    assert scalar_channel.times_ns == [
+        1342129643664000000,
+        1342145101443589000,
+        1342163971806097000,
+        1342178335671259000,
+    ]
@@ -0,0 +1,90 @@
+import pytest
+
+from channelarchiver import codes, utils
+from channelarchiver.downsample import downsample, lttb, mean, minmax
+from channelarchiver.models import ChannelData
+
+np = pytest.importorskip("numpy")
+
+SECOND = utils.NANOSECONDS_PER_SECOND
+
+
+def channel(values, severities=None, data_type=codes.data_type.DOUBLE):
+    values = np.asarray(values)
+    count = len(values)
+    if severities is None:
+        severities = np.zeros(count, np.uint16)
+    return ChannelData(
+        channel="EXAMPLE:CHANNEL",
+        values=values,
+        times_ns=np.arange(count, dtype=np.int64) * SECOND,
+        statuses=np.where(np.asarray(severities) == 2, codes.status.HIHI_ALARM, 0),
+        severities=np.asarray(severities, np.uint16),
+        units="mA",
+        data_type=data_type,
+        elements=1 if values.ndim == 1 else values.shape[1],
+        tz=utils.UTC(),
+    )
+
+
+def test_minmax():
+    data = channel([5.0, 1.0, 9.0, 4.0, 3.0, 3.0, 8.0, 0.0, 2.0, 7.0])
+    result = minmax(data, 2)
+    assert result.values.tolist() == [1.0, 9.0, 8.0, 0.0]
+    assert result.times_ns.tolist() == [t * SECOND for t in [1, 2, 6, 7]]
+    assert result.units == "mA"
+    assert data.values.tolist()[:2] == [5.0, 1.0]
+
+
+def test_minmax_keeps_worst_alarm():
+    severities = [0, 0, 2, 0, 0, 0, 1, 3872]
+    result = minmax(channel([1, 2, 3, 4, 5, 6, 7, 8], severities), 2)
+    assert result.severities.tolist() == [2, 2, 1, 1]
+    assert result.statuses.tolist()[:2] == [codes.status.HIHI_ALARM] * 2
+
+
+def test_minmax_waveform():
+    values = np.arange(24, dtype=float).reshape(6, 4)
+    values[1, 0] = -1
+    result = minmax(channel(values), 2)
+    assert result.values.shape == (4, 4)
+    assert result.values[0].tolist() == [-1.0, 1.0, 2.0, 3.0]
+    assert result.values[1].tolist() == [8.0, 9.0, 10.0, 11.0]
+    assert result.times_ns.tolist() == [0, 2 * SECOND, 3 * SECOND, 5 * SECOND]
+
+
+def test_mean():
+    result = mean(channel([1.0, 3.0, np.nan, 10.0, 20.0, 30.0]), 2)
+    assert result.values.tolist() == [2.0, 20.0]
+    assert result.times_ns.tolist() == [1 * SECOND, 4 * SECOND]
+    with pytest.raises(ValueError):
+        mean(channel([0, 1, 2], data_type=codes.data_type.ENUM), 1)
+
+
+def test_lttb():
+    values = np.zeros(100)
+    values[[30, 70]] = [10.0, -10.0]
+    severities = np.zeros(100, np.uint16)
+    severities[50] = codes.severity.MINOR
+    result = lttb(channel(values, severities), 5)
+    assert result.times_ns.tolist()[0] == 0
+    assert result.times_ns.tolist()[-1] == 99 * SECOND
+    assert 10.0 in result.values and -10.0 in result.values
+    assert len(result.values) == 5
+    assert codes.severity.MINOR in result.severities
+    with pytest.raises(ValueError):
+        lttb(channel(values), 2)
+
+
+def test_downsample():
+    data = [channel(np.random.rand(1000)), channel(np.random.rand(1000, 3))]
+    for method in ["minmax", "lttb", "mean"]:
+        results = downsample(data, 100, method)
+        assert all(len(result.times_ns) <= 100 for result in results)
+        assert all(np.all(np.diff(result.times_ns) > 0) for result in results)
+    short = channel([1.0, 2.0])
+    assert downsample(short, 100).values.tolist() == [1.0, 2.0]
+    with pytest.raises(ValueError):
+        downsample(channel(["a", "b"], data_type=codes.data_type.STRING), 1)
+    with pytest.raises(ValueError):
+        downsample(data, 100, "median")
@@ -0,0 +1,98 @@
+import pytest
+
+from channelarchiver import codes, utils
+from channelarchiver.export import to_frame, to_xarray
+from channelarchiver.models import ChannelData, Limits
+
+np = pytest.importorskip("numpy")
+
+utc = utils.UTC()
+SECOND = utils.NANOSECONDS_PER_SECOND
+
+
+@pytest.fixture
+def scalar_channel():
+    return ChannelData(
+        channel="EXAMPLE:DOUBLE_SCALAR",
+        values=np.array([200.5, 199.9, 198.7]),
+        times_ns=np.array([0, 2, 4], dtype=np.int64) * SECOND,
+        statuses=np.array([0, codes.status.HIHI_ALARM, 99], np.uint16),
+        severities=np.array([0, codes.severity.MAJOR, codes.severity.REPEAT], np.uint16),
+        units="mA",
+        data_type=codes.data_type.DOUBLE,
+        elements=1,
+        display_limits=Limits(0, 220),
+        tz=utc,
+    )
+
+
+@pytest.fixture
+def waveform_channel():
+    return ChannelData(
+        channel="EXAMPLE:INT_WAVEFORM",
+        values=[[1, 2, 3], [4, 5, 6]],
+        times_ns=[1 * SECOND, 2 * SECOND],
+        statuses=[0, 0],
+        severities=[0, 1],
+        data_type=codes.data_type.INT,
+        elements=3,
+        tz=utils.UTC(10),
+    )
+
+
+def test_to_pandas(scalar_channel):
+    pytest.importorskip("pandas")
+    frame = scalar_channel.to_pandas()
+    assert list(frame.columns) == ["value", "status", "severity"]
+    assert np.shares_memory(frame["value"].to_numpy(), scalar_channel.values)
+    assert frame.index[1].timestamp() == 2
+    assert str(frame.index.tz) == "UTC"
+    assert frame["status"].dtype == "category"
+    assert frame["status"].tolist()[:2] == ["NO_ALARM", "HIHI_ALARM"]
+    assert frame["status"].isna().tolist() == [False, False, True]
+    assert frame["severity"].tolist() == ["NO_ALARM", "MAJOR", "REPEAT"]
+    codes_frame = scalar_channel.to_pandas(categorical=False)
+    assert codes_frame["status"].tolist() == [0, 3, 99]
+
+
+def test_to_pandas_waveform(waveform_channel):
+    pytest.importorskip("pandas")
+    frame = waveform_channel.to_pandas()
+    assert frame["value"].to_numpy().tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert frame["severity"].tolist() == ["NO_ALARM", "MINOR"]
+    assert frame.index[0].utcoffset().total_seconds() == 10 * 3600
+
+
+def test_to_xarray(scalar_channel, waveform_channel):
+    pytest.importorskip("xarray")
+    array = scalar_channel.to_xarray()
+    assert array.name == "EXAMPLE:DOUBLE_SCALAR"
+    assert array.dims == ("time",)
+    assert array.attrs["units"] == "mA"
+    assert array.attrs["display_limits"] == [0, 220]
+    assert array["status"].values.tolist() == [0, 3, 99]
+    assert "HIHI_ALARM" in array["status"].attrs["flag_meanings"].split()
+    waveform = waveform_channel.to_xarray()
+    assert waveform.dims == ("time", "element")
+    assert waveform.sel(element=2).values.tolist() == [3, 6]
+
+
+def test_to_frame(scalar_channel, waveform_channel):
+    pytest.importorskip("pandas")
+    waveform_channel.tz = utc
+    frame = to_frame([scalar_channel, waveform_channel], categorical=False)
+    assert frame.index.names == ["channel", "time"]
+    assert len(frame.loc["EXAMPLE:DOUBLE_SCALAR"]) == 3
+    assert len(frame.loc["EXAMPLE:INT_WAVEFORM"]) == 2
+    assert to_frame([]).empty
+
+
+def test_to_xarray_multiple_channels(scalar_channel, waveform_channel):
+    pytest.importorskip("xarray")
+    dataset = to_xarray([scalar_channel, waveform_channel])
+    assert dataset.sizes["time"] == 4
+    assert dataset.sizes["element"] == 3
+    values = dataset["EXAMPLE:DOUBLE_SCALAR"].values
+    assert np.isnan(values[1]) and values[2] == 199.9
+    assert dataset["EXAMPLE:INT_WAVEFORM.severity"].values[2] == 1
+    assert dataset["EXAMPLE:DOUBLE_SCALAR"].attrs["units"] == "mA"
@@ -0,0 +1,114 @@
+from datetime import datetime
+from unittest.mock import Mock
+
+import pytest
+
+from channelarchiver import Archiver, utils
+from channelarchiver.instrumentation import (
+    Hooks,
+    OpenTelemetryHooks,
+    PrometheusHooks,
+    StatsHooks,
+)
+from archiver_server import ArchiverServer
+from mock_archiver import MockArchiver
+
+utc = utils.UTC()
+start = datetime(2012, 7, 12, tzinfo=utc)
+end = datetime(2012, 7, 14, tzinfo=utc)
+
+
+@pytest.fixture
+def server_url():
+    server = ArchiverServer(MockArchiver())
+    yield server.start()
+    server.stop()
+
+
+def test_stats_hooks(server_url):
+    stats = StatsHooks()
+    archiver = Archiver(server_url, hooks=stats, cache_size=1e6)
+    # The interval ends within the archive so the result can be cached
+    end = datetime(2012, 7, 13, 11, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert stats.calls["archives", None].count == 1
+    assert stats.calls["names", 1001].count == 1
+    assert stats.calls["values", 1001].count == 1
+    assert stats.calls["values", 1001].errors == 0
+    assert stats.calls["values", 1001].seconds > 0
+    # The server gzips the response so this is less than its decoded size
+    assert 0 < stats.response_bytes["values"] < 2000
+    assert stats.samples_parsed == 3
+    assert stats.cache_misses == 1
+    archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert stats.cache_hits == 1
+    assert stats.calls["values", 1001].count == 1
+    data.times
+    assert stats.datetime_seconds > 0
+    stats.reset()
+    assert not stats.calls and stats.samples_parsed == 0
+
+
+def test_hooks_report_errors():
+    hooks = Mock(spec=Hooks)
+    archiver = Archiver("http://fake", hooks=hooks)
+    archiver.archiver = MockArchiver()
+    with pytest.raises(Exception):
+        archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, archive_keys=9999, scan_archives=False)
+    method, archive_key, seconds, error = hooks.on_call.call_args[0]
+    assert (method, archive_key) == ("values", 9999)
+    assert error is not None
+    # The mock archiver has no transport so no response sizes are known
+    assert not hooks.on_response.called
+
+
+def test_hooks_report_parsing():
+    hooks = Mock(spec=Hooks)
+    archiver = Archiver("http://fake", hooks=hooks)
+    archiver.archiver = MockArchiver()
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    channel, samples, _ = hooks.on_parse.call_args[0]
+    assert (channel, samples) == ("EXAMPLE:DOUBLE_SCALAR", 4)
+    assert not hooks.on_datetime_conversion.called
+    data.times
+    data.times
+    assert hooks.on_datetime_conversion.call_count == 1
+
+
+def test_opentelemetry_hooks():
+    meter = Mock()
+    instruments = {}
+    meter.create_histogram.side_effect = lambda name, **kwargs: instruments.setdefault(
+        name, Mock()
+    )
+    meter.create_counter.side_effect = meter.create_histogram.side_effect
+    hooks = OpenTelemetryHooks(meter)
+    hooks.on_call("values", 1001, 0.5)
+    hooks.on_call("archives", None, 0.1, error=OSError())
+    hooks.on_cache(True)
+    instruments["channelarchiver.request.duration"].record.assert_any_call(
+        0.5, {"method": "values", "archive_key": 1001}
+    )
+    instruments["channelarchiver.request.errors"].add.assert_called_once_with(
+        1, {"method": "archives"}
+    )
+    instruments["channelarchiver.cache.lookups"].add.assert_called_once_with(
+        1, {"result": "hit"}
+    )
+
+
+def test_prometheus_hooks():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    hooks = PrometheusHooks(registry=registry)
+    hooks.on_call("values", 1001, 0.5)
+    hooks.on_response("values", 1001, 2048)
+    hooks.on_cache(False)
+    labels = {"method": "values", "archive_key": "1001"}
+    assert registry.get_sample_value("channelarchiver_request_seconds_count", labels) == 1
+    assert registry.get_sample_value(
+        "channelarchiver_response_bytes_total", {"method": "values"}
+    ) == 2048
+    assert registry.get_sample_value(
+        "channelarchiver_cache_lookups_total", {"result": "miss"}
+    ) == 1
@@ -0,0 +1,117 @@
+try:
+    from xmlrpc.client import Fault, dumps, loads
+except ImportError:  # Python 2
+    from xmlrpclib import Fault, dumps, loads
+
+import pytest
+
+from channelarchiver import parser
+from channelarchiver.structures import SampleColumns
+from mock_archiver import MockArchiver
+
+channels = [
+    "EXAMPLE:DOUBLE_SCALAR",
+    "EXAMPLE:ENUM_SCALAR",
+    "EXAMPLE:INT_WAVEFORM",
+    "EXAMPLE:STRING_SCALAR",
+]
+
+
+def parse(xml, chunk_size=37):
+    values_parser, unmarshaller = parser.getparser()
+    for i in range(0, len(xml), chunk_size):
+        values_parser.feed(xml[i : i + chunk_size])
+    values_parser.close()
+    return unmarshaller.close()
+
+
+def values_response():
+    data = MockArchiver().values(1001, channels, 0, 0, 2 ** 31 - 1, 0, 100, 0)
+    return dumps((data,), methodresponse=True).encode("utf-8")
+
+
+def test_values_parser_matches_standard_parser():
+    xml = values_response()
+    (expected,), _ = loads(xml)
+    (data,) = parse(xml)
+    assert [d["name"] for d in data] == channels
+    for archive_data, expected_data in zip(data, expected):
+        assert isinstance(archive_data["values"], SampleColumns)
+        assert archive_data["values"] == expected_data["values"]
+        for key in ["name", "type", "count", "meta"]:
+            assert archive_data[key] == expected_data[key]
+
+
+def test_values_parser_uses_typed_columns():
+    (data,) = parse(values_response())
+    assert data[0]["values"].values.typecode == "d"
+    assert len(data[1]["values"]) == 0
+    assert data[2]["values"].values.typecode == "q"
+    assert data[2]["values"].offsets.tolist() == [0, 3, 6, 9]
+
+
+def test_sample_columns_mixed_values():
+    columns = SampleColumns()
+    columns.add_value(1)
+    columns.add_value(2.5)
+    columns.add_value("on")
+    columns.end_sample()
+    assert columns.values == [1, 2.5, "on"]
+
+
+def test_values_parser_fault():
+    xml = dumps(Fault(8, "Channel not found"), methodresponse=True).encode("utf-8")
+    with pytest.raises(Fault) as exc_info:
+        parse(xml)
+    assert exc_info.value.faultCode == 8
+
+
+def test_is_values_request():
+    assert parser.is_values_request(dumps((1,), "archiver.values").encode("utf-8"))
+    assert not parser.is_values_request(dumps((1,), "archiver.names").encode("utf-8"))
+
+
+def test_sample_columns_slice_and_extend():
+    samples = [
+        {"secs": 10, "nano": 1, "stat": 0, "sevr": 0, "value": [1.5, 2.5]},
+        {"secs": 11, "nano": 2, "stat": 3, "sevr": 1, "value": [3.5, 4.5]},
+        {"secs": 12, "nano": 3, "stat": 0, "sevr": 0, "value": [5.5, 6.5]},
+    ]
+    columns = SampleColumns()
+    columns.extend(samples)
+    assert len(columns) == 3
+    assert columns[-1] == samples[-1]
+    assert columns[1:] == samples[1:]
+    assert columns[1:].offsets.tolist() == [0, 2, 4]
+    head = columns[:1]
+    head.extend(columns[2:])
+    assert head == [samples[0], samples[2]]
+    assert head.value_lists(2) == [[1.5, 2.5], [5.5, 6.5]]
+    assert head.times_ns() == [10000000001, 12000000003]
+
+
+def test_values_parser_falls_back_for_unusual_samples():
+    sample = (
+        "<value><struct>"
+        "<member><name>secs</name><value><i4>1342129643</i4></value></member>"
+        "<member><name>nano</name><value><i4>5</i4></value></member>"
+        "<member><name>stat</name><value><i4>0</i4></value></member>"
+        "<member><name>sevr</name><value><i4>0</i4></value></member>"
+        "<member><name>value</name><value><array><data>"
+        "<value>a &amp; b</value>"
+        "</data></array></value></member>"
+        "</struct></value>"
+    )
+    xml = (
+        "<?xml version='1.0'?><methodResponse><params><param><value><array><data>"
+        "<value><struct><member><name>name</name><value>EXAMPLE:STRING</value></member>"
+        "<member><name>values</name><value><array><data>"
+        + sample * 2
+        + "</data></array></value></member></struct></value>"
+        "</data></array></value></param></params></methodResponse>"
+    ).encode("utf-8")
+    (data,) = parse(xml, chunk_size=50)
+    assert data[0]["name"] == "EXAMPLE:STRING"
+    assert list(data[0]["values"]) == [
+        {"secs": 1342129643, "nano": 5, "stat": 0, "sevr": 0, "value": ["a & b"]}
+    ] * 2
@@ -0,0 +1,41 @@
+import socket
+
+try:
+    from xmlrpc.client import Fault, ProtocolError
+except ImportError:  # Python 2
+    from xmlrpclib import Fault, ProtocolError
+
+from channelarchiver import HedgePolicy, RetryPolicy
+from channelarchiver.exceptions import ArchiverTimeout
+
+
+def test_retry_policy_is_retryable():
+    retry = RetryPolicy()
+    assert retry.is_retryable(ProtocolError("http://fake", 503, "Unavailable", {}))
+    assert not retry.is_retryable(ProtocolError("http://fake", 404, "Not Found", {}))
+    assert retry.is_retryable(ConnectionResetError())
+    assert retry.is_retryable(socket.timeout())
+    assert not retry.is_retryable(Fault(1, "Unknown channel"))
+    assert not retry.is_retryable(ArchiverTimeout())
+
+
+def test_retry_policy_delay():
+    retry = RetryPolicy(backoff=1, max_backoff=5, seed=1)
+    delays = [retry.delay(i) for i in range(10)]
+    assert 0 <= delays[0] <= 1
+    assert 0 <= delays[1] <= 2
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert len(set(delays)) == len(delays)
+
+
+def test_hedge_policy_delay():
+    hedge = HedgePolicy(percentile=90, min_delay=0.01, min_samples=10)
+    for i in range(9):
+        hedge.record("values", 0.1 * (i + 1))
+    assert hedge.delay("values") is None
+    hedge.record("values", 1.0)
+    assert hedge.delay("values") == 1.0
+    hedge.record("values", 0.001)
+    assert hedge.delay("values") == 0.9
+    assert hedge.delay("names") is None
+    assert HedgePolicy(delay=0.2).delay("names") == 0.2
@@ -0,0 +1,189 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from unittest.mock import Mock
+
+from channelarchiver import Archiver, SampleStore, codes, utils
+from channelarchiver import store as store_module
+from mock_archiver import MockArchiver
+
+utc = utils.UTC()
+raw = codes.interpolation.RAW
+HOUR_NS = 3600 * 10 ** 9
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SampleStore(str(tmp_path / "samples.db"))
+
+
+@pytest.fixture
+def archiver(store):
+    archiver = Archiver("http://fake", sample_store=store)
+    archiver.archiver = MockArchiver()
+    archiver.archiver.values = Mock(wraps=archiver.archiver.values)
+    return archiver
+
+
+def sample(hour, value):
+    return {"secs": hour * 3600, "nano": 0, "stat": 0, "sevr": 0, "value": [value]}
+
+
+def archive_data(samples):
+    return {
+        "name": "CHAN",
+        "type": codes.data_type.DOUBLE,
+        "count": 1,
+        "meta": {"type": 1, "units": "mA"},
+        "values": samples,
+    }
+
+
+def test_store_gaps(store):
+    assert store.gaps("h", "CHAN", 1, raw, 0, 10 * HOUR_NS) == [(0, 10 * HOUR_NS)]
+    store.add("h", 1, raw, archive_data([sample(3, 1.0)]), 2 * HOUR_NS, 4 * HOUR_NS)
+    store.add("h", 1, raw, archive_data([sample(7, 2.0)]), 6 * HOUR_NS, 8 * HOUR_NS)
+    assert store.gaps("h", "CHAN", 1, raw, 0, 10 * HOUR_NS) == [
+        (0, 2 * HOUR_NS),
+        (4 * HOUR_NS, 6 * HOUR_NS),
+        (8 * HOUR_NS, 10 * HOUR_NS),
+    ]
+    assert store.gaps("h", "CHAN", 1, raw, 3 * HOUR_NS, 7 * HOUR_NS) == [
+        (4 * HOUR_NS, 6 * HOUR_NS)
+    ]
+    assert store.gaps("h", "CHAN", 2, raw, 3 * HOUR_NS, 4 * HOUR_NS) == [
+        (3 * HOUR_NS, 4 * HOUR_NS)
+    ]
+
+
+def test_store_merges_coverage(store):
+    store.add("h", 1, raw, archive_data([sample(1, 1.0)]), 0, 2 * HOUR_NS)
+    store.add("h", 1, raw, archive_data([sample(3, 2.0)]), 2 * HOUR_NS, 4 * HOUR_NS)
+    assert store.gaps("h", "CHAN", 1, raw, 0, 4 * HOUR_NS) == []
+
+
+def test_store_load(store):
+    samples = [sample(1, 1.0), sample(2, 2.0), sample(2, 3.0), sample(9, 4.0)]
+    store.add("h", 1, raw, archive_data(samples), 0, 4 * HOUR_NS)
+    data = store.load("h", "CHAN", 1, raw, 0, 10 * HOUR_NS)
+    assert data["meta"] == {"type": 1, "units": "mA"}
+    assert [s["value"] for s in data["values"]] == [[1.0], [2.0], [3.0]]
+    assert data["values"][1]["secs"] == 7200
+    limited = store.load("h", "CHAN", 1, raw, 0, 10 * HOUR_NS, limit=2)
+    assert len(limited["values"]) == 2
+    assert store.load("h", "OTHER", 1, raw, 0, 10 * HOUR_NS) is None
+
+
+def test_get_with_store(archiver):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 13, 10, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [199.9, 198.7]
+    assert archiver.archiver.values.call_count == 1
+
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [199.9, 198.7]
+    assert data.times[0] == datetime(2012, 7, 13, 2, 5, 1, 443589, utc)
+    assert data.units == "mA"
+    assert archiver.archiver.values.call_count == 1
+
+    wider_end = datetime(2012, 7, 14, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, wider_end, interpolation="raw")
+    assert data.values == [199.9, 198.7, 196.1]
+    assert archiver.archiver.values.call_count == 2
+    gap_call = archiver.archiver.values.call_args
+    assert gap_call[0][2:6] == (1342173600, 0, 1342224000, 0)
+
+
+def test_get_with_store_full_page(archiver):
+    start = datetime(2012, 7, 12, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, limit=2, interpolation="raw")
+    assert data.values == [200.5, 199.9]
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, limit=10, interpolation="raw")
+    assert data.values == [200.5, 199.9, 198.7, 196.1]
+    # The second request only asks for data after the first page
+    assert archiver.archiver.values.call_args[0][2:4] == (1342145101, 443588732)
+
+
+def test_get_with_store_ignores_other_interpolation(archiver):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 13, 10, tzinfo=utc)
+    archiver._fetch_values = Mock(return_value=[])
+    archiver.get(
+        "EXAMPLE:DOUBLE_SCALAR",
+        start,
+        end,
+        interpolation=codes.interpolation.LINEAR,
+    )
+    assert archiver._fetch_values.call_args[0][7] == codes.interpolation.LINEAR
+
+
+def test_get_with_store_sees_new_samples(archiver):
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2030, 1, 1, tzinfo=utc)
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [199.9, 198.7, 196.1]
+    # The archive engine writes a sample after the end of the last scan
+    samples = archiver.archiver._archives["1001"]["data"]["EXAMPLE:DOUBLE_SCALAR"]["values"]
+    samples.append({"secs": 1342180800, "nano": 0, "stat": 0, "sevr": 0, "value": [195.0]})
+    data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+    assert data.values == [199.9, 198.7, 196.1, 195.0]
+    assert archiver.archiver.values.call_count == 2
+    # Only the period after the end of the archive was requested again
+    assert archiver.archiver.values.call_args[0][2] == 1342178335
+
+
+def test_store_add_covered_end(store):
+    samples = [sample(1, 1.0), sample(3, 2.0)]
+    store.add("h", 1, raw, archive_data(samples), 0, 4 * HOUR_NS, 2 * HOUR_NS)
+    assert store.gaps("h", "CHAN", 1, raw, 0, 4 * HOUR_NS) == [(2 * HOUR_NS, 4 * HOUR_NS)]
+    data = store.load("h", "CHAN", 1, raw, 0, 4 * HOUR_NS)
+    assert [s["value"] for s in data["values"]] == [[1.0], [2.0]]
+
+
+def test_store_replaces_overlapping_chunks(store):
+    samples = [sample(1, 1.0), sample(3, 2.0), sample(5, 3.0)]
+    store.add("h", 1, raw, archive_data(samples), 0, 6 * HOUR_NS, 2 * HOUR_NS)
+    store.add("h", 1, raw, archive_data([sample(4, 4.0)]), 2 * HOUR_NS, 4 * HOUR_NS)
+    data = store.load("h", "CHAN", 1, raw, 0, 6 * HOUR_NS)
+    assert [s["value"] for s in data["values"]] == [[1.0], [4.0], [3.0]]
+    limited = store.load("h", "CHAN", 1, raw, 2 * HOUR_NS, 6 * HOUR_NS, limit=1)
+    assert [s["value"] for s in limited["values"]] == [[4.0]]
+
+
+def test_store_waveform_and_string_values(store):
+    waveform = archive_data([sample(1, 1), sample(2, 2)])
+    waveform["values"][1]["value"] = [2, 3, 4]
+    store.add("h", 1, raw, waveform, 0, 4 * HOUR_NS)
+    data = store.load("h", "CHAN", 1, raw, 0, 4 * HOUR_NS)
+    assert [s["value"] for s in data["values"]] == [[1], [2, 3, 4]]
+    strings = archive_data([sample(1, "a"), sample(2, "b")])
+    strings["name"] = "TEXT"
+    store.add("h", 1, raw, strings, 0, 4 * HOUR_NS)
+    data = store.load("h", "TEXT", 1, raw, 0, 4 * HOUR_NS)
+    assert [s["value"] for s in data["values"]] == [["a"], ["b"]]
+
+
+def test_get_with_store_uses_one_connection(archiver, monkeypatch):
+    connect = Mock(wraps=store_module.connect)
+    monkeypatch.setattr(store_module, "connect", connect)
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 13, 10, tzinfo=utc)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:INT_WAVEFORM"]
+    archiver.get(channels, start, end, interpolation="raw")
+    assert connect.call_count == 1
+
+
+def test_store_drops_samples_in_old_format(tmp_path):
+    path = str(tmp_path / "samples.db")
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        "CREATE TABLE coverage (host, channel, key, interpolation, start_ns, end_ns);"
+        "INSERT INTO coverage VALUES ('h', 'CHAN', 1, 0, 0, 3600000000000);"
+        "CREATE TABLE samples (host, channel, key, interpolation, time_ns, seq, stat, sevr, value);"
+    )
+    connection.close()
+    store = SampleStore(path)
+    assert store.gaps("h", "CHAN", 1, raw, 0, HOUR_NS) == [(0, HOUR_NS)]
@@ -0,0 +1,129 @@
+import time
+from datetime import datetime, timedelta
+
+from channelarchiver import utils
+from channelarchiver.models import ArchiveProperties
+from channelarchiver.structures import IntervalIndex, LRUCache, NameIndex
+
+utc = utils.UTC()
+t0 = datetime(2012, 7, 13, tzinfo=utc)
+
+
+def hours(n):
+    return utils.ns_from_datetime(t0 + timedelta(hours=n))
+
+
+def archive(key, start_hour, end_hour):
+    return ArchiveProperties(
+        key, t0 + timedelta(hours=start_hour), t0 + timedelta(hours=end_hour)
+    )
+
+
+def test_interval_index_overlaps():
+    archives = [archive(3, 20, 30), archive(1, 0, 10), archive(2, 8, 22)]
+    index = IntervalIndex(archives)
+    assert index.overlaps(hours(9), hours(21)) == [
+        (1, hours(10) - hours(9)),
+        (2, hours(21) - hours(9)),
+        (0, hours(21) - hours(20)),
+    ]
+    assert index.overlaps(hours(30), hours(40)) == []
+
+
+def test_interval_index_nested_archive():
+    archives = [archive(1, 0, 100), archive(2, 10, 20), archive(3, 30, 40)]
+    index = IntervalIndex(archives)
+    assert [p for p, _ in index.overlaps(hours(50), hours(60))] == [0]
+    assert [p for p, _ in index.overlaps(hours(15), hours(35))] == [0, 1, 2]
+
+
+def test_interval_index_best():
+    archives = [archive(1, 0, 10), archive(2, 5, 15), archive(3, 10, 20)]
+    index = IntervalIndex(archives)
+    assert index.best(hours(12), hours(20)) == 2
+    assert index.best(hours(5), hours(15)) == 1
+    # Ties go to the archive listed first
+    assert index.best(hours(5), hours(10)) == 0
+    assert index.best(hours(0), hours(10)) == 0
+    # No overlap falls back to the first archive
+    assert index.best(hours(50), hours(60)) == 0
+    assert IntervalIndex([]).best(hours(0), hours(1)) is None
+
+
+def test_interval_index_is_current():
+    archives = [archive(1, 0, 10)]
+    index = IntervalIndex(archives)
+    assert index.is_current(archives)
+    assert not index.is_current(list(archives))
+    archives.append(archive(2, 10, 20))
+    assert not index.is_current(archives)
+
+
+def test_lru_cache():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 4)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 4)
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.nbytes == 8
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_lru_cache_oversized_value():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", 1, 4)
+    cache.put("b", 2, 11)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+
+
+def test_lru_cache_replace():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", 1, 4)
+    cache.put("a", 2, 6)
+    assert cache.get("a") == 2
+    assert cache.nbytes == 6
+    assert len(cache) == 1
+    cache.clear()
+    assert cache.nbytes == 0
+    assert len(cache) == 0
+
+
+def test_lru_cache_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", 1, 4, ttl=5)
+    cache.put("b", 2, 4)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.nbytes == 4
+
+
+def test_name_index_search():
+    index = NameIndex(["SR11BCM01:CURRENT", "SR11BCM01:LIFETIME", "SR1", "SR2:X", "SR1:Y"])
+    assert len(index) == 5
+    assert "SR1" in index and "SR" not in index
+    assert index.search("SR11BCM01:*") == ["SR11BCM01:CURRENT", "SR11BCM01:LIFETIME"]
+    assert index.search("SR1*") == ["SR1", "SR11BCM01:CURRENT", "SR11BCM01:LIFETIME", "SR1:Y"]
+    assert index.search("SR?:*") == ["SR1:Y", "SR2:X"]
+    assert index.search("SR[2]*") == ["SR2:X"]
+    assert index.search("*TIME") == ["SR11BCM01:LIFETIME"]
+    assert index.search("SR1") == ["SR1"]
+    assert index.search("sr1") == []
+    assert index.search("*") == index.names
+    assert NameIndex([]).search("*") == []
+
+
+def test_name_index_prefix():
+    index = NameIndex(["A:B", "A:C", "A\U0010ffff", "A\U0010ffffB", "B"])
+    assert index.prefix("A:") == ["A:B", "A:C"]
+    assert index.prefix("A") == ["A:B", "A:C", "A\U0010ffff", "A\U0010ffffB"]
+    assert index.prefix("A\U0010ffff") == ["A\U0010ffff", "A\U0010ffffB"]
+    assert index.prefix("C") == []
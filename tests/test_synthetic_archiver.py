@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from channelarchiver import Archiver, codes, utils
+from synthetic_archiver import SyntheticArchiver
+
+utc = utils.UTC()
+
+
+def synthetic_archiver(**kwargs):
+    archiver = Archiver("http://fake")
+    archiver.archiver = SyntheticArchiver(**kwargs)
+    return archiver
+
+
+def test_synthetic_archiver_archives():
+    archiver = synthetic_archiver(num_archives=3, num_channels=5, num_samples=10)
+    archiver.scan_archives()
+    assert len(archiver.archives_for_channel) == 5
+    archives = archiver.archives_for_channel["SYNTH:DOUBLE:000000"]
+    assert [archive.key for archive in archives] == [1000, 1001, 1002]
+    assert archives[0].start_time == datetime(2012, 7, 13, 0, 0, 0, tzinfo=utc)
+    assert archives[2].end_time == datetime(2012, 7, 13, 0, 0, 9, tzinfo=utc)
+
+
+def test_synthetic_archiver_get():
+    archiver = synthetic_archiver(
+        num_archives=4,
+        num_channels=4,
+        num_samples=100,
+        elements=3,
+        data_types=[codes.data_type.INT, codes.data_type.ENUM],
+    )
+    start = datetime(2012, 7, 13, tzinfo=utc)
+    end = datetime(2012, 7, 14, tzinfo=utc)
+    channels = ["SYNTH:INT:000000", "SYNTH:ENUM:000001"]
+    int_data, enum_data = archiver.get(channels, start, end, interpolation="raw", stitch=True)
+    assert len(int_data.values) == 100
+    assert int_data.values[1] == [1, 2, 3]
+    assert int_data.elements == 3
+    assert int_data.statuses[:2] == [codes.status.HIHI_ALARM, 0]
+    assert enum_data.states == ["Off", "On", "Fault", "Unknown"]
+    assert archiver.get(channels[0], start, end, limit=7, interpolation="raw").values == (
+        int_data.values[:7]
+    )
@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import datetime
+
+try:
+    from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2
+    from SimpleXMLRPCServer import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+    from SocketServer import ThreadingMixIn
+
+import pytest
+
+from channelarchiver import Archiver, PooledTransport, utils
+from mock_archiver import MockArchiver
+
+utc = utils.UTC()
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rpc_paths = ("/cgi-bin/ArchiveDataServer.cgi",)
+    encode_threshold = 100
+
+    def setup(self):
+        SimpleXMLRPCRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def parse_request(self):
+        parsed = SimpleXMLRPCRequestHandler.parse_request(self)
+        self.server.accept_encodings.append(self.headers.get("Accept-Encoding"))
+        return parsed
+
+
+class Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+    server = Server(("127.0.0.1", 0), RequestHandler, logRequests=False)
+    server.connections = 0
+    server.accept_encodings = []
+    mock_archiver = MockArchiver()
+    for name in ["info", "archives", "names", "values"]:
+        server.register_function(getattr(mock_archiver, name), "archiver." + name)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server):
+    return "http://127.0.0.1:{0}/cgi-bin/ArchiveDataServer.cgi".format(
+        server.server_address[1]
+    )
+
+
+def test_pooled_transport_get(server):
+    transport = PooledTransport(connect_timeout=5, read_timeout=5)
+    archiver = Archiver(url(server), transport=transport)
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    for _ in range(3):
+        data = archiver.get("EXAMPLE:DOUBLE_SCALAR", start, end, interpolation="raw")
+        assert data.values == [200.5, 199.9, 198.7, 196.1]
+    assert server.connections == 1
+    assert set(server.accept_encodings) == {"gzip"}
+    transport.close()
+
+
+def test_pooled_transport_concurrent(server):
+    transport = PooledTransport(max_idle=4)
+    archiver = Archiver(url(server), max_workers=4, transport=transport)
+    channels = ["EXAMPLE:DOUBLE_SCALAR", "EXAMPLE:ENUM_SCALAR", "EXAMPLE:INT_WAVEFORM"]
+    for _ in range(3):
+        data = archiver.get(channels, "2012-01-01Z", "2013-01-01Z", interpolation="raw")
+        assert [d.channel for d in data] == channels
+        assert data[1].values == [7, 1, 8]
+    assert server.connections <= 4
+
+
+def test_pooled_transport_without_gzip(server):
+    archiver = Archiver(url(server), transport=PooledTransport(gzip=False))
+    archiver.scan_archives()
+    assert "EXAMPLE:ENUM_SCALAR" in archiver.archives_for_channel
+    assert set(server.accept_encodings) == {"identity"}
+
+
+def test_pooled_transport_scheme_must_match():
+    with pytest.raises(ValueError):
+        Archiver("https://host/cgi-bin/ArchiveDataServer.cgi", transport=PooledTransport())
+    with pytest.raises(ValueError):
+        Archiver("http://host/cgi-bin/ArchiveDataServer.cgi", transport=PooledTransport(https=True))
+    Archiver("HTTPS://host/cgi-bin/ArchiveDataServer.cgi", transport=PooledTransport(https=True))
+
+
+def test_pooled_transport_read_timeout(server):
+    event = threading.Event()
+    server.register_function(lambda: event.wait(2), "archiver.slow")
+    transport = PooledTransport(read_timeout=0.1)
+    archiver = Archiver(url(server), transport=transport)
+    with pytest.raises(OSError):
+        archiver.archiver.slow()
+    event.set()
+
+
+def test_default_transport_parses_values_into_columns(server):
+    archiver = Archiver(url(server))
+    start = datetime(2012, 1, 1, tzinfo=utc)
+    end = datetime(2013, 1, 1, tzinfo=utc)
+    data = archiver.get("EXAMPLE:INT_WAVEFORM", start, end, interpolation="raw")
+    assert data.values == [[3, 5, 13], [2, 4, 11], [0, 7, 1]]
+    columnar = archiver.get(
+        "EXAMPLE:INT_WAVEFORM", start, end, interpolation="raw", columnar=True
+    )
+    assert columnar.values.tolist() == data.values
+    assert columnar.times_ns.tolist() == data.times_ns
+
+
+def test_pooled_transport_replaces_closed_connections(server):
+    # Like Apache's KeepAliveTimeout, the server closes idle connections
+    RequestHandler.timeout = 0.3
+    try:
+        transport = PooledTransport(max_idle=4, max_idle_time=None)
+        archiver = Archiver(url(server), max_workers=4, transport=transport)
+        archiver.scan_archives()
+        connections = server.connections
+        time.sleep(1)
+        archiver.scan_archives()
+        assert "EXAMPLE:ENUM_SCALAR" in archiver.archives_for_channel
+        assert server.connections > connections
+    finally:
+        RequestHandler.timeout = None
+
+
+def test_pooled_transport_max_idle_time(server):
+    transport = PooledTransport(max_idle_time=0.2)
+    archiver = Archiver(url(server), transport=transport)
+    archiver.scan_archives()
+    assert server.connections == 1
+    time.sleep(0.3)
+    archiver.scan_archives()
+    assert server.connections == 2
+    assert sum(len(idle) for idle in transport._idle.values()) == 1
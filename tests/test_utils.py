@@ -257,3 +257,54 @@ def test_pretty_waveform_repr_empty_list():
     lst = []
     lst_repr = utils.pretty_list_repr(lst)
     assert lst_repr == "[]"
+
+
+def test_datetimes_from_sec_and_nano():
+    seconds = [1376706013, 1376706013, 1376706013, 1376706013]
+    nanoseconds = [123456789, 999999500, 500, 1500]
+    dts = utils.datetimes_from_sec_and_nano(seconds, nanoseconds, utils.utc)
+    assert dts == [
+        utils.datetime_from_sec_and_nano(sec, nano, utils.utc)
+        for sec, nano in zip(seconds, nanoseconds)
+    ]
+    assert dts[0] == datetime(2013, 8, 17, 2, 20, 13, 123457, utils.utc)
+    assert dts[1] == datetime(2013, 8, 17, 2, 20, 14, 0, utils.utc)
+
+
+def test_datetimes_from_sec_and_nano_with_tz():
+    seconds = [1376706013, 1392663073]
+    nanoseconds = [123456789, 987654321]
+    for tz in [AEST(), utils.UTC(-3.5), melbourne_tz]:
+        dts = utils.datetimes_from_sec_and_nano(seconds, nanoseconds, tz)
+        expected = [
+            utils.datetime_from_sec_and_nano(sec, nano, tz)
+            for sec, nano in zip(seconds, nanoseconds)
+        ]
+        assert dts == expected
+        assert [dt.utcoffset() for dt in dts] == [dt.utcoffset() for dt in expected]
+    dts = utils.datetimes_from_sec_and_nano(seconds, nanoseconds, melbourne_tz)
+    assert dts[0].utcoffset() == timedelta(hours=10)
+    assert dts[1].utcoffset() == timedelta(hours=11)
+
+
+def test_datetimes_from_ns():
+    dts = utils.datetimes_from_ns([1376706013123456789], utils.utc)
+    assert dts == [datetime(2013, 8, 17, 2, 20, 13, 123457, utils.utc)]
+
+
+def test_datetime64_from_sec_and_nano():
+    np = pytest.importorskip("numpy")
+    times = utils.datetime64_from_sec_and_nano([1376706013], [123456789])
+    assert times.dtype == np.dtype("datetime64[ns]")
+    assert times[0] == np.datetime64("2013-08-17T02:20:13.123456789")
+
+
+def test_sec_and_nano_from_datetimes():
+    dts = [
+        datetime(2013, 8, 17, 2, 20, 13, 123456),
+        datetime(2013, 8, 17, 12, 20, 13, 123456, AEST()),
+        datetime(1969, 12, 31, 23, 59, 59, 500000, utils.utc),
+    ]
+    seconds, nanoseconds = utils.sec_and_nano_from_datetimes(dts)
+    assert seconds == [1376706013, 1376706013, -1]
+    assert nanoseconds == [123456000, 123456000, 500000000]